@@ -2,230 +2,489 @@
 
 import os
 import re
-import subprocess
 import json
+import time
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request, redirect, url_for
+from flask import Flask, Response, g, render_template, jsonify, request, redirect, url_for, stream_with_context
 from flask_cors import CORS
 from collections import defaultdict, Counter
 import statistics
-from chatbot_logic import analyze_data_for_chatbot, process_chatbot_query
+from chatbot_logic import analyze_data_for_chatbot, process_chatbot_query, set_analyzed_data
+from scanner import iter_raw_scan, read_testcases
+from scan_cache import ScanCache
+from discovery import DISCOVERY_ROOTS
+from scan_budget import ScanBudget
+from error_clustering import is_cluster_tag
+from snapshot import SharedSnapshotStore, SnapshotStore, DEFAULT_TESTCASE_FILE
+from categories import CATEGORY_NAMES, CategoryIndex
+from results_io import CompactResultsWriter, JSONResultsWriter, row_as_dict
+from rowtable import RowDicts
+from msghelp import msghelp_cache
+from metrics import metrics_registry
+from history import DIFF_KINDS, RunHistory
+from http_cache import ResponseCache
+from jobs import JobManager, SharedJobManager
+from listing import DEFAULT_LIMIT, StaleCursor, index_for, page, parse_listing_args, wants_listing
 
 app = Flask(__name__)
 CORS(app)
 
-def read_testcases(file_path='testcases.txt'):
-    try:
-        with open(file_path) as f:
-            return [line.strip() for line in f if line.strip()]
-    except FileNotFoundError:
-        print("❌ ERROR: testcases.txt not found.")
-        return []
-
-def get_status_log_failing_command(tc_path):
-    status_file = os.path.join(tc_path, "status.log")
-    if not os.path.exists(status_file):
-        return None
-    with open(status_file) as f:
-        for line in f:
-            m = re.match(r".*EXIT STATUS for (\w+) is 5", line)
-            if m:
-                return m.group(1)
-    return None
-
-def get_make_n_failing_order(tc_path, available_diff_files):
-    try:
-        result = subprocess.run(['make', '-n'], cwd=tc_path,
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                text=True)
-        for line in result.stdout.splitlines():
-            if 'testresults/logs' in line and '>' in line:
-                log_file = line.split('>')[-1].strip().split('/')[-1]
-                base = re.sub(r'\.log$', '', re.sub(r'^log_', '', log_file, flags=re.I), flags=re.I)
-                if f"{base}.diff.bak" in available_diff_files:
-                    return base
-    except Exception:
-        pass
-    return None
-
-def extract_first_error_line(diff_file_path):
-    try:
-        with open(diff_file_path) as f:
-            for line in f:
-                if line.strip().startswith('>') and "ERROR" in line:
-                    return line.strip()
-    except Exception:
-        return None
-    return None
-
-def extract_error_tag(error_line):
-    if not error_line:
-        return None
-    m = re.search(r'\(([A-Z]{3,4}-\d+)\)', error_line)
-    return m.group(1) if m else None
-
-def analyze_testcases(testcases):
-    rows = []
-
-    for tc in testcases:
-        if not os.path.isdir(tc):
-            continue
-
-        status_cmd = get_status_log_failing_command(tc)
-        diff_files = [f for f in os.listdir(tc) if f.endswith(".diff.bak")]
-        make_cmd = get_make_n_failing_order(tc, diff_files)
-        final_cmd = status_cmd or make_cmd
-
-        if final_cmd:
-            diff_file_path = os.path.join(tc, f"{final_cmd}.diff.bak")
-            error_line = extract_first_error_line(diff_file_path)
-
-            if error_line:
-                tag = extract_error_tag(error_line)
-                if not tag:
-                    continue  # Only include testcases with issue
-
-                short_error = (
-                    error_line if len(error_line) <= 45 else error_line[:42] + "..."
-                )
-                rows.append([tc, final_cmd, short_error, tag])
-
-    return rows
+# Incremental scan cache; set SCAN_CACHE to an empty string to disable it
+SCAN_CACHE_PATH = os.environ.get('SCAN_CACHE', '.scan_cache.json')
+scan_cache = ScanCache(SCAN_CACHE_PATH) if SCAN_CACHE_PATH else None
+
+ANALYZED_RESULTS_FILE = 'analyzed_testcases.json'
+COMPACT_RESULTS_FILE = 'analyzed_testcases.cwr'
+# Result files written on every refresh: 'compact', 'json' or both
+RESULTS_FORMATS = os.environ.get('RESULTS_FORMATS', 'compact,json').split(',')
+# Set by serve.py: all server processes serve one analysis from the
+# memory-mapped compact results file instead of each keeping their own
+SHARED_SNAPSHOT = os.environ.get('SHARED_SNAPSHOT') == '1'
+
+# Per-testcase and whole-scan time limits (SCAN_TESTCASE_TIMEOUT / SCAN_TIMEOUT)
+scan_budget = ScanBudget()
+
+def scan_testcases(testcases):
+    # Untagged rows are clustered by the snapshot store
+    return metrics_registry.profiled(iter_raw_scan(testcases, cache=scan_cache, budget=scan_budget))
+
+# Walk DISCOVERY_ROOTS for testcase directories when the testcases file is
+# missing, or always with TESTCASE_DISCOVERY=always
+store_options = {'discovery_roots': DISCOVERY_ROOTS,
+                 'discover_always': os.environ.get('TESTCASE_DISCOVERY') == 'always'}
+if SHARED_SNAPSHOT:
+    snapshot_store = SharedSnapshotStore(COMPACT_RESULTS_FILE, DEFAULT_TESTCASE_FILE, scan=scan_testcases,
+                                         **store_options)
+else:
+    snapshot_store = SnapshotStore(DEFAULT_TESTCASE_FILE, scan=scan_testcases, **store_options)
+SNAPSHOT_REFRESH_INTERVAL = float(os.environ.get('SNAPSHOT_REFRESH_INTERVAL', '0'))
+
+def publish_for_chatbot(snapshot):
+    """Keep the chatbot's view of the data in step with the dashboard"""
+    set_analyzed_data(RowDicts(snapshot.rows), snapshot.version)
+
+# Save analyzed data to file for chatbot, row by row while scanning
+if 'json' in RESULTS_FORMATS:
+    snapshot_store.add_row_sink(lambda: JSONResultsWriter(ANALYZED_RESULTS_FILE))
+if 'compact' in RESULTS_FORMATS and not SHARED_SNAPSHOT:
+    snapshot_store.add_row_sink(lambda: CompactResultsWriter(COMPACT_RESULTS_FILE))
+snapshot_store.add_listener(publish_for_chatbot)
+
+# Optionally warm the msgHelp cache with every issue tag of a new snapshot
+if os.environ.get('MSGHELP_PREFETCH') == '1':
+    snapshot_store.add_listener(
+        lambda snapshot: msghelp_cache.prefetch(tag for tag in (snapshot.rows.tag(i) for i in range(len(snapshot.rows)))
+                                                if not is_cluster_tag(tag)))
+
+# History of every published analysis; set HISTORY_DB to an empty string to disable it
+HISTORY_DB = os.environ.get('HISTORY_DB', 'analysis_history.db')
+run_history = RunHistory(HISTORY_DB) if HISTORY_DB else None
+if run_history is not None:
+    snapshot_store.add_scan_listener(run_history.record_snapshot)
+
+# Background rebuilds for /api/analyze and /api/refresh, one per testcases file;
+# shared workers keep job status in files next to the snapshot manifest
+if SHARED_SNAPSHOT:
+    job_manager = SharedJobManager(snapshot_store, f"{COMPACT_RESULTS_FILE}.jobs")
+else:
+    job_manager = JobManager(snapshot_store)
+
+# Category membership (list_core / list_nc_diff / list_simulate_diff)
+category_index = CategoryIndex()
+
+# Encoded bodies of the large JSON endpoints, with ETag / 304 support
+response_cache = ResponseCache()
+
+# Testcases per page on the server-rendered /testcases page
+PAGE_SIZE = 500
+# error_type values understood by /error_testcases
+ERROR_TYPES = CATEGORY_NAMES + ('tag',)
 
 def get_clustered_data():
-    """Return clustered data for the summary table (REAL data from testcases.txt and error lists)"""
-    # Read real testcases
-    testcase_file = os.path.join('scripts', 'result_reg', 'testcases.txt')
-    testcases = read_testcases(testcase_file)
-    data = analyze_testcases(testcases)
-    clusters = {}
-    for row in data:
-        tc_path, cmd, err, tag = row
-        if cmd not in clusters:
-            clusters[cmd] = {}
-        if tag not in clusters[cmd]:
-            clusters[cmd][tag] = {'error_message': err, 'testcases': []}
-        clusters[cmd][tag]['testcases'].append(tc_path)
-    # Prepare summary for frontend
-    summary = []
-    for cmd, tag_dict in clusters.items():
-        unique = len(tag_dict)
-        total = sum(len(v['testcases']) for v in tag_dict.values())
-        summary.append({
-            'failing_command': cmd,
-            'unique_failures': unique,
-            'total_failures': total,
-            'tags': [
-                {
-                    'tag': tag,
-                    'error_message': tag_dict[tag]['error_message'],
-                    'count': len(tag_dict[tag]['testcases'])
-                } for tag in tag_dict
-            ]
-        })
-    # Sort by total_failures in descending order
-    summary.sort(key=lambda x: x['total_failures'], reverse=True)
-    # Add S.No after sorting
-    for i, item in enumerate(summary, 1):
-        item['sno'] = i
-    return summary, clusters
+    """Return clustered data for the summary table from the current analysis snapshot"""
+    snapshot = snapshot_store.current()
+    return snapshot.summary, snapshot.clusters
+
+def query_listing(snapshot, args, default_limit=None, **filters):
+    """Run a paged listing query against the snapshot's indexes.
+
+    `filters` fix query fields (e.g. the command/tag of a details route) over
+    whatever the request passed. Returns (row ids, paging metadata)."""
+    params = parse_listing_args(args, default_limit or DEFAULT_LIMIT)
+    params.update(filters)
+    ids = index_for(snapshot).query(
+        command=params['command'], tag=params['tag'], category=params['category'],
+        prefix=params['prefix'], sort=params['sort'], category_index=category_index)
+    return page(ids, snapshot.version, params['limit'], params['offset'], params['cursor'])
+
+def listing_error(e):
+    return jsonify({'error': str(e)}), 409 if isinstance(e, StaleCursor) else 400
+
+def snapshot_payload(snapshot):
+    return {
+        "total_cases": snapshot.total_cases,
+        "filtered_cases": len(snapshot.rows),
+        "generated_on": snapshot.built_at,
+        "version": snapshot.version,
+        "testcases": snapshot.rows.dicts()
+    }
+
+def snapshot_response(snapshot):
+    return jsonify(snapshot_payload(snapshot))
+
+def snapshot_validators(snapshot):
+    """(version, last modified) of data derived from a snapshot only.
+
+    built_at is part of the version so a restarted server, whose versions
+    start again at 1, never matches an old ETag."""
+    built = datetime.strptime(snapshot.built_at, "%Y-%m-%d %H:%M:%S").timestamp()
+    return f"{snapshot.version}@{snapshot.built_at}", built
+
+def cached_snapshot_json(name, snapshot, build):
+    version, last_modified = snapshot_validators(snapshot)
+    return response_cache.json_response(name, version, last_modified, build)
+
+def cached_category_json(name, build):
+    """Cached response for data from the snapshot and the category lists"""
+    snapshot = snapshot_store.current()
+    category_index.refresh()
+    version, last_modified = snapshot_validators(snapshot)
+    list_modified = category_index.last_modified()
+    if list_modified is not None:
+        last_modified = max(last_modified, list_modified)
+    return response_cache.json_response(name, f"{version}/{category_index.stamp()}", last_modified,
+                                        lambda: build(category_index.tables(snapshot)))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics_registry.observe_request(endpoint, request.method, response.status_code,
+                                         time.perf_counter() - started)
+    return response
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Scan phase and request metrics, as Prometheus text or ?format=json"""
+    if request.args.get('format') == 'json':
+        return jsonify(metrics_registry.as_dict())
+    return Response(metrics_registry.prometheus(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def encode_refresh_event(record, fmt):
+    if fmt == 'sse':
+        return f"event: {record['type']}\ndata: {json.dumps(record)}\n\n"
+    return json.dumps(record) + '\n'
+
+def stream_job_events(job, fmt):
+    """Encode the refresh events of an analysis job as NDJSON lines or
+    server-sent events, ending with an error record if it published nothing"""
+    for kind, payload in job.events():
+        if kind == 'row':
+            record = {'type': 'row', 'row': row_as_dict(payload)}
+        elif kind == 'progress':
+            record = {'type': 'progress', 'scanned': payload[0], 'total': payload[1]}
+        else:
+            record = {
+                'type': 'done',
+                'version': payload.version,
+                'total_cases': payload.total_cases,
+                'filtered_cases': len(payload.rows),
+                'timed_out_cases': len(payload.timed_out),
+                'generated_on': payload.built_at
+            }
+        yield encode_refresh_event(record, fmt)
+    if job.state != 'done':
+        yield encode_refresh_event({'type': 'error', 'state': job.state,
+                                    'error': job.error or f'Analysis job was {job.state}'}, fmt)
+
 @app.route('/api/testcases')
 def get_testcases():
-    """API endpoint to get testcase data (REAL data from testcases.txt)"""
+    """API endpoint to get testcase data (REAL data from testcases.txt).
+
+    With ?stream=ndjson or ?stream=sse a fresh scan is run (or the one in
+    flight attached to) as an analysis job, and every row is sent as soon
+    as it is scanned, interleaved with progress records."""
+    fmt = request.args.get('stream')
+    if not fmt and 'text/event-stream' in request.headers.get('Accept', ''):
+        fmt = 'sse'
+    if fmt:
+        if fmt not in ('ndjson', 'sse'):
+            return jsonify({"error": "stream must be 'ndjson' or 'sse'"}), 400
+        mimetype = 'text/event-stream' if fmt == 'sse' else 'application/x-ndjson'
+        # The scan runs in the job's thread; the response only reads its
+        # events, so a slow client does not hold the refresh lock
+        job, started = job_manager.submit(DEFAULT_TESTCASE_FILE)
+        return Response(stream_with_context(stream_job_events(job, fmt)), mimetype=mimetype,
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no',
+                                 'X-Analysis-Job': job.id})
     try:
-        testcase_file = os.path.join('scripts', 'result_reg', 'testcases.txt')
-        testcases = read_testcases(testcase_file)
-        data = []
-        rows = analyze_testcases(testcases)
-        for row in rows:
-            data.append({
-                "testcase_path": row[0],
-                "failing_command": row[1],
-                "error_message": row[2],
-                "tag": row[3]
-            })
-        # Update global data for chatbot
-        global analyzed_data, clustered_data
-        analyzed_data = data
-        clustered_data, _ = get_clustered_data()
-        # Save analyzed data to file for chatbot
-        with open('analyzed_testcases.json', 'w') as f:
-            json.dump(data, f, indent=2)
-        return jsonify({
-            "total_cases": len(testcases),
-            "filtered_cases": len(data),
-            "generated_on": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "testcases": data
-        })
+        snapshot = snapshot_store.current()
+        if not wants_listing(request.args):
+            return cached_snapshot_json('testcases', snapshot, lambda: snapshot_payload(snapshot))
+        try:
+            ids, meta = query_listing(snapshot, request.args)
+        except ValueError as e:
+            return listing_error(e)
+        return jsonify(dict(meta,
+            total_cases=snapshot.total_cases,
+            filtered_cases=len(snapshot.rows),
+            generated_on=snapshot.built_at,
+            testcases=snapshot.rows.dicts(ids)
+        ))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def job_response(job, started):
+    """202 with the status of a job that was started or attached to"""
+    response = jsonify(dict(job.as_dict(), started=started))
+    response.status_code = 202
+    response.headers['Location'] = url_for('api_job', job_id=job.id)
+    return response
+
+def wants_wait(args):
+    return args.get('wait', '').lower() in ('1', 'true', 'yes')
+
+def run_analysis_job(testcase_file, on_done):
+    """Start (or attach to) the rebuild job for testcase_file.
+
+    Returns 202 with the job status, or with ?wait=1 waits for the job and
+    returns on_done() of the snapshot then being served."""
+    job, started = job_manager.submit(testcase_file)
+    if not wants_wait(request.args):
+        return job_response(job, started)
+    job.wait()
+    if job.state == 'done':
+        return on_done(snapshot_store.current())
+    if job.state == 'cancelled':
+        return jsonify(dict(job.as_dict(), error='Analysis job was cancelled')), 409
+    return jsonify(dict(job.as_dict(), error=job.error)), 500
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
-    """API endpoint to run the actual analysis"""
+    """API endpoint to run the actual analysis as a background job"""
     try:
-        testcases = read_testcases()
-        if not testcases:
+        if not snapshot_store.uses_discovery('testcases.txt') and not read_testcases():
             return jsonify({"error": "No testcases found"}), 404
-        
-        rows = analyze_testcases(testcases)
-        data = []
-        for row in rows:
-            data.append({
-                "testcase_path": row[0],
-                "failing_command": row[1],
-                "error_message": row[2],
-                "tag": row[3]
-            })
-        
-        # Update global data for chatbot
-        global analyzed_data
-        analyzed_data = data
-        
-        return jsonify({
-            "total_cases": len(testcases),
-            "filtered_cases": len(data),
-            "generated_on": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "testcases": data
-        })
+        return run_analysis_job('testcases.txt', snapshot_response)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/refresh', methods=['POST'])
+def api_refresh():
+    """Rebuild the analysis snapshot from scripts/result_reg/testcases.txt"""
+    try:
+        return run_analysis_job(DEFAULT_TESTCASE_FILE, lambda snapshot: jsonify({
+            "version": snapshot.version, "generated_on": snapshot.built_at}))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/jobs')
+def api_jobs():
+    """Analysis jobs, most recent first"""
+    return jsonify({'jobs': [job.as_dict() for job in job_manager.jobs()]})
+
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """Progress of one analysis job (scanned/total, ETA, state)"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job not found: {job_id}'}), 404
+    return jsonify(job.as_dict())
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_job_cancel(job_id):
+    """Stop a queued or running analysis job; nothing of it is published"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': f'Job not found: {job_id}'}), 404
+    return jsonify(job.as_dict())
+
+@app.route('/api/snapshot')
+def api_snapshot():
+    """Version and size of the analysis snapshot currently served"""
+    snapshot = snapshot_store.current()
+    return jsonify({
+        "version": snapshot.version,
+        "generated_on": snapshot.built_at,
+        "source": snapshot.source,
+        "total_cases": snapshot.total_cases,
+        "filtered_cases": len(snapshot.rows),
+        "timed_out_cases": len(snapshot.timed_out),
+        "commands": len(snapshot.clusters)
+    })
+
+@app.route('/api/timed_out')
+def api_timed_out():
+    """Testcases the scan watchdog gave up on in the current snapshot.
+
+    They are missing from every table; each one is rescanned in the
+    background (SCAN_RETRY_DELAY) until it finishes or ran out of retries.
+    POST /api/timed_out/retry rescans them right away."""
+    snapshot = snapshot_store.current()
+    return jsonify({
+        "version": snapshot.version,
+        "testcase_timeout": scan_budget.testcase_timeout,
+        "scan_timeout": scan_budget.scan_timeout,
+        "max_retries": snapshot_store.max_retries,
+        "timed_out": list(snapshot.timed_out)
+    })
+
+@app.route('/api/timed_out/retry', methods=['POST'])
+def api_timed_out_retry():
+    """Rescan the timed-out testcases of the current snapshot now"""
+    snapshot = snapshot_store.retry_timed_out()
+    if snapshot is None:
+        return jsonify({"retried": False, "timed_out": list(snapshot_store.current().timed_out)})
+    return jsonify({"retried": True, "version": snapshot.version, "timed_out": list(snapshot.timed_out)})
+
+@app.route('/api/scan_cache')
+def api_scan_cache():
+    """Hit/miss counters of the incremental scan cache"""
+    if scan_cache is None:
+        return jsonify({'enabled': False})
+    stats = scan_cache.stats()
+    stats['enabled'] = True
+    return jsonify(stats)
+
+@app.route('/api/scan_cache/invalidate', methods=['POST'])
+def api_scan_cache_invalidate():
+    """Drop cached scan results, for the given testcases or all of them"""
+    if scan_cache is None:
+        return jsonify({'error': 'Scan cache is disabled'}), 404
+    data = request.get_json(silent=True) or {}
+    testcases = data.get('testcases')
+    if testcases is not None and not isinstance(testcases, list):
+        return jsonify({'error': 'testcases must be a list'}), 400
+    removed = scan_cache.invalidate(testcases)
+    return jsonify({'invalidated': removed, 'stats': scan_cache.stats()})
+
+def int_arg(args, name, default=None):
+    value = args.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+
+@app.route('/api/history/runs')
+def api_history_runs():
+    """Recorded analysis runs, most recent first"""
+    if run_history is None:
+        return jsonify({'error': 'Run history is disabled'}), 404
+    try:
+        limit = int_arg(request.args, 'limit', 50)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'runs': run_history.runs(limit)})
+
+@app.route('/api/history/diff')
+def api_history_diff():
+    """New, fixed and persisting failures between two runs.
+
+    Defaults to the latest run (`to`) against the one before it (`from`) of
+    the same testcases source; ?source= picks the latest run of a source."""
+    if run_history is None:
+        return jsonify({'error': 'Run history is disabled'}), 404
+    try:
+        to_run = int_arg(request.args, 'to')
+        from_run = int_arg(request.args, 'from')
+        limit = int_arg(request.args, 'limit', DEFAULT_LIMIT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if to_run is None:
+        latest = run_history.latest_run_ids(1, request.args.get('source') or None)
+        to_run = latest[0] if latest else None
+    if from_run is None and to_run is not None:
+        from_run = run_history.previous_run_id(to_run)
+    for run_id in (from_run, to_run):
+        if run_id is None or not run_history.has_run(run_id):
+            return jsonify({'error': f'Run not found: {run_id}'}), 404
+    kinds = [k for k in request.args.get('kind', '').split(',') if k] or list(DIFF_KINDS)
+    if any(k not in DIFF_KINDS for k in kinds):
+        return jsonify({'error': f"kind must be one of {', '.join(DIFF_KINDS)}"}), 400
+    diff = run_history.diff(from_run, to_run, kinds, command=request.args.get('command') or None,
+                            tag=request.args.get('tag') or None, limit=limit)
+    result = {'from': from_run, 'to': to_run}
+    for kind, info in diff.items():
+        result[kind] = {'count': info['count'],
+                        'testcases': [row_as_dict(row) for row in info['testcases']]}
+    return jsonify(result)
+
+@app.route('/api/history/trend')
+def api_history_trend():
+    """Failures per tag over the last N runs of one source (oldest first)"""
+    if run_history is None:
+        return jsonify({'error': 'Run history is disabled'}), 404
+    try:
+        runs = int_arg(request.args, 'runs', 10)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    run_ids, trend = run_history.tag_trend(runs, command=request.args.get('command') or None,
+                                           tag=request.args.get('tag') or None,
+                                           source=request.args.get('source') or None)
+    return jsonify({'runs': run_ids, 'tags': trend})
+
 @app.route('/api/clustered')
 def api_clustered():
-    summary, clusters = get_clustered_data()
-    return jsonify({'summary': summary})
+    snapshot = snapshot_store.current()
+    return cached_snapshot_json('clustered', snapshot, lambda: {
+        'summary': snapshot.summary,
+        'version': snapshot.version,
+        'generated_on': snapshot.built_at
+    })
 
 @app.route('/api/clustered/details')
 def api_clustered_details():
     cmd = request.args.get('command')
     tag = request.args.get('tag')
-    _, clusters = get_clustered_data()
+    snapshot = snapshot_store.current()
+    clusters = snapshot.clusters
     if cmd in clusters and tag in clusters[cmd]:
-        return jsonify({
+        result = {
             'command': cmd,
             'tag': tag,
             'error_message': clusters[cmd][tag]['error_message'],
-            'testcases': clusters[cmd][tag]['testcases']
-        })
+            'testcases': snapshot.rows.paths_for(clusters[cmd][tag]['testcases'])
+        }
+        if wants_listing(request.args, ignore=('command', 'tag')):
+            try:
+                ids, meta = query_listing(snapshot, request.args, command=cmd, tag=tag)
+            except ValueError as e:
+                return listing_error(e)
+            result.update(meta)
+            result['testcases'] = snapshot.rows.paths_for(ids)
+        return jsonify(result)
     return jsonify({'error': 'Not found'}), 404
 
 @app.route('/testcases')
 def testcase_paths_page():
     cmd = request.args.get('command')
     tag = request.args.get('tag')
-    _, clusters = get_clustered_data()
+    snapshot = snapshot_store.current()
+    clusters = snapshot.clusters
     testcase_paths = []
     error_message = ''
+    meta = None
     if cmd in clusters and tag in clusters[cmd]:
-        testcase_paths = clusters[cmd][tag]['testcases']
         error_message = clusters[cmd][tag]['error_message']
-    return render_template('testcase_paths.html', command=cmd, tag=tag, error_message=error_message, testcase_paths=testcase_paths)
+        try:
+            ids, meta = query_listing(snapshot, request.args, default_limit=PAGE_SIZE,
+                                      command=cmd, tag=tag)
+        except ValueError as e:
+            return listing_error(e)
+        testcase_paths = snapshot.rows.paths_for(ids)
+    return render_template('testcase_paths.html', command=cmd, tag=tag, error_message=error_message,
+                           testcase_paths=testcase_paths, page=meta)
 
 @app.route('/api/msghelp', methods=['POST'])
 def api_msghelp():
@@ -235,12 +494,20 @@ def api_msghelp():
     if not re.match(r'^[A-Z]{3,4}-\d+$', error_id):
         return jsonify({'error': 'Invalid error ID format.'}), 400
     try:
-        result = subprocess.run(['msgHelp', error_id], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=10)
-        output = result.stdout.strip() or result.stderr.strip() or 'No output.'
-        return jsonify({'output': output})
+        return jsonify({'output': msghelp_cache.get(error_id)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/response_cache')
+def api_response_cache():
+    """Build/hit/304 counters of the encoded response cache"""
+    return jsonify(response_cache.stats())
+
+@app.route('/api/msghelp/stats')
+def api_msghelp_stats():
+    """msgHelp cache and concurrency counters"""
+    return jsonify(msghelp_cache.stats())
+
 @app.route('/api/chatbot', methods=['POST'])
 def api_chatbot():
     """Advanced chatbot endpoint for data analysis queries"""
@@ -320,57 +587,7 @@ def api_chatbot_export():
 @app.route('/api/error_table')
 def error_table():
     """API endpoint to get the enhanced error summary table by Failing Command"""
-    import json
-    base_dir = os.path.join('scripts', 'result_reg')
-    def read_list(filename):
-        path = os.path.join(base_dir, filename)
-        if not os.path.exists(path):
-            return set()
-        with open(path) as f:
-            return set(line.strip() for line in f if line.strip())
-    # Read error lists
-    core = read_list('list_core')
-    nc_diff = read_list('list_nc_diff')
-    simulate_diff = read_list('list_simulate_diff')
-    # Get clustered data (by Failing Command)
-    summary, clusters = get_clustered_data()
-    rows = []
-    s_no = 1
-    for item in summary:
-        cmd = item['failing_command']
-        # All testcases for this command
-        all_tcs = []
-        for taginfo in item['tags']:
-            tag = taginfo['tag']
-            if cmd in clusters and tag in clusters[cmd]:
-                all_tcs.extend(clusters[cmd][tag]['testcases'])
-        all_tcs = set(all_tcs)
-        # Testcases in each error file
-        core_tcs = list(all_tcs & core)
-        nc_diff_tcs = list(all_tcs & nc_diff)
-        simulate_diff_tcs = list(all_tcs & simulate_diff)
-        others_tcs = [tc for tc in all_tcs if tc not in core and tc not in nc_diff and tc not in simulate_diff]
-        # Count in each error file
-        core_count = len(core_tcs)
-        nc_diff_count = len(nc_diff_tcs)
-        simulate_diff_count = len(simulate_diff_tcs)
-        others_count = len(others_tcs)
-        row = {
-            'sno': s_no,
-            'failing_command': cmd,
-            'core_error': core_count,
-            'core_error_testcases': core_tcs[:3],
-            'nc_diff_error': nc_diff_count,
-            'nc_diff_error_testcases': nc_diff_tcs[:3],
-            'simulate_diff_error': simulate_diff_count,
-            'simulate_diff_error_testcases': simulate_diff_tcs[:3],
-            'make_error': '',
-            'others': others_count,
-            'others_error_testcases': others_tcs[:3]
-        }
-        rows.append(row)
-        s_no += 1
-    return jsonify({'table': rows})
+    return cached_category_json('error_table', lambda tables: {'table': tables.error_table})
 
 @app.route('/error_testcases')
 def error_testcases():
@@ -378,37 +595,29 @@ def error_testcases():
     command = request.args.get('command')
     error_type = request.args.get('error_type')
     tag = request.args.get('tag')
-    import os
-    base_dir = os.path.join('scripts', 'result_reg')
-    def read_list(filename):
-        path = os.path.join(base_dir, filename)
-        if not os.path.exists(path):
-            return set()
-        with open(path) as f:
-            return set(line.strip() for line in f if line.strip())
-    core = read_list('list_core')
-    nc_diff = read_list('list_nc_diff')
-    simulate_diff = read_list('list_simulate_diff')
-    summary, clusters = get_clustered_data()
-    testcases = set()
-    if command in clusters:
-        if error_type == 'tag' and tag:
-            if tag in clusters[command]:
-                testcases = set(clusters[command][tag]['testcases'])
-        else:
-            for t in clusters[command]:
-                tcs = set(clusters[command][t]['testcases'])
-                if error_type == 'core':
-                    testcases |= (tcs & core)
-                elif error_type == 'nc_diff':
-                    testcases |= (tcs & nc_diff)
-                elif error_type == 'simulate_diff':
-                    testcases |= (tcs & simulate_diff)
-                elif error_type == 'others':
-                    testcases |= (tcs - core - nc_diff - simulate_diff)
-                elif error_type == 'all':
-                    testcases |= tcs
-    return jsonify({'testcases': sorted(testcases)})
+    snapshot = snapshot_store.current()
+    if wants_listing(request.args, ignore=('command', 'tag')):
+        filters = {'command': command, 'sort': request.args.get('sort') or 'path'}
+        if error_type == 'tag':
+            filters['tag'] = tag
+        elif error_type != 'all':
+            filters['category'] = error_type
+        if error_type not in ERROR_TYPES or (error_type == 'tag' and not tag):
+            return jsonify({'testcases': [], 'total_matches': 0, 'next_cursor': None})
+        try:
+            ids, meta = query_listing(snapshot, request.args, **filters)
+        except ValueError as e:
+            return listing_error(e)
+        return jsonify(dict(meta, testcases=snapshot.rows.paths_for(ids)))
+    testcases = []
+    if error_type == 'tag':
+        if tag and command in snapshot.clusters and tag in snapshot.clusters[command]:
+            testcases = sorted(set(snapshot.rows.paths_for(snapshot.clusters[command][tag]['testcases'])))
+    else:
+        by_command = category_index.tables(snapshot).by_command
+        if command in by_command and error_type in by_command[command]:
+            testcases = snapshot.rows.paths_for(by_command[command][error_type])
+    return jsonify({'testcases': testcases})
 
 @app.route('/error_testcases_page')
 def error_testcases_page():
@@ -417,58 +626,14 @@ def error_testcases_page():
 @app.route('/api/combined_table')
 def combined_table():
     """API endpoint for the combined summary table by Failing Command"""
-    import os
-    base_dir = os.path.join('scripts', 'result_reg')
-    def read_list(filename):
-        path = os.path.join(base_dir, filename)
-        if not os.path.exists(path):
-            return set()
-        with open(path) as f:
-            return set(line.strip() for line in f if line.strip())
-    core = read_list('list_core')
-    nc_diff = read_list('list_nc_diff')
-    simulate_diff = read_list('list_simulate_diff')
-    # Get clustered data (by Failing Command)
-    summary, clusters = get_clustered_data()
-    rows = []
-    s_no = 1
-    for item in summary:
-        cmd = item['failing_command']
-        # All testcases and tags for this command
-        all_tcs = []
-        tag_counts = {}
-        for taginfo in item['tags']:
-            tag = taginfo['tag']
-            tag_count = 0
-            if cmd in clusters and tag in clusters[cmd]:
-                tcs = clusters[cmd][tag]['testcases']
-                all_tcs.extend(tcs)
-                tag_count = len(tcs)
-            tag_counts[tag] = tag_count
-        all_tcs = set(all_tcs)
-        # Error type counts
-        core_count = len(all_tcs & core)
-        nc_diff_count = len(all_tcs & nc_diff)
-        simulate_diff_count = len(all_tcs & simulate_diff)
-        others_count = len([tc for tc in all_tcs if tc not in core and tc not in nc_diff and tc not in simulate_diff])
-        # Top tags (by count)
-        top_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-        top_tags = [{'tag': t, 'count': c} for t, c in top_tags if c > 0]
-        row = {
-            'sno': s_no,
-            'failing_command': cmd,
-            'total_failures': len(all_tcs),
-            'unique_tags': len(tag_counts),
-            'core_error': core_count,
-            'nc_diff_error': nc_diff_count,
-            'simulate_diff_error': simulate_diff_count,
-            'make_error': '',
-            'others': others_count,
-            'top_tags': top_tags
-        }
-        rows.append(row)
-        s_no += 1
-    return jsonify({'table': rows})
+    return cached_category_json('combined_table', lambda tables: {'table': tables.combined_table})
+
+if SHARED_SNAPSHOT:
+    # Every worker starts the refresher; only one of them holds the lock to run it
+    snapshot_store.start_background_refresh(SNAPSHOT_REFRESH_INTERVAL)
 
 if __name__ == '__main__':
+    # Only start the refresher in the serving process, not the reloader parent
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        snapshot_store.start_background_refresh(SNAPSHOT_REFRESH_INTERVAL)
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
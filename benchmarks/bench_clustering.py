@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Time clustering of untagged error lines on a synthetic error corpus.
+
+Lines are drawn from a few hundred message templates with one word
+replaced in half of them and a random number and path appended, so most
+lines are distinct after normalization. Also reports how many new clusters
+an exhaustive comparison against every cluster would have merged on a
+sample (LSH misses).
+
+Usage: python benchmarks/bench_clustering.py [lines]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from error_clustering import ErrorClusterer, jaccard, normalize_error, shingles
+
+def error_lines(count, templates=300, seed=0):
+    rng = random.Random(seed)
+    vocab = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+             for _ in range(2000)]
+    messages = [[rng.choice(vocab) for _ in range(rng.randint(3, 6))] for _ in range(templates)]
+    lines = []
+    for _ in range(count):
+        words = list(rng.choice(messages))
+        if rng.random() < 0.5:
+            words[rng.randrange(len(words))] = rng.choice(vocab)
+        lines.append(f"> ERROR: {' '.join(words)} {rng.randint(0, 9999)} /r/{rng.randint(0, 99)}/f.v")
+    return lines
+
+def lsh_misses(lines):
+    clusterer = ErrorClusterer()
+    representatives = []
+    missed = 0
+    for line in lines:
+        before = len(clusterer)
+        clusterer.assign(line)
+        if len(clusterer) > before:
+            grams = shingles(normalize_error(line))
+            missed += any(jaccard(grams, rep) >= clusterer.threshold for rep in representatives)
+            representatives.append(grams)
+    return missed, len(clusterer)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    lines = error_lines(count)
+    clusterer = ErrorClusterer()
+    start = time.perf_counter()
+    for line in lines:
+        clusterer.assign(line)
+    elapsed = time.perf_counter() - start
+    distinct = len({normalize_error(line) for line in lines})
+    print(f"{count} lines, {distinct} distinct normalized, {len(clusterer)} clusters: "
+          f"{elapsed:.2f}s ({elapsed / count * 1e6:.0f} us/line)")
+    missed, clusters = lsh_misses(lines[:5000])
+    print(f"LSH misses on the first 5000 lines: {missed} of {clusters} clusters")
+
+if __name__ == '__main__':
+    main()
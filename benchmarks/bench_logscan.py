@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Compare line-by-line log scanning with logscan on synthetic large files.
+
+Usage: python benchmarks/bench_logscan.py [size_mb]
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logscan import find_first_error_line, find_status_failing_command
+
+def legacy_first_error_line(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip().startswith('>') and "ERROR" in line:
+                return line.strip()
+    return None
+
+def legacy_status_command(path):
+    with open(path) as f:
+        for line in f:
+            m = re.match(r".*EXIT STATUS for (\w+) is 5", line)
+            if m:
+                return m.group(1)
+    return None
+
+def write_diff(path, size):
+    block = "".join(f"< sim value {i} = 0x{i:08x}\n> sim value {i} = 0x{i + 1:08x}\n"
+                    for i in range(1000)).encode()
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            f.write(block)
+            written += len(block)
+        f.write(b"> ERROR: mismatch at end of run (SIM-042)\n")
+
+def write_status(path, size):
+    block = "".join(f"EXIT STATUS for step{i} is 0\n" for i in range(1000)).encode()
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            f.write(block)
+            written += len(block)
+        f.write(b"EXIT STATUS for simulate is 5\n")
+
+def timed(func, path, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    size = int(float(sys.argv[1] if len(sys.argv) > 1 else 64) * (1 << 20))
+    with tempfile.TemporaryDirectory() as tmp:
+        diff = os.path.join(tmp, 'simulate.diff.bak')
+        status = os.path.join(tmp, 'status.log')
+        write_diff(diff, size)
+        write_status(status, size)
+        for label, path, old, new in (('diff.bak', diff, legacy_first_error_line, find_first_error_line),
+                                      ('status.log', status, legacy_status_command, find_status_failing_command)):
+            old_time, old_result = timed(old, path)
+            new_time, new_result = timed(new, path)
+            assert old_result == new_result, (old_result, new_result)
+            mb = os.path.getsize(path) / (1 << 20)
+            print(f"{label:<11} {mb:8.1f} MB  line-by-line {old_time:7.3f}s  "
+                  f"logscan {new_time:7.3f}s  speedup {old_time / new_time:6.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Memory held by one analysis snapshot: tuple rows vs RowTable.
+
+Usage: python benchmarks/bench_memory.py [testcases]
+"""
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results_io import row_as_dict
+from rowtable import RowDicts, RowTable
+from snapshot import cluster_rows
+
+COMMANDS = ('compile', 'elaborate', 'simulate', 'nc', 'coverage')
+
+def synthetic_rows(count):
+    """Rows as the scanner returns them: fresh strings for every row"""
+    for i in range(count):
+        tag = f"TTM-{i % 250:03d}"
+        yield [f"/proj/regress/block{i % 40}/suite{i % 300}/testcase_{i:06d}",
+               ''.join(COMMANDS[i % len(COMMANDS)]),
+               f"> ERROR: check {i % 250} failed ({tag})"[:45],
+               ''.join(tag)]
+
+def legacy_snapshot(rows):
+    """Previous layout: tuple rows, path tuples per cluster, dict rows for the chatbot"""
+    rows = tuple(tuple(row) for row in rows)
+    clusters = {}
+    for tc_path, cmd, err, tag in rows:
+        info = clusters.setdefault(cmd, {}).setdefault(tag, {'error_message': err, 'testcases': []})
+        info['testcases'].append(tc_path)
+    for tag_dict in clusters.values():
+        for info in tag_dict.values():
+            info['testcases'] = tuple(info['testcases'])
+    chatbot_rows = [row_as_dict(row) for row in rows]
+    return rows, clusters, chatbot_rows
+
+def compact_snapshot(rows):
+    table = RowTable(rows)
+    _, clusters = cluster_rows(table)
+    return table, clusters, RowDicts(table)
+
+def measure(build, count):
+    tracemalloc.start()
+    result = build(synthetic_rows(count))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{count} testcases")
+    for label, build in (('tuple rows', legacy_snapshot), ('RowTable', compact_snapshot)):
+        current, peak = measure(build, count)
+        print(f"{label:<11} retained {current / 2**20:7.1f} MB  peak {peak / 2**20:7.1f} MB")
+
+if __name__ == '__main__':
+    main()
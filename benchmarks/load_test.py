@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Measure dashboard throughput for different serve.py worker counts.
+
+Starts `serve.py --workers N` on a synthetic tree (see synth_tree.py) for
+each N, waits for the first analysis, then lets client processes request
+a mix of read endpoints for a fixed time. Prints requests/s and latency
+percentiles per worker count. Throughput can only scale up to the number
+of CPU cores shared by the server and the clients.
+
+Usage: python benchmarks/load_test.py [--workers 1,2,4] [--clients C]
+       [--duration S] [--testcases N] [--tree DIR] [--output RESULTS.json]
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from synth_tree import generate_tree
+
+STARTUP_TIMEOUT = 300
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def get(port, path, timeout=60):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+def request_mix(port):
+    """Read endpoints a dashboard user hits, with parameters from the live data"""
+    status, body = get(port, '/api/clustered')
+    summary = json.loads(body)['summary']
+    cmd = summary[0]['failing_command']
+    tag = summary[0]['tags'][0]['tag']
+    return [
+        '/api/clustered',
+        f'/api/clustered/details?command={cmd}&tag={tag}',
+        '/api/testcases?limit=100&sort=path',
+        f'/api/testcases?limit=100&command={cmd}',
+        '/api/combined_table',
+        '/api/error_table',
+        '/api/snapshot',
+    ]
+
+def client(port, paths, duration, queue):
+    """Request `paths` round-robin on one keep-alive connection until time is up"""
+    latencies = []
+    errors = 0
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    deadline = time.monotonic() + duration
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    queue.put((latencies, errors))
+
+def wait_until_ready(port, server):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"serve.py exited with status {server.returncode}")
+        try:
+            status, _ = get(port, '/api/snapshot', timeout=STARTUP_TIMEOUT)
+            if status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('serve.py did not become ready')
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def run_load(tree, workers, clients, duration):
+    port = free_port()
+    env = dict(os.environ,
+               PATH=f"{os.path.join(tree, 'bin')}{os.pathsep}{os.environ['PATH']}",
+               SCAN_CACHE=os.path.join(tree, '.scan_cache.json'),
+               HISTORY_DB=os.path.join(tree, 'analysis_history.db'))
+    server = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, 'serve.py'), '--workers', str(workers),
+                               '--host', '127.0.0.1', '--port', str(port), '--no-gunicorn'],
+                              cwd=tree, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port, server)
+        paths = request_mix(port)
+        # Warm every worker's per-snapshot indexes before measuring
+        for _ in range(workers * 2):
+            for path in paths:
+                get(port, path)
+        queue = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=client, args=(port, paths, duration, queue))
+                 for _ in range(clients)]
+        for proc in procs:
+            proc.start()
+        results = [queue.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+    finally:
+        server.terminate()
+        server.wait()
+    latencies = [t for lat, _ in results for t in lat]
+    return {
+        'workers': workers,
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': sum(errors for _, errors in results),
+        'requests_per_second': len(latencies) / duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'p95_ms': percentile(latencies, 0.95) * 1000
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test serve.py with increasing worker counts')
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent client processes')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per worker count')
+    parser.add_argument('--testcases', type=int, default=5000)
+    parser.add_argument('--tree', help='existing synthetic tree to use')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = os.path.abspath(args.tree or tmp)
+        if not args.tree:
+            generate_tree(tree, testcases=args.testcases)
+        print(f"{'workers':>7} {'req/s':>9} {'p50':>9} {'p95':>9} {'errors':>7}   ({os.cpu_count()} CPUs)")
+        for workers in (int(n) for n in args.workers.split(',')):
+            run = run_load(tree, workers, args.clients, args.duration)
+            runs.append(run)
+            print(f"{workers:>7} {run['requests_per_second']:>9.1f} {run['p50_ms']:>7.2f}ms "
+                  f"{run['p95_ms']:>7.2f}ms {run['errors']:>7}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cpus': os.cpu_count(), 'duration': args.duration, 'runs': runs}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
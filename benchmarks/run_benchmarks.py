@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Benchmark the scan, the analysis helpers and every /api endpoint.
+
+A synthetic tree (see synth_tree.py) is generated in a temporary
+directory unless --tree points to an existing one. Results are written
+as JSON to benchmarks/results/<timestamp>.json; pass --compare with an
+earlier results file to print the change per benchmark.
+
+Usage: python benchmarks/run_benchmarks.py [--testcases N] [--repeat R]
+       [--tree DIR] [--compare RESULTS.json] [--output RESULTS.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from synth_tree import generate_tree
+
+# Endpoints that rebuild the snapshot run fewer times
+SLOW_REPEAT = 2
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        'repeat': repeat,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times)
+    }
+
+def api_requests(app_module, snapshot):
+    """(name, method, url, json body, slow) for every /api route.
+
+    Routes are discovered from the URL map so new endpoints are picked up;
+    the ones that need parameters get them from the current snapshot."""
+    summary = snapshot.summary
+    cmd = summary[0]['failing_command'] if summary else ''
+    tag = summary[0]['tags'][0]['tag'] if summary else ''
+    # Rebuilds run as background jobs; wait for them so the scan is timed
+    query = {'/api/clustered/details': f'?command={cmd}&tag={tag}',
+             '/api/analyze': '?wait=1', '/api/refresh': '?wait=1'}
+    bodies = {
+        '/api/msghelp': {'error_id': tag},
+        '/api/chatbot': {'query': f'find {cmd}'},
+        '/api/chatbot/export': {},
+        '/api/scan_cache/invalidate': {'testcases': []},
+    }
+    slow = {'/api/analyze', '/api/refresh'}
+    requests = [
+        ('GET /api/testcases?limit=100&sort=path', 'GET', '/api/testcases?limit=100&sort=path', None, False),
+        ('GET /api/testcases?stream=ndjson', 'GET', '/api/testcases?stream=ndjson', None, True),
+        ('GET /error_testcases?error_type=all', 'GET', f'/error_testcases?command={cmd}&error_type=all', None, False),
+    ]
+    for rule in sorted(app_module.app.url_map.iter_rules(), key=lambda r: r.rule):
+        if not rule.rule.startswith('/api') or rule.arguments:
+            continue
+        if 'GET' in rule.methods:
+            url = rule.rule + query.get(rule.rule, '')
+            requests.append((f'GET {rule.rule}', 'GET', url, None, rule.rule in slow))
+        elif 'POST' in rule.methods:
+            url = rule.rule + query.get(rule.rule, '')
+            requests.append((f'POST {rule.rule}', 'POST', url, bodies.get(rule.rule), rule.rule in slow))
+    return requests
+
+def run(args):
+    results = {}
+    os.environ['PATH'] = f"{os.path.join(args.tree, 'bin')}{os.pathsep}{os.environ['PATH']}"
+    os.environ.setdefault('SCAN_CACHE', os.path.join(args.tree, '.scan_cache.json'))
+    os.environ.setdefault('HISTORY_DB', os.path.join(args.tree, 'analysis_history.db'))
+    os.chdir(args.tree)
+
+    from scanner import analyze_testcases, read_testcases
+    from snapshot import DEFAULT_TESTCASE_FILE
+    import app as app_module
+    from chatbot_logic import analyze_data_for_chatbot, compute_chatbot_analysis
+    from rowtable import RowDicts
+
+    testcases = read_testcases(DEFAULT_TESTCASE_FILE)
+    for backend in ('serial', 'thread', 'process'):
+        results[f'analyze_testcases[{backend}]'] = timed(
+            lambda: analyze_testcases(testcases, backend=backend), args.scan_repeat)
+
+    snapshot = app_module.snapshot_store.refresh()
+    results['get_clustered_data'] = timed(app_module.get_clustered_data, args.repeat)
+    results['compute_chatbot_analysis'] = timed(
+        lambda: compute_chatbot_analysis(RowDicts(snapshot.rows)), args.repeat)
+    results['analyze_data_for_chatbot'] = timed(analyze_data_for_chatbot, args.repeat)
+
+    client = app_module.app.test_client()
+    for name, method, url, body, slow in api_requests(app_module, snapshot):
+        def request():
+            response = client.open(url, method=method, json=body)
+            response.get_data()
+            response.close()
+            return response
+        status = request().status_code
+        results[name] = timed(request, SLOW_REPEAT if slow else args.repeat)
+        results[name]['status'] = status
+    return results, len(testcases)
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    print(f"\n{'benchmark':<48} {'before':>10} {'after':>10} {'change':>8}")
+    for name, timing in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = (timing['median'] / before['median'] - 1) * 100 if before['median'] else 0.0
+        print(f"{name:<48} {before['median'] * 1000:9.2f}ms {timing['median'] * 1000:9.2f}ms {change:+7.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite')
+    parser.add_argument('--testcases', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scan-repeat', type=int, default=1)
+    parser.add_argument('--tree', help='existing synthetic tree to use')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    output = args.output and os.path.abspath(args.output)
+    baseline = args.compare and os.path.abspath(args.compare)
+    with tempfile.TemporaryDirectory() as tmp:
+        if not args.tree:
+            args.tree = tmp
+            generate_tree(tmp, testcases=args.testcases)
+        args.tree = os.path.abspath(args.tree)
+        results, count = run(args)
+
+    for name, timing in results.items():
+        print(f"{name:<48} median {timing['median'] * 1000:9.2f}ms  min {timing['min'] * 1000:9.2f}ms")
+
+    record = {
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'testcases': count,
+        'results': results
+    }
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S.json"))
+    with open(output, 'w') as f:
+        json.dump(record, f, indent=2)
+    print(f"\nResults written to {output}")
+    if baseline:
+        compare(results, baseline)
+
+if __name__ == '__main__':
+    main()
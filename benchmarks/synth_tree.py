@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Generate a synthetic regression tree for benchmarks.
+
+Creates <out>/scripts/result_reg/{testcases.txt,list_core,list_nc_diff,
+list_simulate_diff}, a copy of testcases.txt in <out> for /api/analyze,
+the testcase directories under <out>/regress, and stub `make` and
+`msgHelp` executables in <out>/bin. Put <out>/bin first on PATH and run
+from <out>.
+
+Usage: python benchmarks/synth_tree.py OUT [--testcases N] [--status-kb K]
+       [--diff-kb K] [--makefile-ratio R] [--dynamic-ratio R] [--seed S]
+"""
+
+import argparse
+import os
+import random
+import stat
+
+COMMANDS = ('setup', 'compile', 'elaborate', 'simulate', 'nc', 'coverage')
+TAG_PREFIXES = ('TTM', 'SIM', 'ELB', 'NCX')
+SUITES = ('customer_tests', 'diagnostics_tests', 'flow_tests', 'eta_tests', 'sanity_tests', 'misc_tests')
+
+STUB_MAKE = """#!/bin/sh
+# Stand-in for `make -n`: print the recipe lines of the Makefile
+for f in GNUmakefile makefile Makefile; do
+    if [ -f "$f" ]; then
+        sed -n 's/^\\t[@+-]*//p' "$f"
+        exit 0
+    fi
+done
+echo "make: *** No targets specified and no makefile found.  Stop." >&2
+exit 2
+"""
+
+STUB_MSGHELP = """#!/bin/sh
+echo "$1: synthetic help text for benchmark runs."
+echo "Check the testcase setup and rerun the failing step."
+"""
+
+def _filler(size, make_line):
+    """Lines from make_line(i) until about `size` bytes"""
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        line = make_line(i)
+        lines.append(line)
+        total += len(line)
+        i += 1
+    return ''.join(lines)
+
+def _makefile(commands, dynamic):
+    lines = ['SIM = simtool\n' if dynamic else '', 'all:\n']
+    for cmd in commands:
+        tool = '$(SIM)' if dynamic else 'run'
+        lines.append(f"\t@{tool} {cmd} > testresults/logs/log_{cmd}.log\n")
+    return ''.join(lines)
+
+def _write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def _write_stub(path, text):
+    _write(path, text)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+def generate_tree(out, testcases=1000, status_kb=4, diff_kb=16, makefile_ratio=0.3,
+                  dynamic_ratio=0.05, tags=200, seed=0):
+    """Build the tree and return the list of testcase paths"""
+    rng = random.Random(seed)
+    out = os.path.abspath(out)
+    result_reg = os.path.join(out, 'scripts', 'result_reg')
+    bin_dir = os.path.join(out, 'bin')
+    os.makedirs(result_reg, exist_ok=True)
+    os.makedirs(bin_dir, exist_ok=True)
+    _write_stub(os.path.join(bin_dir, 'make'), STUB_MAKE)
+    _write_stub(os.path.join(bin_dir, 'msgHelp'), STUB_MSGHELP)
+
+    tag_names = [f"{TAG_PREFIXES[i % len(TAG_PREFIXES)]}-{i:03d}" for i in range(tags)]
+    paths = []
+    lists = {'list_core': [], 'list_nc_diff': [], 'list_simulate_diff': []}
+    for n in range(testcases):
+        suite = SUITES[n % len(SUITES)]
+        tc = os.path.join(out, 'regress', suite, f"block{n % 37:02d}", f"tc_{n:06d}")
+        os.makedirs(tc, exist_ok=True)
+        paths.append(tc)
+
+        failing = rng.choice(COMMANDS[1:])
+        steps = COMMANDS[:COMMANDS.index(failing) + 1]
+        # A Pareto-ish tag distribution: a few tags account for most failures
+        tag = tag_names[min(int(rng.paretovariate(1.2)) - 1, tags - 1)]
+        roll = rng.random()
+        if roll < 0.1:
+            error = f"> WARNING: mismatch without issue id {n}\n"
+        else:
+            error = f"> ERROR: {failing} check failed at step {n % 97} ({tag})\n"
+
+        uses_make = rng.random() < makefile_ratio
+        if uses_make:
+            _write(os.path.join(tc, 'Makefile'), _makefile(steps, rng.random() < dynamic_ratio))
+        else:
+            status = _filler(status_kb * 1024, lambda i: f"EXIT STATUS for {steps[i % len(steps)]} is 0\n")
+            _write(os.path.join(tc, 'status.log'), status + f"EXIT STATUS for {failing} is 5\n")
+        # Without a status.log the failing step is found from the make order,
+        # so only steps that differ get a diff there
+        for cmd in (steps[-1:] if uses_make else steps):
+            diff = _filler(diff_kb * 1024, lambda i: f"< value {i} = 0x{i:08x}\n> value {i} = 0x{i + 1:08x}\n")
+            if cmd == failing:
+                diff += error
+            _write(os.path.join(tc, f"{cmd}.diff.bak"), diff)
+
+        category = rng.random()
+        if category < 0.2:
+            lists['list_core'].append(tc)
+        elif category < 0.45:
+            lists['list_nc_diff'].append(tc)
+        elif category < 0.6:
+            lists['list_simulate_diff'].append(tc)
+
+    listing = ''.join(f"{tc}\n" for tc in paths)
+    _write(os.path.join(result_reg, 'testcases.txt'), listing)
+    _write(os.path.join(out, 'testcases.txt'), listing)
+    for name, members in lists.items():
+        _write(os.path.join(result_reg, name), ''.join(f"{tc}\n" for tc in members))
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic regression tree')
+    parser.add_argument('out')
+    parser.add_argument('--testcases', type=int, default=1000)
+    parser.add_argument('--status-kb', type=int, default=4)
+    parser.add_argument('--diff-kb', type=int, default=16)
+    parser.add_argument('--makefile-ratio', type=float, default=0.3)
+    parser.add_argument('--dynamic-ratio', type=float, default=0.05)
+    parser.add_argument('--tags', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    paths = generate_tree(args.out, args.testcases, args.status_kb, args.diff_kb,
+                          args.makefile_ratio, args.dynamic_ratio, args.tags, args.seed)
+    print(f"Generated {len(paths)} testcases in {os.path.abspath(args.out)}")
+    print(f"export PATH={os.path.join(os.path.abspath(args.out), 'bin')}:$PATH")
+
+if __name__ == '__main__':
+    main()
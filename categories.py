@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+from array import array
+from collections import namedtuple
+
+RESULT_REG_DIR = os.path.join('scripts', 'result_reg')
+
+# Category bits stored per testcase path
+CORE = 1
+NC_DIFF = 2
+SIMULATE_DIFF = 4
+
+# (category name, list file, bit)
+CATEGORY_FILES = (
+    ('core', 'list_core', CORE),
+    ('nc_diff', 'list_nc_diff', NC_DIFF),
+    ('simulate_diff', 'list_simulate_diff', SIMULATE_DIFF),
+)
+CATEGORY_NAMES = tuple(name for name, _, _ in CATEGORY_FILES) + ('others', 'all')
+
+# Precomputed per-command views of one snapshot:
+#   by_command     {command: {category: row ids of distinct testcases, by path}}
+#   error_table    rows served by /api/error_table
+#   combined_table rows served by /api/combined_table
+CategoryTables = namedtuple('CategoryTables', ['by_command', 'error_table', 'combined_table'])
+
+class CategoryIndex:
+    """Testcase -> category bitmask index over the list_* files.
+
+    The list files are re-read only when their size or mtime changes, and the
+    per-command tables are computed once per (snapshot, index) version."""
+
+    def __init__(self, base_dir=RESULT_REG_DIR):
+        self.base_dir = base_dir
+        self.masks = {}
+        self.version = 0
+        self._stamps = None
+        self._tables_key = None
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def _file_stamps(self):
+        stamps = []
+        for _, filename, _ in CATEGORY_FILES:
+            try:
+                st = os.stat(os.path.join(self.base_dir, filename))
+                stamps.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def refresh(self):
+        """Reload the list files if any of them changed on disk"""
+        stamps = self._file_stamps()
+        if stamps == self._stamps:
+            return False
+        with self._lock:
+            if stamps == self._stamps:
+                return False
+            masks = {}
+            for _, filename, bit in CATEGORY_FILES:
+                path = os.path.join(self.base_dir, filename)
+                if not os.path.exists(path):
+                    continue
+                with open(path) as f:
+                    for line in f:
+                        tc = line.strip()
+                        if tc:
+                            masks[tc] = masks.get(tc, 0) | bit
+            self.masks = masks
+            self._stamps = stamps
+            self.version += 1
+        return True
+
+    def stamp(self):
+        """Size and mtime of the list files last loaded, for cache validators"""
+        return repr(self._stamps)
+
+    def last_modified(self):
+        """Newest mtime of the loaded list files as a POSIX timestamp, or None"""
+        mtimes = [stamp[0] for stamp in self._stamps or () if stamp]
+        return max(mtimes) / 1e9 if mtimes else None
+
+    def mask(self, tc):
+        return self.masks.get(tc, 0)
+
+    def tables(self, snapshot):
+        self.refresh()
+        key = (snapshot.version, self.version)
+        if self._tables_key != key:
+            tables = build_category_tables(snapshot, self.masks)
+            with self._lock:
+                self._tables, self._tables_key = tables, key
+        return self._tables
+
+def build_category_tables(snapshot, masks):
+    """Bucket every testcase of a snapshot by command and category in one pass"""
+    rows = snapshot.rows
+    paths, command_ids, strings = rows.paths, rows.command_ids, rows.strings
+    buckets = {}
+    last_path = {}
+    # Path order keeps every bucket sorted and puts repeated paths next to each other
+    for i in rows.path_order():
+        cmd_id = command_ids[i]
+        tc = paths[i]
+        if last_path.get(cmd_id) == tc:
+            continue
+        last_path[cmd_id] = tc
+        per_cmd = buckets.get(cmd_id)
+        if per_cmd is None:
+            per_cmd = buckets[cmd_id] = {name: array('I') for name in CATEGORY_NAMES}
+        per_cmd['all'].append(i)
+        mask = masks.get(tc, 0)
+        if not mask:
+            per_cmd['others'].append(i)
+            continue
+        for name, _, bit in CATEGORY_FILES:
+            if mask & bit:
+                per_cmd[name].append(i)
+    by_command = {strings[cmd_id]: per_cmd for cmd_id, per_cmd in buckets.items()}
+
+    error_table = []
+    combined_table = []
+    for s_no, item in enumerate(snapshot.summary, 1):
+        cmd = item['failing_command']
+        cats = by_command[cmd]
+        error_table.append({
+            'sno': s_no,
+            'failing_command': cmd,
+            'core_error': len(cats['core']),
+            'core_error_testcases': rows.paths_for(cats['core'][:3]),
+            'nc_diff_error': len(cats['nc_diff']),
+            'nc_diff_error_testcases': rows.paths_for(cats['nc_diff'][:3]),
+            'simulate_diff_error': len(cats['simulate_diff']),
+            'simulate_diff_error_testcases': rows.paths_for(cats['simulate_diff'][:3]),
+            'make_error': '',
+            'others': len(cats['others']),
+            'others_error_testcases': rows.paths_for(cats['others'][:3])
+        })
+        # Top tags (by count)
+        tag_counts = [(t['tag'], t['count']) for t in item['tags']]
+        top_tags = sorted(tag_counts, key=lambda x: x[1], reverse=True)[:3]
+        combined_table.append({
+            'sno': s_no,
+            'failing_command': cmd,
+            'total_failures': len(cats['all']),
+            'unique_tags': len(tag_counts),
+            'core_error': len(cats['core']),
+            'nc_diff_error': len(cats['nc_diff']),
+            'simulate_diff_error': len(cats['simulate_diff']),
+            'make_error': '',
+            'others': len(cats['others']),
+            'top_tags': [{'tag': t, 'count': c} for t, c in top_tags if c > 0]
+        })
+    return CategoryTables(by_command, error_table, combined_table)
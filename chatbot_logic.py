@@ -1,84 +1,145 @@
 import re
+import json
+import threading
 from collections import Counter
 import statistics
-from flask import current_app
-import subprocess
 import os
 
+from msghelp import msghelp_cache
+from name_matcher import AhoCorasick
+from results_io import CompactResults
+
+ANALYZED_RESULTS_FILE = 'analyzed_testcases.json'
+COMPACT_RESULTS_FILE = 'analyzed_testcases.cwr'
+
 # Global variables for chatbot data
 analyzed_data = []
 clustered_data = []
 
-def set_analyzed_data(data):
-    global analyzed_data
-    analyzed_data = data
+# Version of analyzed_data: ('published', n) once results are pushed in by the
+# app, otherwise ('file', path, mtime_ns, size) of the results file it was read from
+_data_version = None
+_published_count = 0
+_analysis_cache = (None, {})
+_lookup_cache = (None, None)
+_lock = threading.Lock()
+
+# (pattern name, substrings of the lowercased message; any of them must match)
+ERROR_PATTERN_RULES = (
+    ('license_issues', ('license',)),
+    ('file_not_found', None),  # 'file' together with 'not found' / 'cannot open'
+    ('parameter_issues', ('parameter',)),
+    ('build_issues', ('build',)),
+    ('test_issues', ('test',)),
+)
+
+# Testcases listed per command/tag in "find" answers
+TOP_TESTCASES = 3
+
+PATH_CATEGORIES = (
+    ('customer', 'customer_tests'),
+    ('diagnostics', 'diagnostics_tests'),
+    ('flow', 'flow_tests'),
+    ('eta', 'eta_tests'),
+    ('sanity', 'sanity_tests'),
+    ('misc', 'misc_tests'),
+)
+
+def set_analyzed_data(data, version=None):
+    """Publish new analysis results; the chatbot analysis is recomputed lazily"""
+    global analyzed_data, _data_version, _published_count
+    with _lock:
+        _published_count += 1
+        analyzed_data = data
+        _data_version = ('published', version if version is not None else _published_count)
 
 def get_analyzed_data():
     return analyzed_data
 
-def analyze_data_for_chatbot():
-    # Load analyzed data from file if it exists
-    global analyzed_data
-    if os.path.exists('analyzed_testcases.json'):
-        import json
-        with open('analyzed_testcases.json', 'r') as f:
-            analyzed_data = json.load(f)
-    if not analyzed_data:
-        return {}
+def _newest_results_file():
+    """(path, stat) of the most recently written results file, or None"""
+    newest = None
+    for path in (COMPACT_RESULTS_FILE, ANALYZED_RESULTS_FILE):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if newest is None or st.st_mtime_ns > newest[1].st_mtime_ns:
+            newest = (path, st)
+    return newest
+
+def _load_results_file():
+    """Reload the results file when it changed since it was last read.
+
+    The compact file is preferred; analyzed_testcases.json is used when it
+    is the only one or was written more recently."""
+    global analyzed_data, _data_version
+    newest = _newest_results_file()
+    if newest is None:
+        return
+    path, st = newest
+    version = ('file', path, st.st_mtime_ns, st.st_size)
+    if version == _data_version:
+        return
+    if path == COMPACT_RESULTS_FILE:
+        data = CompactResults(path)
+    else:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    with _lock:
+        analyzed_data = data
+        _data_version = version
+
+def compute_chatbot_analysis(data):
+    """Aggregate everything the chatbot reports on in a single pass over the data"""
+    command_stats = Counter()
+    tag_stats = Counter()
+    error_patterns = {}
+    path_analysis = {}
+    command_tag_correlation = {}
+    for item in data:
+        cmd = item['failing_command']
+        tag = item['tag']
+        command_stats[cmd] += 1
+        tag_stats[tag] += 1
+        correlation = command_tag_correlation.get(cmd)
+        if correlation is None:
+            correlation = command_tag_correlation[cmd] = Counter()
+        correlation[tag] += 1
+
+        error_msg = item['error_message']
+        if 'ERROR' in error_msg:
+            msg = error_msg.lower()
+            for name, needles in ERROR_PATTERN_RULES:
+                if needles is None:
+                    matched = 'file' in msg and ('not found' in msg or 'cannot open' in msg)
+                else:
+                    matched = any(needle in msg for needle in needles)
+                if matched:
+                    error_patterns[name] = error_patterns.get(name, 0) + 1
+
+        path = item['testcase_path']
+        for needle, name in PATH_CATEGORIES:
+            if needle in path:
+                path_analysis[name] = path_analysis.get(name, 0) + 1
+
     analysis = {
-        'total_failures': len(analyzed_data),
-        'unique_commands': len(set(item['failing_command'] for item in analyzed_data)),
-        'unique_tags': len(set(item['tag'] for item in analyzed_data)),
-        'command_stats': Counter(item['failing_command'] for item in analyzed_data),
-        'tag_stats': Counter(item['tag'] for item in analyzed_data),
-        'most_common_command': None,
-        'most_common_tag': None,
+        'total_failures': len(data),
+        'unique_commands': len(command_stats),
+        'unique_tags': len(tag_stats),
+        'command_stats': command_stats,
+        'tag_stats': tag_stats,
+        'most_common_command': command_stats.most_common(1)[0] if command_stats else None,
+        'most_common_tag': tag_stats.most_common(1)[0] if tag_stats else None,
         'command_failure_rates': {},
         'tag_failure_rates': {},
-        'error_patterns': {},
-        'path_analysis': {},
+        'error_patterns': error_patterns,
+        'path_analysis': path_analysis,
         'severity_analysis': {},
-        'command_tag_correlation': {},
+        'command_tag_correlation': command_tag_correlation,
         'failure_distribution': {}
     }
-    if analysis['command_stats']:
-        analysis['most_common_command'] = analysis['command_stats'].most_common(1)[0]
-    if analysis['tag_stats']:
-        analysis['most_common_tag'] = analysis['tag_stats'].most_common(1)[0]
-    for item in analyzed_data:
-        error_msg = item['error_message']
-        if 'ERROR' in error_msg:
-            if 'license' in error_msg.lower():
-                analysis['error_patterns']['license_issues'] = analysis['error_patterns'].get('license_issues', 0) + 1
-            if 'file' in error_msg.lower() and ('not found' in error_msg.lower() or 'cannot open' in error_msg.lower()):
-                analysis['error_patterns']['file_not_found'] = analysis['error_patterns'].get('file_not_found', 0) + 1
-            if 'parameter' in error_msg.lower():
-                analysis['error_patterns']['parameter_issues'] = analysis['error_patterns'].get('parameter_issues', 0) + 1
-            if 'build' in error_msg.lower():
-                analysis['error_patterns']['build_issues'] = analysis['error_patterns'].get('build_issues', 0) + 1
-            if 'test' in error_msg.lower():
-                analysis['error_patterns']['test_issues'] = analysis['error_patterns'].get('test_issues', 0) + 1
-    for item in analyzed_data:
-        path = item['testcase_path']
-        if 'customer' in path:
-            analysis['path_analysis']['customer_tests'] = analysis['path_analysis'].get('customer_tests', 0) + 1
-        if 'diagnostics' in path:
-            analysis['path_analysis']['diagnostics_tests'] = analysis['path_analysis'].get('diagnostics_tests', 0) + 1
-        if 'flow' in path:
-            analysis['path_analysis']['flow_tests'] = analysis['path_analysis'].get('flow_tests', 0) + 1
-        if 'eta' in path:
-            analysis['path_analysis']['eta_tests'] = analysis['path_analysis'].get('eta_tests', 0) + 1
-        if 'sanity' in path:
-            analysis['path_analysis']['sanity_tests'] = analysis['path_analysis'].get('sanity_tests', 0) + 1
-        if 'misc' in path:
-            analysis['path_analysis']['misc_tests'] = analysis['path_analysis'].get('misc_tests', 0) + 1
-    for item in analyzed_data:
-        cmd = item['failing_command']
-        tag = item['tag']
-        if cmd not in analysis['command_tag_correlation']:
-            analysis['command_tag_correlation'][cmd] = Counter()
-        analysis['command_tag_correlation'][cmd][tag] += 1
-    command_counts = list(analysis['command_stats'].values())
+    command_counts = list(command_stats.values())
     if command_counts:
         analysis['failure_distribution'] = {
             'min_failures': min(command_counts),
@@ -90,6 +151,75 @@ def analyze_data_for_chatbot():
         }
     return analysis
 
+def analyze_data_for_chatbot():
+    """Chatbot analysis of the current data, memoized per data version.
+
+    The returned dict is shared between callers and must not be modified."""
+    global _analysis_cache
+    if _data_version is None or _data_version[0] == 'file':
+        # Nothing published in-process: follow the results file on disk
+        _load_results_file()
+    version, data = _data_version, analyzed_data
+    cached_version, analysis = _analysis_cache
+    if cached_version == version and version is not None:
+        return analysis
+    analysis = compute_chatbot_analysis(data) if data else {}
+    _analysis_cache = (version, analysis)
+    return analysis
+
+def build_lookup_index(data):
+    """Distinct commands and tags with counts and first testcases, plus a
+    matcher that finds every one of their names inside a query"""
+    stats = {}
+    for item in data:
+        for key in (('command', item['failing_command']), ('tag', item['tag'])):
+            entry = stats.get(key)
+            if entry is None:
+                entry = stats[key] = {'count': 0, 'top_testcases': []}
+            entry['count'] += 1
+            if len(entry['top_testcases']) < TOP_TESTCASES:
+                entry['top_testcases'].append(item['testcase_path'])
+    matcher = AhoCorasick((key, key[1].lower()) for key in stats)
+    return matcher, stats
+
+def get_lookup_index():
+    """Lookup index for the current data version (see analyze_data_for_chatbot)"""
+    global _lookup_cache
+    analyze_data_for_chatbot()
+    version, data = _data_version, analyzed_data
+    cached_version, index = _lookup_cache
+    if index is None or cached_version != version:
+        index = build_lookup_index(data or [])
+        _lookup_cache = (version, index)
+    return index
+
+def find_names_in_query(query_lower):
+    """Every command and tag whose name occurs in the query, most failures first"""
+    matcher, stats = get_lookup_index()
+    matches = [(kind, name, stats[(kind, name)]) for kind, name in matcher.find_all(query_lower)]
+    matches.sort(key=lambda m: (m[0] != 'command', -m[2]['count']))
+    return matches
+
+def format_name_matches(matches):
+    if len(matches) == 1:
+        kind, name, entry = matches[0]
+        if kind == 'command':
+            result = f"🔍 Command '{name}' has {entry['count']} failures"
+        else:
+            result = f"🔍 Tag '{name}' has {entry['count']} occurrences"
+        for tc in entry['top_testcases']:
+            result += f"\n  - {tc}"
+        return result
+    result = f"🔍 Found {len(matches)} matching commands/tags:\n"
+    for kind, name, entry in matches:
+        if kind == 'command':
+            result += f"• Command '{name}': {entry['count']} failures\n"
+        else:
+            result += f"• Tag '{name}': {entry['count']} occurrences\n"
+        for tc in entry['top_testcases']:
+            result += f"  - {tc}\n"
+    return result
+
 def process_chatbot_query(query):
     query = query.strip()
     # If query is a valid error tag or starts with msgHelp, run msgHelp
@@ -97,8 +227,7 @@ def process_chatbot_query(query):
     if error_tag_match:
         tag = error_tag_match.group(2)
         try:
-            result = subprocess.run(['msgHelp', tag], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=10)
-            output = result.stdout.strip() or result.stderr.strip() or 'No output.'
+            output = msghelp_cache.get(tag)
             return f"[msgHelp {tag}]:\n{output}"
         except Exception as e:
             return f"Error running msgHelp: {e}"
@@ -150,11 +279,10 @@ def process_chatbot_query(query):
         else:
             return "No path analysis available."
     elif 'specific' in query_lower or 'find' in query_lower or 'failures for' in query_lower:
-        for item in analyzed_data:
-            if item['failing_command'].lower() in query_lower:
-                return f"🔍 Command '{item['failing_command']}' has {analysis['command_stats'][item['failing_command']]} failures"
-            if item['tag'].lower() in query_lower:
-                return f"🔍 Tag '{item['tag']}' has {analysis['tag_stats'][item['tag']]} occurrences"
+        matches = find_names_in_query(query_lower)
+        if matches:
+            return format_name_matches(matches)
+        return "🔍 No failing command or error tag from the current data appears in your query."
     elif 'help' in query_lower or 'what can' in query_lower:
         return (
             "You can ask me things like:\n"
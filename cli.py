@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Headless batch analyzer.
+
+Runs the scan engine without the web app and writes the clustered
+summary, error table and combined table as JSON or CSV, or the scanned
+rows in the compact results format.
+
+With --shard N/M only one shard of the testcases is scanned, and
+--format partial writes its mergeable partial result; --merge combines
+the partials of all shards into the same tables as a full scan.
+
+Usage: python cli.py [TESTCASES_OR_RESULT_DIR] [--format json|csv|compact|partial]
+       [--table summary|error|combined|all] [--output FILE] [--backend NAME]
+       [--workers N] [--cache FILE] [--lists-dir DIR] [--profile FILE]
+       [--discover ROOT ...] [--shard N/M[:hash|root]] [--merge PARTIAL ...]
+       [--testcase-timeout S] [--scan-timeout S]
+
+Only the scan modules are imported (no Flask, no chatbot), so it starts fast.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+from categories import CategoryIndex
+from discovery import DiscoveryWalk
+from metrics import metrics_registry
+from results_io import write_compact_results
+from scan_budget import SCAN_TESTCASE_TIMEOUT, SCAN_TIMEOUT, ScanBudget, TimedOut
+from scan_cache import ScanCache
+from scanner import SCAN_BACKENDS, iter_scan, read_testcases
+from shards import build_partial, load_partial, merge_partials, parse_shard, shard_cache_path, write_partial
+from snapshot import DEFAULT_TESTCASE_FILE, make_snapshot
+
+TABLES = ('summary', 'error', 'combined')
+
+def resolve_source(path):
+    """(testcases file, directory of the list_* files) for a file or result dir"""
+    if os.path.isdir(path):
+        return os.path.join(path, 'testcases.txt'), path
+    return path, os.path.dirname(path) or '.'
+
+def build_report(testcase_file, lists_dir, backend=None, workers=None, cache=None, discover_roots=None,
+                 budget=None):
+    """Scan the testcases of testcase_file, or those found under discover_roots"""
+    if discover_roots:
+        testcases = DiscoveryWalk(discover_roots)
+        source = testcases.source
+    else:
+        testcases = read_testcases(testcase_file)
+        source = testcase_file
+    scanned = 0
+    rows = []
+    timed_out = []
+    for row in metrics_registry.profiled(iter_scan(testcases, backend, workers, cache, budget=budget)):
+        if isinstance(row, TimedOut):
+            timed_out.append(row.as_dict())
+            if row.remaining:
+                if row.count is None and isinstance(testcases, list):
+                    timed_out[-1]['count'] = len(testcases) - scanned
+                continue
+        scanned += 1
+        if row:
+            rows.append(row)
+    snapshot = make_snapshot(rows, 1, source, scanned, timed_out)
+    tables = CategoryIndex(lists_dir).tables(snapshot)
+    return snapshot, tables
+
+def summary_csv_rows(summary):
+    """One CSV row per (command, tag) of the clustered summary"""
+    for item in summary:
+        for tag in item['tags']:
+            yield {
+                'sno': item['sno'],
+                'failing_command': item['failing_command'],
+                'unique_failures': item['unique_failures'],
+                'total_failures': item['total_failures'],
+                'tag': tag['tag'],
+                'error_message': tag['error_message'],
+                'count': tag['count']
+            }
+
+def flatten_csv_row(row):
+    flat = {}
+    for key, value in row.items():
+        if key == 'top_tags':
+            value = ';'.join(f"{t['tag']}:{t['count']}" for t in value)
+        elif isinstance(value, list):
+            value = ';'.join(value)
+        flat[key] = value
+    return flat
+
+def write_csv(out, table, snapshot, tables):
+    if table == 'summary':
+        records = list(summary_csv_rows(snapshot.summary))
+    elif table == 'error':
+        records = [flatten_csv_row(row) for row in tables.error_table]
+    else:
+        records = [flatten_csv_row(row) for row in tables.combined_table]
+    if not records:
+        return
+    writer = csv.DictWriter(out, fieldnames=list(records[0]))
+    writer.writeheader()
+    writer.writerows(records)
+
+def report_json(snapshot, tables, table):
+    report = {
+        'generated_on': snapshot.built_at,
+        'source': snapshot.source,
+        'total_cases': snapshot.total_cases,
+        'filtered_cases': len(snapshot.rows),
+        # Testcases given up on by the scan watchdog; not in any table
+        'timed_out': list(snapshot.timed_out)
+    }
+    if table in ('summary', 'all'):
+        report['summary'] = list(snapshot.summary)
+    if table in ('error', 'all'):
+        report['error_table'] = tables.error_table
+    if table in ('combined', 'all'):
+        report['combined_table'] = tables.combined_table
+    return report
+
+def parse_shard_arg(text):
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Analyze testcase failures without the web app')
+    parser.add_argument('source', nargs='?', default=DEFAULT_TESTCASE_FILE,
+                        help='testcases.txt or a result directory containing it '
+                             f'(default {DEFAULT_TESTCASE_FILE})')
+    parser.add_argument('--format', choices=('json', 'csv', 'compact', 'partial'), default='json')
+    parser.add_argument('--table', choices=TABLES + ('all',), default=None,
+                        help='table to output (default: all for JSON, summary for CSV)')
+    parser.add_argument('--output', '-o', help='output file (default stdout; required for compact)')
+    parser.add_argument('--backend', choices=sorted(SCAN_BACKENDS), default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache', help='incremental scan cache file')
+    parser.add_argument('--lists-dir', help='directory of list_core/list_nc_diff/list_simulate_diff')
+    parser.add_argument('--profile', help='write a JSON profile of the scan phases to this file')
+    parser.add_argument('--discover', action='append', metavar='ROOT',
+                        help='find testcase directories under ROOT instead of reading a testcases '
+                             'file (repeatable); scanning starts while the walk is running')
+    parser.add_argument('--shard', type=parse_shard_arg, metavar='N/M[:MODE]',
+                        help='scan only shard N of M, by path hash (default) or by root directory')
+    parser.add_argument('--testcase-timeout', type=float, default=None, metavar='SECONDS',
+                        help='give up on a testcase after this long (default SCAN_TESTCASE_TIMEOUT, 0 = no limit)')
+    parser.add_argument('--scan-timeout', type=float, default=None, metavar='SECONDS',
+                        help='stop the scan after this long and report the rest as timed out '
+                             '(default SCAN_TIMEOUT, 0 = no limit)')
+    parser.add_argument('--merge', nargs='+', metavar='PARTIAL',
+                        help='merge the partial results of all shards instead of scanning')
+    args = parser.parse_args(argv)
+    if args.format in ('compact', 'partial') and not args.output:
+        parser.error(f'--format {args.format} needs --output')
+    if args.format == 'partial' and not args.shard:
+        parser.error('--format partial needs --shard')
+    if args.shard and args.format != 'partial':
+        parser.error('--shard writes a partial result; use --format partial')
+    if args.merge and (args.shard or args.discover):
+        parser.error('--merge does not scan; drop --shard/--discover')
+    if args.merge and args.profile:
+        parser.error('--merge does not scan, so there is no --profile to write')
+    if args.format == 'csv' and args.table == 'all':
+        parser.error('--format csv writes one table; pick summary, error or combined')
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    testcase_file, lists_dir = resolve_source(args.source)
+    if args.merge:
+        try:
+            snapshot, tables = merge_partials([load_partial(path) for path in args.merge])
+        except (OSError, ValueError) as e:
+            print(f"❌ ERROR: cannot merge partial results: {e}", file=sys.stderr)
+            return 1
+    elif not args.discover and not os.path.isfile(testcase_file):
+        print(f"❌ ERROR: {testcase_file} not found.", file=sys.stderr)
+        return 1
+    cache = None
+    if args.cache:
+        cache = ScanCache(shard_cache_path(args.cache, args.shard) if args.shard else args.cache)
+    budget = ScanBudget(*(default if value is None else value for value, default in (
+        (args.testcase_timeout, SCAN_TESTCASE_TIMEOUT), (args.scan_timeout, SCAN_TIMEOUT))))
+    if args.shard:
+        partial = build_partial(args.shard, testcase_file, args.lists_dir or lists_dir,
+                                args.backend, args.workers, cache, args.discover, budget)
+        write_partial(partial, args.output)
+        print(f"Shard {args.shard.index + 1}/{args.shard.count}: scanned {partial['scanned']} testcases, "
+              f"{len(partial['rows'])} failures", file=sys.stderr)
+        return 0
+    if not args.merge:
+        snapshot, tables = build_report(testcase_file, args.lists_dir or lists_dir,
+                                        args.backend, args.workers, cache, args.discover, budget)
+
+    if args.format == 'compact':
+        write_compact_results(snapshot.rows, args.output)
+    else:
+        out = open(args.output, 'w', newline='') if args.output else sys.stdout
+        try:
+            if args.format == 'csv':
+                write_csv(out, args.table or 'summary', snapshot, tables)
+            else:
+                json.dump(report_json(snapshot, tables, args.table or 'all'), out, indent=2)
+                out.write('\n')
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+    if args.profile:
+        with open(args.profile, 'w') as f:
+            json.dump(metrics_registry.last_profile, f, indent=2)
+    print(f"Analyzed {snapshot.total_cases} testcases, {len(snapshot.rows)} failures with issue tags",
+          file=sys.stderr)
+    if snapshot.timed_out:
+        count = sum(1 for entry in snapshot.timed_out if entry['reason'] != 'remaining')
+        print(f"❌ ERROR: {count} testcases timed out and are not in the report", file=sys.stderr)
+        for entry in snapshot.timed_out:
+            if entry['reason'] == 'remaining':
+                print(f"❌ ERROR: the scan ran out of time before reading "
+                      f"{entry['count'] if entry['count'] is not None else 'the remaining'} testcases",
+                      file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import os
+import time
+from collections import deque
+
+from make_order import MAKEFILE_NAMES
+from metrics import metrics_registry
+
+# Directory listings in flight at once; high because on NFS each one is
+# mostly waiting on the server
+DISCOVERY_WORKERS = int(os.environ.get('DISCOVERY_WORKERS', '16'))
+# Result roots to walk, separated by os.pathsep
+DISCOVERY_ROOTS = [root for root in os.environ.get('DISCOVERY_ROOTS', '').split(os.pathsep) if root]
+
+# A directory holding any of these is a testcase directory
+MARKER_FILES = frozenset(('status.log',) + MAKEFILE_NAMES)
+MARKER_SUFFIX = '.diff.bak'
+
+# Prefix of snapshot sources that were discovered rather than read from a file
+DISCOVER_PREFIX = 'discover:'
+
+def discovery_source(roots):
+    return DISCOVER_PREFIX + os.pathsep.join(roots)
+
+def _list_dir(path):
+    """(path, is testcase, subdirectories) of one directory.
+
+    Stops reading at the first marker: testcase directories are not
+    descended into. Symlinked directories are not followed."""
+    start = time.perf_counter()
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = entry.name
+                if name in MARKER_FILES or name.endswith(MARKER_SUFFIX):
+                    return path, True, ()
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+    except OSError as e:
+        print(f"❌ ERROR: cannot list {path}: {e}")
+        return path, False, ()
+    finally:
+        metrics_registry.observe('discover_dir', time.perf_counter() - start)
+    return path, False, subdirs
+
+class DiscoveryWalk:
+    """Stream of testcase directories found under `roots`, yielded while the
+    walk is still running so scanning can start right away.
+
+    Directories are listed by a bounded thread pool; `found` counts the
+    testcases yielded so far and `done` is set once the walk finished.
+    Testcases come out in completion order, not sorted. With max_depth,
+    directories more than max_depth levels below a root are not listed."""
+
+    def __init__(self, roots, workers=None, max_depth=None):
+        self.roots = list(roots)
+        self.workers = workers or DISCOVERY_WORKERS
+        self.max_depth = max_depth
+        self.found = 0
+        self.done = False
+
+    @property
+    def source(self):
+        return discovery_source(self.roots)
+
+    def __iter__(self):
+        # Imported on first use to keep startup fast for the CLI
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+        # Depth-first: the stack stays small and the first testcases are
+        # reached quickly even in deep trees
+        stack = deque((root, 0) for root in reversed(self.roots))
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='discover') as executor:
+            while stack or in_flight:
+                while stack and len(in_flight) < self.workers:
+                    path, depth = stack.pop()
+                    in_flight[executor.submit(_list_dir, path)] = depth
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    depth = in_flight.pop(future)
+                    path, is_testcase, subdirs = future.result()
+                    if is_testcase:
+                        self.found += 1
+                        yield path
+                    elif self.max_depth is None or depth < self.max_depth:
+                        stack.extend((subdir, depth + 1) for subdir in sorted(subdirs, reverse=True))
+        self.done = True
+
+def discover_testcases(roots, workers=None, max_depth=None):
+    """All testcase directories under roots, sorted"""
+    return sorted(DiscoveryWalk(roots, workers, max_depth))
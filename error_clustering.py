@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import re
+
+# Untagged error lines are grouped into pseudo-tags named CLUSTER-<hex>;
+# set CLUSTER_UNTAGGED=0 to drop untagged testcases instead
+CLUSTER_UNTAGGED = os.environ.get('CLUSTER_UNTAGGED', '1') == '1'
+CLUSTER_PREFIX = 'CLUSTER-'
+# Minimum Jaccard similarity of shingle sets to join a cluster
+CLUSTER_THRESHOLD = float(os.environ.get('CLUSTER_THRESHOLD', '0.5'))
+
+# One-permutation MinHash signature of LSH_BANDS bands of LSH_ROWS values:
+# lines sharing a whole band are compared exactly. With 16 x 2 a pair of similarity 0.5 is
+# a candidate with probability 1 - (1 - 0.5**2)**16 = 99%.
+LSH_BANDS = 16
+LSH_ROWS = 2
+# Candidates verified per line, the ones sharing the most bands first
+MAX_CANDIDATES = 8
+# Clusters indexed per band bucket; a bucket keeps its oldest clusters so
+# the work per line stays bounded as the number of clusters grows
+BUCKET_LIMIT = 32
+# Hashes kept for this many distinct shingles
+SHINGLE_CACHE_SIZE = 65536
+# Added per bin of distance when an empty bin borrows a neighbour's value
+_DENSIFY_OFFSET = 1 << 64
+
+# Leading diff marker and severity word, shared by nearly every line
+_LEAD_RE = re.compile(r'^[\s>]*(?:(?:error|fatal|warning)\b\s*:?\s*)?')
+_PATH_RE = re.compile(r'(?:[\w.-]*/)+[\w.-]*')
+# 0x-prefixed values and runs of 6+ hex digits containing a digit (ids, hashes)
+_HEX_RE = re.compile(r'\b0x[0-9a-f]+\b|\b(?=[0-9a-f]*\d)[0-9a-f]{6,}\b')
+_NUM_RE = re.compile(r'\d+(?:\.\d+)?')
+_TOKEN_RE = re.compile(r'<\w+>|\w+|[^\w\s]')
+
+def normalize_error(line):
+    """Error line with paths, hex values and numbers masked, lowercased"""
+    text = _LEAD_RE.sub('', line.strip().lower())
+    text = _PATH_RE.sub('<path>', text)
+    text = _HEX_RE.sub('<hex>', text)
+    text = _NUM_RE.sub('<num>', text)
+    return ' '.join(text.split())
+
+def _is_word(token):
+    return token[0] != '<' and (token[0].isalnum() or token[0] == '_')
+
+def shingles(text):
+    """Words and token bigrams of a normalized line.
+
+    Masks and punctuation only count next to a word: on their own they
+    occur in nearly every line and would put everything in the same buckets."""
+    tokens = _TOKEN_RE.findall(text)
+    grams = {token for token in tokens if _is_word(token)}
+    grams.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]) if _is_word(a) or _is_word(b))
+    return frozenset(grams)
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+class ErrorClusterer:
+    """Online near-duplicate clustering of error lines with MinHash/LSH.
+
+    assign() returns the cluster label of a line, creating a cluster when no
+    existing one is similar enough. Only each cluster's first line is indexed
+    and compared against, so lookups cost a few bucket probes instead of a
+    comparison with every earlier line, and clusters do not drift. Identical
+    normalized lines are answered from a dict.
+
+    A label is derived from the first line of its cluster, so it depends on
+    the order lines come in. `known` carries the clusters of an earlier
+    clusterer over (see clusters()): a line similar to one of them gets its
+    label whatever order the lines come in now and whether or not the line
+    that created the cluster is still among them."""
+
+    def __init__(self, threshold=CLUSTER_THRESHOLD, bands=LSH_BANDS, rows=LSH_ROWS, seed=1, known=()):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self._key = seed.to_bytes(8, 'little')
+        self._buckets = [{} for _ in range(bands)]   # band signature -> cluster indexes
+        self._clusters = []                          # (label, shingles, normalized first line)
+        self._labels = set()
+        self._by_text = {}                           # normalized line -> label
+        self._shingle_hashes = {}                    # shingle -> 64-bit hash
+        for label, text in known:
+            if label not in self._labels:
+                grams = shingles(text)
+                self._add(label, text, grams, self._band_keys(grams))
+
+    def __len__(self):
+        return len(self._clusters)
+
+    def clusters(self, labels=None):
+        """(label, normalized first line) of every cluster, or of those with
+        a label in `labels`; what `known` takes"""
+        return [(label, text) for label, _, text in self._clusters if labels is None or label in labels]
+
+    def _hash(self, gram):
+        h = self._shingle_hashes.get(gram)
+        if h is None:
+            if len(self._shingle_hashes) >= SHINGLE_CACHE_SIZE:
+                self._shingle_hashes.clear()
+            h = self._shingle_hashes[gram] = int.from_bytes(
+                hashlib.blake2b(gram.encode(), digest_size=8, key=self._key).digest(), 'little')
+        return h
+
+    def _signature(self, grams):
+        """One-permutation MinHash: every shingle hash goes to one of the
+        bins, which keep their minimum; empty bins borrow the next filled
+        bin's value (rotation densification). One hash per shingle instead
+        of one per shingle and permutation."""
+        size = self.bands * self.rows
+        bins = [None] * size
+        for gram in grams:
+            h = self._hash(gram)
+            slot, value = h % size, h // size
+            if bins[slot] is None or value < bins[slot]:
+                bins[slot] = value
+        if None in bins:
+            filled = [i for i, value in enumerate(bins) if value is not None]
+            if not filled:
+                return [0] * size
+            # Walk backwards so each empty bin sees the nearest filled bin to its right
+            nearest, distance = bins[filled[0]], size - filled[-1] + filled[0]
+            for i in range(size - 1, -1, -1):
+                if bins[i] is None:
+                    distance += 1
+                    bins[i] = nearest + distance * _DENSIFY_OFFSET
+                else:
+                    nearest, distance = bins[i], 0
+        return bins
+
+    def _label(self, text):
+        digest = hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+        for size in range(8, 17, 2):
+            label = CLUSTER_PREFIX + digest[:size]
+            if label not in self._labels:
+                return label
+        return f"{CLUSTER_PREFIX}{digest}-{len(self._clusters)}"
+
+    def assign(self, line):
+        text = normalize_error(line)
+        label = self._by_text.get(text)
+        if label is not None:
+            return label
+        grams = shingles(text)
+        keys = self._band_keys(grams)
+        # Clusters sharing the most bands are the likeliest matches
+        shared_bands = {}
+        for bucket, key in zip(self._buckets, keys):
+            for index in bucket.get(key, ()):
+                shared_bands[index] = shared_bands.get(index, 0) + 1
+        candidates = sorted(shared_bands)
+        if len(candidates) > MAX_CANDIDATES:
+            candidates = sorted(sorted(candidates, key=shared_bands.get, reverse=True)[:MAX_CANDIDATES])
+        # Most similar candidate; the oldest cluster wins ties
+        best, best_similarity = None, -1.0
+        for index in candidates:
+            similarity = jaccard(grams, self._clusters[index][1])
+            if similarity >= self.threshold and similarity > best_similarity:
+                best, best_similarity = index, similarity
+        if best is None:
+            label = self._label(text)
+            self._add(label, text, grams, keys)
+        else:
+            label = self._clusters[best][0]
+        self._by_text[text] = label
+        return label
+
+    def _band_keys(self, grams):
+        signature = self._signature(grams)
+        return [tuple(signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+    def _add(self, label, text, grams, keys):
+        index = len(self._clusters)
+        self._clusters.append((label, grams, text))
+        self._labels.add(label)
+        self._by_text[text] = label
+        for bucket, key in zip(self._buckets, keys):
+            indexes = bucket.setdefault(key, [])
+            if len(indexes) < BUCKET_LIMIT:
+                indexes.append(index)
+
+def is_cluster_tag(tag):
+    return tag.startswith(CLUSTER_PREFIX)
+
+def label_untagged(results, clusterer=None):
+    """Pass scan results through, giving rows without an issue tag the
+    label of their error line's cluster as tag.
+
+    Raw untagged rows carry the full error line as fifth element; the
+    displayed error is truncated, so it is only clustered on without one."""
+    if clusterer is None:
+        # Not `or`: an empty clusterer is falsy
+        clusterer = ErrorClusterer()
+    for row in results:
+        if row and not row[3]:
+            line = row[4] if len(row) > 4 else row[2]
+            row = [row[0], row[1], row[2], clusterer.assign(line)]
+        yield row
+
+def drop_untagged(results):
+    """Pass scan results through, replacing rows without an issue tag by None"""
+    for row in results:
+        yield row if not row or row[3] else None
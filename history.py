@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+import sqlite3
+import threading
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    built_at TEXT NOT NULL,
+    source TEXT,
+    total_cases INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    version INTEGER  -- snapshot version the run was last recorded from
+);
+CREATE INDEX IF NOT EXISTS runs_by_source ON runs (source, id);
+CREATE TABLE IF NOT EXISTS strings (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS failures (
+    run_id INTEGER NOT NULL,
+    testcase_id INTEGER NOT NULL,
+    command_id INTEGER NOT NULL,
+    tag_id INTEGER NOT NULL,
+    error_id INTEGER NOT NULL,
+    PRIMARY KEY (run_id, testcase_id, command_id, tag_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS failures_by_tag ON failures (run_id, tag_id);
+CREATE INDEX IF NOT EXISTS failures_by_command ON failures (run_id, command_id);
+CREATE INDEX IF NOT EXISTS failures_by_testcase ON failures (testcase_id, run_id);
+CREATE TABLE IF NOT EXISTS timed_out (
+    run_id INTEGER NOT NULL,
+    testcase_id INTEGER,  -- NULL for the testcases a scan never read
+    reason TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS timed_out_once ON timed_out (run_id, testcase_id);
+"""
+
+# Databases written before runs.version and timed_out_once existed
+_MIGRATIONS = """
+ALTER TABLE runs ADD COLUMN version INTEGER;
+DELETE FROM timed_out WHERE rowid NOT IN (SELECT MIN(rowid) FROM timed_out GROUP BY run_id, testcase_id);
+DROP INDEX IF EXISTS timed_out_by_run;
+"""
+
+# Maximum number of values bound in one IN (...) list
+SQL_CHUNK = 500
+
+DIFF_KINDS = ('new', 'fixed', 'persisting')
+
+# A failure is one (testcase, command, tag) triple; `new` lists those of the
+# later run missing from the earlier one, `fixed` the reverse. A testcase that
+# timed out in the other run was not scanned there, so it is neither new nor
+# fixed; nothing is when the other run did not read all of its testcases.
+# Every lookup goes through the failures primary key.
+_MISSING_FROM = """
+    SELECT f.testcase_id, f.command_id, f.error_id, f.tag_id FROM failures f
+    WHERE f.run_id = ? {filters} AND NOT EXISTS (
+        SELECT 1 FROM failures o
+        WHERE o.run_id = ? AND o.testcase_id = f.testcase_id
+          AND o.command_id = f.command_id AND o.tag_id = f.tag_id)
+      AND NOT EXISTS (
+        SELECT 1 FROM timed_out t
+        WHERE t.run_id = ? AND (t.testcase_id = f.testcase_id OR t.testcase_id IS NULL))
+"""
+_IN_BOTH = """
+    SELECT f.testcase_id, f.command_id, f.error_id, f.tag_id FROM failures f
+    WHERE f.run_id = ? {filters} AND EXISTS (
+        SELECT 1 FROM failures o
+        WHERE o.run_id = ? AND o.testcase_id = f.testcase_id
+          AND o.command_id = f.command_id AND o.tag_id = f.tag_id)
+"""
+
+class RunHistory:
+    """SQLite store of past analysis runs for cross-run diffs and trends.
+
+    Paths, commands, tags and error messages are stored once in `strings`
+    and referenced by id. One connection is shared by all threads; server
+    processes sharing the database file write one run at a time."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(runs)')]
+            if columns and 'version' not in columns:
+                self._conn.executescript(_MIGRATIONS)
+            self._conn.executescript(HISTORY_SCHEMA)
+
+    def _select_in(self, sql, values):
+        """Run `sql`, whose '{marks}' is an IN list, over values in chunks"""
+        values = list(values)
+        for start in range(0, len(values), SQL_CHUNK):
+            chunk = values[start:start + SQL_CHUNK]
+            yield from self._conn.execute(sql.format(marks=','.join('?' * len(chunk))), chunk)
+
+    def _string_ids(self, texts):
+        """Ids for the given strings, adding the missing ones"""
+        wanted = dict.fromkeys(texts)  # first-seen order, so ids follow scan order
+        ids = dict(self._select_in('SELECT text, id FROM strings WHERE text IN ({marks})', wanted))
+        missing = [text for text in wanted if text not in ids]
+        if missing:
+            self._conn.executemany('INSERT INTO strings (text) VALUES (?)', ((t,) for t in missing))
+            ids.update(self._select_in('SELECT text, id FROM strings WHERE text IN ({marks})', missing))
+        return ids
+
+    def record_snapshot(self, snapshot):
+        """Store every row and timed-out testcase of a snapshot as a new run;
+        returns the run id.
+
+        A snapshot that retried the timed-out testcases of the latest run of
+        its source completes that run instead of adding another, whichever
+        process recorded the run."""
+        rows = snapshot.rows
+        timed_out = [(entry['testcase'], entry['reason']) for entry in snapshot.timed_out]
+        with self._lock, self._conn:
+            # Take the write lock before looking up the run a retry completes
+            self._conn.execute('BEGIN IMMEDIATE')
+            ids = self._string_ids(list(rows.paths) + rows.strings +
+                                   [tc for tc, _ in timed_out if tc is not None])
+            strings = [ids[text] for text in rows.strings]
+            latest = None
+            if snapshot.retry_of is not None:
+                latest = self._conn.execute('SELECT id, version FROM runs WHERE source IS ? ORDER BY id DESC LIMIT 1',
+                                            (snapshot.source,)).fetchone()
+            if latest is not None and latest[1] in (snapshot.retry_of, snapshot.version):
+                run_id = latest[0]
+                self._conn.execute('UPDATE runs SET total_cases = ?, failures = ?, version = ? WHERE id = ?',
+                                   (snapshot.total_cases, len(rows), snapshot.version, run_id))
+                self._conn.execute('DELETE FROM timed_out WHERE run_id = ?', (run_id,))
+            else:
+                cur = self._conn.execute(
+                    'INSERT INTO runs (built_at, source, total_cases, failures, version) VALUES (?, ?, ?, ?, ?)',
+                    (snapshot.built_at, snapshot.source, snapshot.total_cases, len(rows), snapshot.version))
+                run_id = cur.lastrowid
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO failures VALUES (?, ?, ?, ?, ?)',
+                ((run_id, ids[tc], strings[cmd], strings[tag], strings[err])
+                 for tc, cmd, err, tag in zip(rows.paths, rows.command_ids, rows.error_ids, rows.tag_ids)))
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO timed_out VALUES (?, ?, ?)',
+                ((run_id, None if tc is None else ids[tc], reason) for tc, reason in timed_out))
+        return run_id
+
+    def runs(self, limit=50):
+        """Most recent runs first"""
+        with self._lock:
+            cur = self._conn.execute(
+                'SELECT id, built_at, source, total_cases, failures, '
+                '(SELECT COUNT(*) FROM timed_out t WHERE t.run_id = runs.id) '
+                'FROM runs ORDER BY id DESC LIMIT ?', (limit,))
+            return [dict(zip(('run_id', 'built_at', 'source', 'total_cases', 'failures', 'timed_out'), row))
+                    for row in cur]
+
+    def latest_run_ids(self, count, source=None):
+        """Ids of the last `count` runs of one testcases source, most recent
+        first; by default of the source of the latest run"""
+        with self._lock:
+            if source is None:
+                latest = self._conn.execute('SELECT source FROM runs ORDER BY id DESC LIMIT 1').fetchone()
+                if latest is None:
+                    return []
+                source = latest[0]
+            cur = self._conn.execute('SELECT id FROM runs WHERE source IS ? ORDER BY id DESC LIMIT ?',
+                                     (source, count))
+            return [row[0] for row in cur]
+
+    def previous_run_id(self, run_id):
+        """The run before run_id of the same source, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id FROM runs WHERE id < ? AND source IS (SELECT source FROM runs WHERE id = ?) '
+                'ORDER BY id DESC LIMIT 1', (run_id, run_id)).fetchone()
+            return None if row is None else row[0]
+
+    def has_run(self, run_id):
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM runs WHERE id = ?', (run_id,)).fetchone() is not None
+
+    def _filters(self, command, tag):
+        """SQL condition and parameters restricting failures to a command/tag"""
+        sql = ''
+        params = []
+        for column, text in (('command_id', command), ('tag_id', tag)):
+            if text is not None:
+                sql += f' AND f.{column} = (SELECT id FROM strings WHERE text = ?)'
+                params.append(text)
+        return sql, params
+
+    def _decode(self, rows):
+        """Replace string ids in result rows by their text"""
+        texts = dict(self._select_in('SELECT id, text FROM strings WHERE id IN ({marks})',
+                                     {i for row in rows for i in row}))
+        return [tuple(texts[i] for i in row) for row in rows]
+
+    def diff(self, from_run, to_run, kinds=DIFF_KINDS, command=None, tag=None, limit=None):
+        """New, fixed and persisting failures between two runs.
+
+        Returns {kind: {'count', 'testcases': [row tuples]}}; rows of `new`
+        and `persisting` come from to_run, those of `fixed` from from_run."""
+        filters, params = self._filters(command, tag)
+        queries = {
+            'new': (_MISSING_FROM, to_run, from_run),
+            'fixed': (_MISSING_FROM, from_run, to_run),
+            'persisting': (_IN_BOTH, to_run, from_run),
+        }
+        result = {}
+        with self._lock:
+            for kind in kinds:
+                template, run, other = queries[kind]
+                sql = template.format(filters=filters)
+                args = [run, *params, other] + ([other] if template is _MISSING_FROM else [])
+                count = self._conn.execute(f'SELECT COUNT(*) FROM ({sql})', args).fetchone()[0]
+                rows = self._conn.execute(
+                    sql + ' ORDER BY f.testcase_id LIMIT ?',
+                    [*args, -1 if limit is None else limit]).fetchall()
+                result[kind] = {'count': count, 'testcases': self._decode(rows)}
+        return result
+
+    def tag_trend(self, runs=10, command=None, tag=None, source=None):
+        """Failure count per tag for each of the last `runs` runs of a source
+        (see latest_run_ids), oldest first.
+
+        Returns (run ids, {tag: [count per run]})."""
+        run_ids = sorted(self.latest_run_ids(runs, source))
+        if not run_ids:
+            return [], {}
+        filters, params = self._filters(command, tag)
+        marks = ','.join('?' * len(run_ids))
+        position = {run_id: i for i, run_id in enumerate(run_ids)}
+        with self._lock:
+            cur = self._conn.execute(
+                f'SELECT f.run_id, s.text, COUNT(*) FROM failures f JOIN strings s ON s.id = f.tag_id '
+                f'WHERE f.run_id IN ({marks}) {filters} GROUP BY f.run_id, f.tag_id',
+                [*run_ids, *params])
+            trend = {}
+            for run_id, tag_text, count in cur:
+                trend.setdefault(tag_text, [0] * len(run_ids))[position[run_id]] = count
+        return run_ids, trend
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Payloads (endpoint + arguments) whose encoded bodies are kept
+MAX_ENTRIES = 64
+
+class _Entry:
+    __slots__ = ('etag', 'bodies')
+
+    def __init__(self, etag, body):
+        self.etag = etag
+        self.bodies = {'identity': body}
+
+class ResponseCache:
+    """Serialized and compressed JSON bodies, built once per data version.
+
+    Responses carry a weak ETag derived from the payload name and version and
+    a Last-Modified date, and a matching If-None-Match (or an If-Modified-Since
+    later than the payload's publish time) gets a 304 without the payload being built. Bodies are compressed with
+    brotli (if installed) or gzip when the client accepts it, each encoding
+    at most once per version."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, min_size=COMPRESS_MIN_SIZE):
+        self.max_entries = max_entries
+        self.min_size = min_size
+        self._entries = OrderedDict()   # name -> _Entry of its latest version
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+        self.not_modified = 0
+
+    def _encoding(self, size):
+        if size < self.min_size:
+            return 'identity'
+        accept = request.accept_encodings
+        if brotli is not None and accept.quality('br') > 0:
+            return 'br'
+        if accept.quality('gzip') > 0:
+            return 'gzip'
+        return 'identity'
+
+    def _body(self, entry, encoding):
+        body = entry.bodies.get(encoding)
+        if body is None:
+            raw = entry.bodies['identity']
+            if encoding == 'br':
+                body = brotli.compress(raw, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+            entry.bodies[encoding] = body
+        return body
+
+    def _not_modified(self, etag, last_modified):
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        # HTTP dates have whole seconds, and a second publish within the
+        # second the client saw would carry the same date: only a payload
+        # strictly older than the date is known to be unchanged
+        since = request.if_modified_since
+        return since is not None and last_modified is not None and last_modified < since.timestamp()
+
+    def json_response(self, name, version, last_modified, build):
+        """Response for the payload `name` (endpoint and arguments) at `version`.
+
+        `version` must change whenever the payload does; `last_modified` is a
+        POSIX timestamp or None; build() returns the JSON-serializable data
+        and is only called when this version is not cached yet."""
+        etag = hashlib.blake2b(f"{name}\0{version}".encode(), digest_size=12).hexdigest()
+        if self._not_modified(etag, last_modified):
+            self.not_modified += 1
+            response = Response(status=304)
+        else:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None and entry.etag == etag:
+                    self.hits += 1
+                else:
+                    self.builds += 1
+                    entry = self._entries[name] = _Entry(etag, current_app.json.response(build()).get_data())
+                self._entries.move_to_end(name)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                encoding = self._encoding(len(entry.bodies['identity']))
+                body = self._body(entry, encoding)
+            response = Response(body, mimetype='application/json')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.last_modified = int(last_modified)
+        # Clients may keep the body but must revalidate it on every poll
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'builds': self.builds,
+            'not_modified': self.not_modified,
+            'brotli': brotli is not None
+        }
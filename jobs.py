@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Finished jobs kept for status lookups
+MAX_FINISHED_JOBS = 100
+# Seconds between progress events sent to a job's event readers
+EVENT_PROGRESS_INTERVAL = 0.5
+# Seconds between job file updates (and cancel checks) of a shared job
+JOB_SYNC_INTERVAL = 0.5
+
+JOB_STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+class JobCancelled(Exception):
+    pass
+
+class AnalysisJob:
+    """One background rebuild of the analysis snapshot from a testcases file"""
+
+    def __init__(self, testcase_file, clock=time.monotonic):
+        self.id = uuid.uuid4().hex[:12]
+        self.testcase_file = testcase_file
+        self.state = 'queued'
+        self.scanned = 0
+        self.total = None
+        self.error = None
+        self.result = None
+        self.attached = 0
+        self._clock = clock
+        self.created_at = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        # Rows and the final snapshot of the scan, replayed to readers that
+        # attach late; only the final event is kept once the job finished
+        self._log = []
+        self._changed = threading.Condition()
+
+    @property
+    def finished_state(self):
+        return self.state in ('done', 'failed', 'cancelled')
+
+    def cancel(self):
+        """Ask the job to stop; it stops at the next scanned testcase"""
+        if not self.finished_state:
+            self._cancel.set()
+
+    def wait(self, timeout=None):
+        """Block until the job finished; returns False on timeout"""
+        return self._done.wait(timeout)
+
+    def events(self, progress_interval=EVENT_PROGRESS_INTERVAL):
+        """Iterator over the job's refresh events from the start of its scan:
+        ('row', row), ('progress', (scanned, total)) at most every
+        progress_interval seconds and ('done', snapshot) when it published.
+
+        Reading runs apart from the scan: a slow reader neither holds the
+        store's refresh lock nor holds the scan up. Ends when the job
+        finished; a cancelled or failed job ends without 'done'."""
+        # Attach now, not on the first read, so no row is missed
+        with self._changed:
+            log = self._log
+        return self._read(log, progress_interval)
+
+    def _read(self, log, progress_interval):
+        seen = 0
+        progress = None
+        while True:
+            with self._changed:
+                if seen >= len(log) and not self.finished_state:
+                    self._changed.wait(progress_interval)
+                batch = log[seen:]
+                seen += len(batch)
+                finished = self.finished_state and seen >= len(log)
+            yield from (event for event in batch if event[0] == 'row')
+            if self.state != 'queued' and (self.scanned, self.total) != progress:
+                progress = (self.scanned, self.total)
+                yield 'progress', progress
+            yield from (event for event in batch if event[0] == 'done')
+            if finished:
+                return
+
+    def _emit(self, kind, payload):
+        with self._changed:
+            self._log.append((kind, payload))
+            self._changed.notify_all()
+
+    def _finish(self, state):
+        self.state = state
+        with self._changed:
+            # Readers already attached keep the whole log
+            self._log = [event for event in self._log if event[0] == 'done']
+            self._changed.notify_all()
+
+    def eta(self):
+        """Seconds left, extrapolated from the scan rate so far"""
+        if self.state != 'running' or not self.scanned or self.total is None:
+            return None
+        elapsed = self._clock() - self.started
+        return elapsed / self.scanned * (self.total - self.scanned)
+
+    def as_dict(self):
+        now = self._clock()
+        eta = self.eta()
+        status = {
+            'job_id': self.id,
+            'state': self.state,
+            'source': self.testcase_file,
+            'scanned': self.scanned,
+            'total': self.total,
+            'progress': round(self.scanned / self.total, 4) if self.total else None,
+            'elapsed_seconds': round((self.finished or now) - self.started, 3) if self.started else 0.0,
+            'eta_seconds': None if eta is None else round(eta, 3),
+            'attached': self.attached,
+            'cancel_requested': self._cancel.is_set(),
+            'created_at': self.created_at
+        }
+        if self.result is not None:
+            status.update(self.result)
+        if self.error is not None:
+            status['error'] = self.error
+        return status
+
+class JobManager:
+    """Runs snapshot rebuilds as background jobs.
+
+    A submit for a testcases file that already has a job in flight attaches
+    to that job instead of starting a second scan. A job's snapshot is only
+    published by the store once its scan completed; a cancelled or failed
+    job publishes nothing and the readers keep the previous snapshot."""
+
+    def __init__(self, store, clock=time.monotonic, max_finished=MAX_FINISHED_JOBS):
+        self.store = store
+        self.max_finished = max_finished
+        self._clock = clock
+        self._jobs = OrderedDict()   # job id -> AnalysisJob, oldest first
+        self._inflight = {}          # absolute testcases path -> AnalysisJob
+        self._lock = threading.Lock()
+
+    def submit(self, testcase_file):
+        """(job, started) for a rebuild from testcase_file; started is False
+        when the request attached to a job already in flight"""
+        key = os.path.abspath(testcase_file)
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                job.attached += 1
+                return job, False
+            job = AnalysisJob(testcase_file, self._clock)
+            self._inflight[key] = job
+            self._jobs[job.id] = job
+            self._prune()
+        thread = threading.Thread(target=self._run, args=(key, job), name=f'analysis-job-{job.id}',
+                                  daemon=True)
+        thread.start()
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """All known jobs, most recent first"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_state]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _run(self, key, job):
+        events = self.store.iter_refresh(job.testcase_file, progress_interval=0)
+        try:
+            for kind, payload in events:
+                if kind == 'done':
+                    # Already published; a cancel arriving now is too late.
+                    # Finished jobs are kept around, so only the version is.
+                    job.result = {'version': payload.version, 'generated_on': payload.built_at,
+                                  'filtered_cases': len(payload.rows),
+                                  'timed_out_cases': len(payload.timed_out)}
+                    job._emit(kind, payload)
+                    continue
+                self._checkpoint(job)
+                if job._cancel.is_set():
+                    raise JobCancelled()
+                if kind == 'progress':
+                    if job.state == 'queued':
+                        job.started = self._clock()
+                        job.state = 'running'
+                    job.scanned, job.total = payload
+                else:
+                    job._emit(kind, payload)
+            job._finish('done')
+        except JobCancelled:
+            job._finish('cancelled')
+        except Exception as e:
+            print(f"❌ ERROR: analysis job {job.id} failed: {e}")
+            job.error = str(e)
+            job._finish('failed')
+        finally:
+            # Closing the stream aborts the result sinks of an unfinished scan
+            events.close()
+            job.finished = self._clock()
+            if job.started is None:
+                job.started = job.finished
+            with self._lock:
+                del self._inflight[key]
+                self._prune()
+            self._finished(job)
+            job._done.set()
+
+    def _checkpoint(self, job):
+        """Called for every event of a running job"""
+
+    def _finished(self, job):
+        """Called once a job finished, before its waiters are woken"""
+
+class RemoteJob:
+    """A job of another server process, as its job file describes it.
+
+    Answers the same questions as an AnalysisJob: status, wait(), cancel()
+    and events(), which gives progress while the job runs and the rows of
+    the snapshot it published at the end."""
+
+    def __init__(self, manager, status):
+        self._manager = manager
+        self._status = status
+
+    @property
+    def id(self):
+        return self._status['job_id']
+
+    @property
+    def state(self):
+        return self._status['state']
+
+    @property
+    def error(self):
+        return self._status.get('error')
+
+    @property
+    def finished_state(self):
+        return self.state in ('done', 'failed', 'cancelled')
+
+    def _reload(self):
+        status = self._manager._read_status(self.id)
+        if status is not None:
+            self._status = status
+
+    def as_dict(self):
+        self._reload()
+        status = {key: value for key, value in self._status.items() if key not in ('key', 'pid')}
+        status['cancel_requested'] = status['cancel_requested'] or \
+            os.path.exists(self._manager._cancel_path(self.id))
+        return status
+
+    def cancel(self):
+        if not self.finished_state:
+            open(self._manager._cancel_path(self.id), 'a').close()
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self._reload()
+            if self.finished_state:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(JOB_SYNC_INTERVAL)
+
+    def events(self, progress_interval=EVENT_PROGRESS_INTERVAL):
+        progress = None
+        while True:
+            finished = self.wait(progress_interval)
+            if self.state != 'queued' and (self._status['scanned'], self._status['total']) != progress:
+                progress = (self._status['scanned'], self._status['total'])
+                yield 'progress', progress
+            if finished:
+                break
+        if self.state == 'done':
+            snapshot = self._manager.store.current()
+            for row in snapshot.rows:
+                yield 'row', row
+            yield 'done', snapshot
+
+class SharedJobManager(JobManager):
+    """JobManager shared by several server processes through a directory of
+    job files, next to the SharedSnapshotStore manifest.
+
+    The process that runs a job keeps its file up to date (status and
+    progress every JOB_SYNC_INTERVAL seconds) and stops the job at the next
+    row once a cancel file shows up next to it, so every process can answer for a job,
+    cancel it or attach to it. Files are written under one lock file; the
+    job of a process that exited counts as failed."""
+
+    def __init__(self, store, jobs_dir, clock=time.monotonic, max_finished=MAX_FINISHED_JOBS):
+        super().__init__(store, clock, max_finished)
+        self.jobs_dir = jobs_dir
+        self.lock_file = os.path.join(jobs_dir, 'jobs.lock')
+        self._synced = {}   # job id -> time of its last file update
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _status_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _cancel_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.cancel")
+
+    def _read_status(self, job_id):
+        try:
+            with open(self._status_path(job_id)) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if status['state'] in ('queued', 'running') and not _process_alive(status['pid']):
+            status.update(state='failed', error='The server process running the job exited')
+        return status
+
+    def _write_status(self, status):
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{status['job_id']}.", suffix='.tmp', dir=self.jobs_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(status, f)
+            os.replace(tmp_path, self._status_path(status['job_id']))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _write_job(self, job):
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Attaches by other processes were counted in the file
+                status = self._read_status(job.id)
+                if status is not None:
+                    job.attached = max(job.attached, status['attached'])
+                self._write_status(dict(job.as_dict(), key=os.path.abspath(job.testcase_file),
+                                        pid=os.getpid()))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self._synced[job.id] = self._clock()
+
+    def _file_statuses(self):
+        statuses = []
+        for name in os.listdir(self.jobs_dir):
+            if name.endswith('.json'):
+                status = self._read_status(name[:-len('.json')])
+                if status is not None:
+                    statuses.append(status)
+        return statuses
+
+    def submit(self, testcase_file):
+        key = os.path.abspath(testcase_file)
+        with self._lock, open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                job = self._inflight.get(key)
+                if job is not None:
+                    job.attached += 1
+                    return job, False
+                for status in self._file_statuses():
+                    if status['key'] == key and status['state'] in ('queued', 'running'):
+                        status['attached'] += 1
+                        self._write_status(status)
+                        return RemoteJob(self, status), False
+                job = AnalysisJob(testcase_file, self._clock)
+                self._inflight[key] = job
+                self._jobs[job.id] = job
+                self._prune()
+                self._write_status(dict(job.as_dict(), key=key, pid=os.getpid()))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self._synced[job.id] = self._clock()
+        thread = threading.Thread(target=self._run, args=(key, job), name=f'analysis-job-{job.id}',
+                                  daemon=True)
+        thread.start()
+        return job, True
+
+    def get(self, job_id):
+        job = super().get(job_id)
+        if job is not None:
+            return job
+        status = self._read_status(job_id) if _is_job_id(job_id) else None
+        return None if status is None else RemoteJob(self, status)
+
+    def jobs(self):
+        local = {job.id: job for job in super().jobs()}
+        remote = [RemoteJob(self, status) for status in self._file_statuses() if status['job_id'] not in local]
+        everything = list(local.values()) + remote
+        everything.sort(key=lambda job: job.as_dict()['created_at'], reverse=True)
+        return everything
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def _checkpoint(self, job):
+        if os.path.exists(self._cancel_path(job.id)):
+            job.cancel()
+        if self._clock() - self._synced.get(job.id, 0.0) >= JOB_SYNC_INTERVAL:
+            self._write_job(job)
+
+    def _finished(self, job):
+        self._write_job(job)
+        self._synced.pop(job.id, None)
+        try:
+            os.remove(self._cancel_path(job.id))
+        except FileNotFoundError:
+            pass
+        # Finished jobs beyond max_finished, oldest first
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                finished = sorted((status for status in self._file_statuses()
+                                   if status['state'] not in ('queued', 'running')),
+                                  key=lambda status: status['created_at'])
+                for status in finished[:max(0, len(finished) - self.max_finished)]:
+                    os.remove(self._status_path(status['job_id']))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _is_job_id(text):
+    return len(text) == 12 and all(c in '0123456789abcdef' for c in text)
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from categories import CATEGORY_FILES
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10000
+SORT_KEYS = ('scan', 'path', 'command', 'tag')
+FILTER_ARGS = ('command', 'tag', 'category', 'prefix')
+LISTING_ARGS = FILTER_ARGS + ('limit', 'offset', 'cursor', 'sort')
+MAX_CACHED_QUERIES = 64
+
+CATEGORY_BITS = {name: bit for name, _, bit in CATEGORY_FILES}
+
+class StaleCursor(ValueError):
+    """Raised when a cursor was issued for an older snapshot"""
+
+class SnapshotIndex:
+    """Row-id indexes over one snapshot for filtered, sorted, paged listings.
+
+    Row ids are positions in snapshot.rows. Posting lists are kept in scan
+    order; alternative orders and category postings are built on first use."""
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.rows = rows = snapshot.rows
+        strings = rows.strings
+        by_command = {}
+        by_tag = {}
+        by_cmd_tag = {}
+        for i, (cmd_id, tag_id) in enumerate(zip(rows.command_ids, rows.tag_ids)):
+            by_command.setdefault(cmd_id, array('I')).append(i)
+            by_tag.setdefault(tag_id, array('I')).append(i)
+            by_cmd_tag.setdefault((cmd_id, tag_id), array('I')).append(i)
+        self.by_command = {strings[k]: ids for k, ids in by_command.items()}
+        self.by_tag = {strings[k]: ids for k, ids in by_tag.items()}
+        self.by_cmd_tag = {(strings[c], strings[t]): ids for (c, t), ids in by_cmd_tag.items()}
+        self.path_order = rows.path_order()
+        self.sorted_paths = rows.paths_for(self.path_order)
+        self._orders = {'path': self.path_order}
+        self._ranks = {}
+        self._categories_key = None
+        self._by_category = None
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def order(self, key):
+        if key == 'scan':
+            return range(len(self.rows))
+        order = self._orders.get(key)
+        if order is None:
+            rows = self.rows
+            column = rows.command_ids if key == 'command' else rows.tag_ids
+            strings, paths = rows.strings, rows.paths
+            order = array('I', sorted(range(len(rows)), key=lambda i: (strings[column[i]], paths[i])))
+            self._orders[key] = order
+        return order
+
+    def prefix_ids(self, prefix):
+        lo = bisect_left(self.sorted_paths, prefix)
+        hi = lo
+        while hi < len(self.sorted_paths) and self.sorted_paths[hi].startswith(prefix):
+            hi += 1
+        return self.path_order[lo:hi]
+
+    def category_ids(self, category, category_index):
+        category_index.refresh()
+        if self._categories_key != category_index.version:
+            by_category = {name: array('I') for name in CATEGORY_BITS}
+            by_category['others'] = array('I')
+            for i, tc_path in enumerate(self.rows.paths):
+                mask = category_index.mask(tc_path)
+                if not mask:
+                    by_category['others'].append(i)
+                    continue
+                for name, bit in CATEGORY_BITS.items():
+                    if mask & bit:
+                        by_category[name].append(i)
+            with self._lock:
+                self._by_category, self._categories_key = by_category, category_index.version
+        return self._by_category.get(category, array('I'))
+
+    def query(self, command=None, tag=None, category=None, prefix=None, sort='scan',
+              category_index=None):
+        """Ids of all rows matching the filters, in the requested order"""
+        key = (command, tag, category, prefix, sort,
+               category_index.version if category and category_index else None)
+        cached = self._queries.get(key)
+        if cached is not None:
+            return cached
+
+        postings = []
+        if command is not None and tag is not None:
+            postings.append(self.by_cmd_tag.get((command, tag), ()))
+        elif command is not None:
+            postings.append(self.by_command.get(command, ()))
+        elif tag is not None:
+            postings.append(self.by_tag.get(tag, ()))
+        if category is not None:
+            postings.append(self.category_ids(category, category_index))
+        if prefix:
+            postings.append(self.prefix_ids(prefix))
+
+        descending = sort.startswith('-')
+        sort_key = sort.lstrip('-')
+        if not postings:
+            ids = list(self.order(sort_key))
+        else:
+            postings.sort(key=len)
+            smallest = postings[0]
+            others = [set(p) for p in postings[1:]]
+            matches = [i for i in smallest if all(i in other for other in others)]
+            if sort_key == 'scan':
+                # Prefix postings come in path order, the others in scan order
+                ids = sorted(matches)
+            elif len(matches) * 8 < len(self.rows):
+                rank = self.rank(sort_key)
+                ids = sorted(matches, key=rank.__getitem__)
+            else:
+                wanted = set(matches)
+                ids = [i for i in self.order(sort_key) if i in wanted]
+        if descending:
+            ids.reverse()
+
+        with self._lock:
+            self._queries[key] = ids
+            if len(self._queries) > MAX_CACHED_QUERIES:
+                self._queries.popitem(last=False)
+        return ids
+
+    def rank(self, sort_key):
+        """Position of every row id in the given order"""
+        ranks = self._ranks.get(sort_key)
+        if ranks is None:
+            ranks = array('I', bytes(4 * len(self.rows)))
+            for pos, i in enumerate(self.order(sort_key)):
+                ranks[i] = pos
+            self._ranks[sort_key] = ranks
+        return ranks
+
+_index_lock = threading.Lock()
+_current_index = None
+
+def index_for(snapshot):
+    """SnapshotIndex for a snapshot, rebuilt only when the snapshot changes"""
+    global _current_index
+    index = _current_index
+    if index is None or index.version != snapshot.version:
+        with _index_lock:
+            index = _current_index
+            if index is None or index.version != snapshot.version:
+                index = _current_index = SnapshotIndex(snapshot)
+    return index
+
+def parse_listing_args(args, default_limit=DEFAULT_LIMIT):
+    """Validate listing query parameters taken from a request.
+
+    Raises ValueError with a user-facing message on bad input."""
+    params = {name: args.get(name) or None for name in FILTER_ARGS}
+    sort = args.get('sort') or 'scan'
+    if sort.lstrip('-') not in SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)} (prefix '-' for descending)")
+    params['sort'] = sort
+    category = params['category']
+    if category is not None and category not in CATEGORY_BITS and category != 'others':
+        raise ValueError(f"Unknown category: {category}")
+    try:
+        limit = int(args.get('limit', default_limit) or default_limit)
+        offset = int(args.get('offset', 0) or 0)
+    except (TypeError, ValueError):
+        raise ValueError("limit and offset must be integers")
+    if limit <= 0 or offset < 0:
+        raise ValueError("limit must be positive and offset non-negative")
+    params['limit'] = min(limit, MAX_LIMIT)
+    params['offset'] = offset
+    params['cursor'] = args.get('cursor') or None
+    return params
+
+def wants_listing(args, ignore=()):
+    """True when a request uses any paging, filtering or sorting parameter"""
+    return any(args.get(name) for name in LISTING_ARGS if name not in ignore)
+
+def encode_cursor(version, offset):
+    return f"{version}:{offset}"
+
+def decode_cursor(cursor, version):
+    try:
+        cursor_version, offset = (int(part) for part in cursor.split(':'))
+    except ValueError:
+        raise ValueError("Malformed cursor")
+    if offset < 0:
+        raise ValueError("Malformed cursor")
+    if cursor_version != version:
+        raise StaleCursor("The analysis was refreshed; restart from the first page")
+    return offset
+
+def page(ids, version, limit, offset=0, cursor=None):
+    """Slice a query result and describe the next page"""
+    if cursor:
+        offset = decode_cursor(cursor, version)
+    selected = ids[offset:offset + limit]
+    end = offset + len(selected)
+    return selected, {
+        'total_matches': len(ids),
+        'offset': offset,
+        'limit': limit,
+        'next_cursor': encode_cursor(version, end) if end < len(ids) else None,
+        'version': version
+    }
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import mmap
+import time
+
+from metrics import metrics_registry
+
+# Files at least this large are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 1 << 20
+# Only look at the first N bytes of each file (0 = whole file)
+SCAN_MAX_BYTES = int(os.environ.get('LOG_SCAN_MAX_BYTES', '0') or 0)
+
+STATUS_RE = re.compile(r".*EXIT STATUS for (\w+) is 5")
+# Byte patterns used to jump to candidate lines. Each one matches every line
+# the text check would accept (non-ASCII word characters included), so only
+# candidates are decoded and checked.
+ERROR_CANDIDATE = re.compile(rb'ERROR')
+STATUS_CANDIDATE = re.compile(rb'EXIT STATUS for [\w\x80-\xff]+ is 5')
+
+class _FileBuffer:
+    """Whole-file bytes view: an mmap for large files, a plain read otherwise"""
+
+    def __init__(self, path, max_bytes):
+        self._file = open(path, 'rb')
+        self._map = None
+        size = os.fstat(self._file.fileno()).st_size
+        self.limit = min(size, max_bytes) if max_bytes else size
+        if self.limit >= MMAP_THRESHOLD:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = self._map
+            self.mapped = True
+        else:
+            self.data = self._file.read(self.limit)
+            self.limit = len(self.data)
+            self.mapped = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+def _iter_candidate_lines(buf, limit, pattern):
+    """Yield (text, end offset) of every line where `pattern` matches, in file order.
+
+    Lines end at '\\n', '\\r' or '\\r\\n', like text-mode file iteration."""
+    pos = 0
+    next_n = next_r = -1
+    while pos < limit:
+        m = pattern.search(buf, pos, limit)
+        if m is None:
+            return
+        i = m.start()
+        # `pos` is always at a line start, so the backwards search stays local
+        start = max(buf.rfind(b'\n', pos, i), buf.rfind(b'\r', pos, i), pos - 1) + 1
+        # Next terminator of each kind is remembered, so a file that never
+        # uses one of them is not searched to the end again for every line
+        if next_n < i:
+            next_n = buf.find(b'\n', i, limit)
+            if next_n < 0:
+                next_n = limit
+        if next_r < i:
+            next_r = buf.find(b'\r', i, limit)
+            if next_r < 0:
+                next_r = limit
+        end = min(next_n, next_r)
+        yield buf[start:end].decode('utf-8', 'replace'), end
+        pos = end + 1
+
+def _bytes_read(fb, end):
+    # A mapped file is only paged in up to where the search stopped
+    return end if fb.mapped else fb.limit
+
+def find_first_error_line(path, max_bytes=None):
+    """First stripped line starting with '>' that contains ERROR, or None"""
+    if max_bytes is None:
+        max_bytes = SCAN_MAX_BYTES
+    start = time.perf_counter()
+    nbytes = 0
+    try:
+        with _FileBuffer(path, max_bytes) as fb:
+            nbytes = fb.limit
+            for line, end in _iter_candidate_lines(fb.data, fb.limit, ERROR_CANDIDATE):
+                stripped = line.strip()
+                if stripped.startswith('>'):
+                    nbytes = _bytes_read(fb, end)
+                    return stripped
+    except (OSError, ValueError):
+        return None
+    finally:
+        metrics_registry.observe('diff_read', time.perf_counter() - start, nbytes)
+    return None
+
+def find_status_failing_command(path, max_bytes=None):
+    """Command of the first 'EXIT STATUS for <cmd> is 5' line, or None"""
+    if max_bytes is None:
+        max_bytes = SCAN_MAX_BYTES
+    start = time.perf_counter()
+    nbytes = 0
+    try:
+        with _FileBuffer(path, max_bytes) as fb:
+            nbytes = fb.limit
+            for line, end in _iter_candidate_lines(fb.data, fb.limit, STATUS_CANDIDATE):
+                m = STATUS_RE.match(line)
+                if m:
+                    nbytes = _bytes_read(fb, end)
+                    return m.group(1)
+    except FileNotFoundError:
+        return None
+    finally:
+        metrics_registry.observe('status_log', time.perf_counter() - start, nbytes)
+    return None
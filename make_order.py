@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import hashlib
+import subprocess
+import threading
+
+from metrics import metrics_registry
+
+# Upper bound for a real `make -n` run, in seconds
+MAKE_TIMEOUT = float(os.environ.get('MAKE_TIMEOUT', '60'))
+MAKEFILE_NAMES = ('GNUmakefile', 'makefile', 'Makefile')
+MAX_CACHED_PLANS = 4096
+
+RECIPE_PREFIX = re.compile(r'[\s@+-]*')
+
+# Marker stored for Makefiles that need a real `make -n` to be resolved
+NOT_STATIC = 'not-static'
+
+def log_base(line):
+    """Return the command base name of a `> testresults/logs/log_<base>.log` line"""
+    if 'testresults/logs' in line and '>' in line:
+        log_file = line.split('>')[-1].strip().split('/')[-1]
+        return re.sub(r'\.log$', '', re.sub(r'^log_', '', log_file, flags=re.I), flags=re.I)
+    return None
+
+def first_available_base(bases, available_diff_files):
+    for base in bases:
+        if base is not None and f"{base}.diff.bak" in available_diff_files:
+            return base
+    return None
+
+class MakePlan:
+    """What `make -n` prints for a Makefile, provided its targets are not on disk"""
+
+    __slots__ = ('bases', 'recipe_targets', 'bare_targets', 'sources')
+
+    def __init__(self, bases, recipe_targets, bare_targets, sources):
+        self.bases = bases
+        self.recipe_targets = recipe_targets
+        self.bare_targets = bare_targets
+        self.sources = sources
+
+    def applies_to(self, tc_path):
+        """Check the file-state assumptions the plan was derived under"""
+        for target in self.recipe_targets:
+            if os.path.exists(os.path.join(tc_path, target)):
+                return False  # make would compare timestamps
+        for source in self.sources:
+            if not os.path.exists(os.path.join(tc_path, source)):
+                return False  # make would stop with "No rule to make target"
+        if self.bare_targets:
+            # A recipe-less target could be built by an implicit rule
+            names = os.listdir(tc_path)
+            for target in self.bare_targets:
+                prefix = f"{target}."
+                if target in names or any(n.startswith(prefix) for n in names):
+                    return False
+        return True
+
+_INCLUDE_RE = re.compile(r'^\s*-?s?include\s+(.*)$', re.MULTILINE)
+
+def makefile_includes(text):
+    """Literal file names of the include / -include / sinclude directives
+    of a Makefile; names that need expanding are skipped"""
+    names = []
+    for match in _INCLUDE_RE.finditer(text):
+        for name in match.group(1).split('#', 1)[0].split():
+            if '$' not in name:
+                names.append(name)
+    return names
+
+def parse_makefile(text):
+    """Derive a MakePlan from plain Makefiles (explicit rules, literal recipes).
+
+    Anything that make would expand or evaluate - variables, includes,
+    conditionals, pattern rules, special targets other than .PHONY - makes
+    the Makefile non-static and None is returned."""
+    rules = {}
+    order = []
+    phony = set()
+    current = None
+    block = 0
+    for raw in text.split('\n'):
+        raw = raw.rstrip('\r')
+        if raw.endswith('\\') or '$' in raw:
+            return None
+        if raw.startswith('\t'):
+            if current is None:
+                return None
+            body = raw[1:]
+            prefix = RECIPE_PREFIX.match(body).group(0)
+            if '+' in prefix:
+                return None  # `+` lines are executed even under -n
+            for target in current:
+                rule = rules[target]
+                if rule['block'] not in (None, block):
+                    return None  # make would warn and override the recipe
+                rule['block'] = block
+                rule['recipe'].append(body[len(prefix):])
+            continue
+        line = raw.split('#', 1)[0].rstrip()
+        if not line.strip():
+            continue
+        if line[0].isspace() or ':' not in line or '=' in line or ';' in line \
+                or '::' in line or '|' in line or '%' in line:
+            return None
+        targets, prereqs = line.split(':', 1)
+        targets = targets.split()
+        prereqs = prereqs.split()
+        if not targets:
+            return None
+        block += 1
+        if targets == ['.PHONY']:
+            phony.update(prereqs)
+            current = None
+            continue
+        for target in targets:
+            if target.startswith('.'):
+                return None
+            if target not in rules:
+                rules[target] = {'prereqs': [], 'recipe': [], 'block': None}
+                order.append(target)
+            rules[target]['prereqs'].extend(prereqs)
+        current = targets
+
+    bases = []
+    recipe_targets = []
+    bare_targets = []
+    sources = []
+    visited = set()
+
+    def build(target):
+        if target in visited:
+            return
+        visited.add(target)
+        rule = rules.get(target)
+        if rule is None:
+            sources.append(target)
+            return
+        for prereq in rule['prereqs']:
+            build(prereq)
+        if rule['recipe']:
+            if target not in phony:
+                recipe_targets.append(target)
+            bases.extend(log_base(line) for line in rule['recipe'])
+        elif target not in phony:
+            bare_targets.append(target)
+
+    if order:
+        build(order[0])
+    return MakePlan([b for b in bases if b is not None], recipe_targets, bare_targets, sources)
+
+class MakefileOrderResolver:
+    """Resolves the `make -n` log order of a testcase without forking make.
+
+    Makefiles are parsed once per distinct content hash, so testcases
+    generated from the same template share one plan. Makefiles that can't
+    be resolved statically fall back to a real `make -n` under a timeout."""
+
+    def __init__(self, timeout=MAKE_TIMEOUT):
+        self.timeout = timeout
+        self._plans = {}
+        self._lock = threading.Lock()
+        self.static_resolutions = 0
+        self.make_runs = 0
+        self.make_timeouts = 0
+
+    def _plan_for(self, content):
+        digest = hashlib.sha1(content).hexdigest()
+        plan = self._plans.get(digest)
+        if plan is None:
+            try:
+                plan = parse_makefile(content.decode()) or NOT_STATIC
+            except UnicodeDecodeError:
+                plan = NOT_STATIC
+            with self._lock:
+                if len(self._plans) >= MAX_CACHED_PLANS:
+                    self._plans.clear()
+                self._plans[digest] = plan
+        return plan
+
+    def run_make_n(self, tc_path, available_diff_files):
+        with self._lock:
+            self.make_runs += 1
+        metrics_registry.add('make_n', subprocesses=1)
+        try:
+            with metrics_registry.phase('make_n'):
+                result = subprocess.run(['make', '-n'], cwd=tc_path,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                        text=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            with self._lock:
+                self.make_timeouts += 1
+            print(f"❌ ERROR: make -n timed out after {self.timeout}s in {tc_path}")
+            return None
+        except Exception:
+            return None
+        return first_available_base((log_base(line) for line in result.stdout.splitlines()),
+                                    available_diff_files)
+
+    def failing_base(self, tc_path, available_diff_files):
+        """First command, in make order, that left a .diff.bak behind"""
+        for name in MAKEFILE_NAMES:
+            try:
+                with open(os.path.join(tc_path, name), 'rb') as f:
+                    content = f.read()
+                break
+            except OSError:
+                continue
+        else:
+            return None  # make -n has nothing to run without a Makefile
+        metrics_registry.add('make_order', nbytes=len(content))
+        plan = self._plan_for(content)
+        if plan is not NOT_STATIC and plan.applies_to(tc_path):
+            with self._lock:
+                self.static_resolutions += 1
+            return first_available_base(plan.bases, available_diff_files)
+        return self.run_make_n(tc_path, available_diff_files)
+
+    def stats(self):
+        return {
+            'cached_plans': len(self._plans),
+            'static_resolutions': self.static_resolutions,
+            'make_runs': self.make_runs,
+            'make_timeouts': self.make_timeouts
+        }
+
+default_resolver = MakefileOrderResolver()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Most recent durations kept per phase / endpoint for the p95
+SAMPLE_SIZE = 2048
+
+class PhaseStats:
+    """Counters and recent durations of one scan phase or endpoint"""
+
+    __slots__ = ('calls', 'total', 'bytes', 'subprocesses', 'samples')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.bytes = 0
+        self.subprocesses = 0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def record(self, seconds=None, nbytes=0, subprocesses=0):
+        if seconds is not None:
+            self.calls += 1
+            self.total += seconds
+            self.samples.append(seconds)
+        self.bytes += nbytes
+        self.subprocesses += subprocesses
+
+    def merge(self, raw):
+        calls, total, nbytes, subprocesses, samples = raw
+        self.calls += calls
+        self.total += total
+        self.bytes += nbytes
+        self.subprocesses += subprocesses
+        self.samples.extend(samples)
+
+    def raw(self):
+        return (self.calls, self.total, self.bytes, self.subprocesses, list(self.samples))
+
+    def p95(self):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'total_seconds': round(self.total, 6),
+            'p95_seconds': round(self.p95(), 6),
+            'bytes_read': self.bytes,
+            'subprocesses': self.subprocesses
+        }
+
+class Metrics:
+    """Per-phase scan timings and per-endpoint request latencies.
+
+    Helpers record into the shared `metrics_registry`. A scan wrapped in
+    profiled() additionally gets a profile of only its own phases."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.requests = {}      # (endpoint, method) -> PhaseStats
+        self.statuses = {}      # (endpoint, method, status) -> count
+        self._profiles = []
+        self.last_profile = None
+
+    def _record(self, name, seconds=None, nbytes=0, subprocesses=0):
+        with self._lock:
+            stats = self.phases.get(name)
+            if stats is None:
+                stats = self.phases[name] = PhaseStats()
+            stats.record(seconds, nbytes, subprocesses)
+            for profile in self._profiles:
+                stats = profile.get(name)
+                if stats is None:
+                    stats = profile[name] = PhaseStats()
+                stats.record(seconds, nbytes, subprocesses)
+
+    def observe(self, name, seconds, nbytes=0, subprocesses=0):
+        """Record one timed call of a phase"""
+        self._record(name, seconds, nbytes, subprocesses)
+
+    def add(self, name, nbytes=0, subprocesses=0):
+        """Count bytes read or subprocesses spawned by a phase, without a call"""
+        self._record(name, None, nbytes, subprocesses)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+
+    def observe_request(self, endpoint, method, status, seconds):
+        with self._lock:
+            key = (endpoint, method)
+            stats = self.requests.get(key)
+            if stats is None:
+                stats = self.requests[key] = PhaseStats()
+            stats.record(seconds)
+            key = (endpoint, method, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def export(self):
+        """Picklable phase counters, e.g. to send back from a worker process"""
+        with self._lock:
+            return {name: stats.raw() for name, stats in self.phases.items()}
+
+    def merge(self, exported):
+        """Add counters produced by export() in another process"""
+        with self._lock:
+            targets = [self.phases] + self._profiles
+            for name, raw in exported.items():
+                for phases in targets:
+                    stats = phases.get(name)
+                    if stats is None:
+                        stats = phases[name] = PhaseStats()
+                    stats.merge(raw)
+
+    def reset(self):
+        with self._lock:
+            self.phases.clear()
+            self.requests.clear()
+            self.statuses.clear()
+
+    def profiled(self, iterable):
+        """Pass `iterable` through, profiling the phases recorded meanwhile.
+
+        Once it is exhausted or closed the profile is in `last_profile`."""
+        profile = {}
+        started = time.time()
+        with self._lock:
+            self._profiles.append(profile)
+        try:
+            yield from iterable
+        finally:
+            with self._lock:
+                self._profiles.remove(profile)
+            self.last_profile = {
+                'started_at': started,
+                'wall_seconds': round(time.time() - started, 6),
+                'phases': {name: stats.as_dict() for name, stats in profile.items()}
+            }
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'phases': {name: stats.as_dict() for name, stats in self.phases.items()},
+                'requests': [
+                    dict(stats.as_dict(), endpoint=endpoint, method=method)
+                    for (endpoint, method), stats in self.requests.items()
+                ],
+                'last_scan': self.last_profile
+            }
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            phases = sorted(self.phases.items())
+            requests = sorted(self.requests.items())
+            statuses = sorted(self.statuses.items())
+            quantiles = {name: stats.p95() for name, stats in phases}
+            request_quantiles = {key: stats.p95() for key, stats in requests}
+
+        family('scan_phase_seconds', 'summary', 'Time spent in each scan phase')
+        for name, stats in phases:
+            label = f'phase="{_escape(name)}"'
+            lines.append(f'scan_phase_seconds{{{label},quantile="0.95"}} {quantiles[name]:.6f}')
+            lines.append(f'scan_phase_seconds_sum{{{label}}} {stats.total:.6f}')
+            lines.append(f'scan_phase_seconds_count{{{label}}} {stats.calls}')
+        family('scan_phase_bytes_read_total', 'counter', 'Bytes read by each scan phase')
+        for name, stats in phases:
+            lines.append(f'scan_phase_bytes_read_total{{phase="{_escape(name)}"}} {stats.bytes}')
+        family('scan_phase_subprocesses_total', 'counter', 'Subprocesses spawned by each scan phase')
+        for name, stats in phases:
+            lines.append(f'scan_phase_subprocesses_total{{phase="{_escape(name)}"}} {stats.subprocesses}')
+        family('http_request_duration_seconds', 'summary', 'Request latency per endpoint')
+        for (endpoint, method), stats in requests:
+            label = f'endpoint="{_escape(endpoint)}",method="{method}"'
+            lines.append(f'http_request_duration_seconds{{{label},quantile="0.95"}} '
+                         f'{request_quantiles[(endpoint, method)]:.6f}')
+            lines.append(f'http_request_duration_seconds_sum{{{label}}} {stats.total:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{label}}} {stats.calls}')
+        family('http_requests_total', 'counter', 'Requests per endpoint and status code')
+        for (endpoint, method, status), count in statuses:
+            lines.append(f'http_requests_total{{endpoint="{_escape(endpoint)}",method="{method}",'
+                         f'status="{status}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Shared by the scan helpers, the app and the CLI
+metrics_registry = Metrics()
+
+def _after_fork_in_child():
+    # A forked scan worker must not inherit a lock held by another thread
+    metrics_registry._lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
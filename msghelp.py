@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from metrics import metrics_registry
+
+MSGHELP_COMMAND = 'msgHelp'
+MSGHELP_TIMEOUT = 10
+MSGHELP_TTL = float(os.environ.get('MSGHELP_TTL', '3600'))
+MSGHELP_CACHE_SIZE = int(os.environ.get('MSGHELP_CACHE_SIZE', '1024'))
+MSGHELP_MAX_CONCURRENCY = int(os.environ.get('MSGHELP_MAX_CONCURRENCY', '4'))
+
+def run_msghelp(error_id, command=MSGHELP_COMMAND, timeout=MSGHELP_TIMEOUT):
+    metrics_registry.add('msghelp', subprocesses=1)
+    with metrics_registry.phase('msghelp'):
+        result = subprocess.run([command, error_id], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True, timeout=timeout)
+    return result.stdout.strip() or result.stderr.strip() or 'No output.'
+
+class MsgHelpCache:
+    """LRU + TTL cache of msgHelp output keyed by error ID.
+
+    At most `max_concurrency` msgHelp processes run at once, and concurrent
+    lookups of the same ID share a single process. Failures are not cached."""
+
+    def __init__(self, maxsize=MSGHELP_CACHE_SIZE, ttl=MSGHELP_TTL,
+                 max_concurrency=MSGHELP_MAX_CONCURRENCY, timeout=MSGHELP_TIMEOUT,
+                 command=MSGHELP_COMMAND, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timeout = timeout
+        self.command = command
+        self.max_concurrency = max_concurrency
+        self._clock = clock
+        self._entries = OrderedDict()  # error_id -> (expires_at, output)
+        self._inflight = {}            # error_id -> Future
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._prefetcher = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.runs = 0
+        self.errors = 0
+
+    def _cached(self, error_id):
+        entry = self._entries.get(error_id)
+        if entry is None:
+            return None
+        expires_at, output = entry
+        if expires_at <= self._clock():
+            del self._entries[error_id]
+            return None
+        self._entries.move_to_end(error_id)
+        return output
+
+    def get(self, error_id):
+        """msgHelp output for an error ID; raises whatever running msgHelp raised"""
+        with self._lock:
+            output = self._cached(error_id)
+            if output is not None:
+                self.hits += 1
+                return output
+            future = self._inflight.get(error_id)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = self._inflight[error_id] = Future()
+                owner = True
+        if not owner:
+            return future.result()
+
+        try:
+            with self._slots:
+                with self._lock:
+                    self.runs += 1
+                output = run_msghelp(error_id, self.command, self.timeout)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                del self._inflight[error_id]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._entries[error_id] = (self._clock() + self.ttl, output)
+            self._entries.move_to_end(error_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            del self._inflight[error_id]
+        future.set_result(output)
+        return output
+
+    def prefetch(self, error_ids):
+        """Warm the cache for every given ID in the background"""
+        with self._lock:
+            wanted = [e for e in dict.fromkeys(error_ids)
+                      if self._cached(e) is None and e not in self._inflight]
+            if self._prefetcher is None:
+                self._prefetcher = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                      thread_name_prefix='msghelp-prefetch')
+        for error_id in wanted:
+            self._prefetcher.submit(self._prefetch_one, error_id)
+        return len(wanted)
+
+    def _prefetch_one(self, error_id):
+        try:
+            self.get(error_id)
+        except Exception:
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'in_flight': len(self._inflight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'runs': self.runs,
+            'errors': self.errors,
+            'max_concurrency': self.max_concurrency,
+            'ttl': self.ttl
+        }
+
+# Shared by the /api/msghelp endpoint and the chatbot
+msghelp_cache = MsgHelpCache()
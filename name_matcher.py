@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+from collections import deque
+
+class AhoCorasick:
+    """Multi-pattern substring matcher.
+
+    All patterns are matched against a text in one left-to-right pass, so the
+    cost of a lookup depends on the text length and the number of hits, not
+    on how many patterns there are."""
+
+    def __init__(self, patterns=()):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._built = False
+        for key, pattern in patterns:
+            self.add(pattern, key)
+
+    def add(self, pattern, key):
+        """Register `pattern`; find_all() reports `key` when it occurs"""
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(key)
+        self._built = False
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def find_all(self, text):
+        """Keys of every pattern occurring in `text`, in order of first occurrence"""
+        if not self._built:
+            self._build()
+        found = {}
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for key in out[node]:
+                found.setdefault(key, None)
+        return list(found)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+
+ROW_FIELDS = ('testcase_path', 'failing_command', 'error_message', 'tag')
+
+def row_as_dict(row):
+    return dict(zip(ROW_FIELDS, row))
+
+class JSONResultsWriter:
+    """Writes report rows to a JSON array file one row at a time.
+
+    Rows go to a temporary file next to the target, which replaces the
+    target on commit(), so readers never see a half-written result."""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.count = 0
+        self._file = open(self.tmp_path, 'w')
+        self._file.write('[')
+
+    def write_row(self, row):
+        self._file.write(',\n  ' if self.count else '\n  ')
+        json.dump(row_as_dict(row), self._file)
+        self.count += 1
+
+    def commit(self):
+        self._file.write('\n]\n' if self.count else ']\n')
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+# Compact results file layout (all integers little-endian uint32):
+#   header   MAGIC, format version, row count, string count
+#   strings  string count + 1 offsets into a UTF-8 blob; commands, tags and
+#            error messages are interned here
+#   columns  command, error and tag string ids, one per row
+#   paths    front-coded testcase paths: bytes shared with the previous path,
+#            row count + 1 offsets into a suffix blob. Every PATH_RESTART-th
+#            path is stored in full so any row decodes in a bounded number
+#            of steps.
+# Sections start on 4-byte boundaries so the columns can be used in place.
+COMPACT_MAGIC = b'CWFR'
+COMPACT_VERSION = 1
+PATH_RESTART = 16
+_HEADER = struct.Struct('<4sIII')
+
+def _u32(values):
+    arr = array('I', values)
+    if sys.byteorder != 'little':
+        arr.byteswap()
+    return arr.tobytes()
+
+def _pad(n):
+    return -n % 4
+
+def _shared_prefix(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+class CompactResultsWriter:
+    """Writes report rows to the compact results format.
+
+    Same sink interface as JSONResultsWriter; the file is assembled in
+    memory from interned ids and written atomically on commit()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.count = 0
+        self._string_ids = {}
+        self._columns = (array('I'), array('I'), array('I'))
+        self._shared = array('I')
+        self._suffix_offsets = array('I', [0])
+        self._suffixes = bytearray()
+        self._last_path = b''
+
+    def _intern(self, text):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self._string_ids)
+        return string_id
+
+    def write_row(self, row):
+        tc_path, cmd, err, tag = row
+        for column, text in zip(self._columns, (cmd, err, tag)):
+            column.append(self._intern(text))
+        path = tc_path.encode('utf-8', 'surrogateescape')
+        shared = 0 if self.count % PATH_RESTART == 0 else _shared_prefix(self._last_path, path)
+        self._shared.append(shared)
+        self._suffixes += path[shared:]
+        self._suffix_offsets.append(len(self._suffixes))
+        self._last_path = path
+        self.count += 1
+
+    def commit(self):
+        blob = bytearray()
+        offsets = [0]
+        for text in self._string_ids:
+            blob += text.encode('utf-8', 'surrogateescape')
+            offsets.append(len(blob))
+        with open(self.tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(COMPACT_MAGIC, COMPACT_VERSION, self.count, len(self._string_ids)))
+            f.write(_u32(offsets))
+            f.write(blob + bytes(_pad(len(blob))))
+            for column in self._columns + (self._shared, self._suffix_offsets):
+                f.write(_u32(column))
+            f.write(self._suffixes)
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+class CompactResults:
+    """Read-only view of a compact results file.
+
+    The file is memory-mapped and columns are read in place, so opening is
+    cheap whatever the row count. Behaves as a sequence of row dicts, like
+    the list loaded from analyzed_testcases.json; row(i) gives the tuple."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            # Identifies the file that was mapped, even if path is replaced later
+            self.identity = file_identity(st)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        try:
+            magic, version, count, n_strings = _HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            raise ValueError(f"{path}: truncated results file")
+        if magic != COMPACT_MAGIC:
+            raise ValueError(f"{path}: not a compact results file")
+        if version != COMPACT_VERSION:
+            raise ValueError(f"{path}: unsupported results format version {version}")
+        self.count = count
+        view = memoryview(self._map)
+        pos = _HEADER.size
+
+        def take_u32(n):
+            nonlocal pos
+            section = view[pos:pos + 4 * n]
+            pos += 4 * n
+            if len(section) != 4 * n:
+                raise ValueError(f"{path}: truncated results file")
+            if sys.byteorder != 'little':
+                swapped = array('I', section.tobytes())
+                swapped.byteswap()
+                return swapped
+            return section.cast('I')
+
+        self._string_offsets = take_u32(n_strings + 1)
+        blob_len = self._string_offsets[-1]
+        self._blob = view[pos:pos + blob_len]
+        pos += blob_len + _pad(blob_len)
+        self._commands = take_u32(count)
+        self._errors = take_u32(count)
+        self._tags = take_u32(count)
+        self._shared = take_u32(count)
+        self._suffix_offsets = take_u32(count + 1)
+        self._suffixes = view[pos:pos + self._suffix_offsets[-1]]
+        self._strings = [None] * n_strings
+
+    def string(self, string_id):
+        text = self._strings[string_id]
+        if text is None:
+            start, end = self._string_offsets[string_id], self._string_offsets[string_id + 1]
+            text = self._strings[string_id] = bytes(self._blob[start:end]).decode('utf-8', 'surrogateescape')
+        return text
+
+    def _path_bytes(self, i):
+        start = i - i % PATH_RESTART
+        offsets = self._suffix_offsets
+        path = bytes(self._suffixes[offsets[start]:offsets[start + 1]])
+        for j in range(start + 1, i + 1):
+            path = path[:self._shared[j]] + bytes(self._suffixes[offsets[j]:offsets[j + 1]])
+        return path
+
+    @property
+    def string_count(self):
+        return len(self._strings)
+
+    def id_columns(self):
+        """(command, error, tag) string id columns, read in place"""
+        return self._commands, self._errors, self._tags
+
+    def _check_index(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError('row index out of range')
+        return i
+
+    def path(self, i):
+        return self._path_bytes(self._check_index(i)).decode('utf-8', 'surrogateescape')
+
+    def row(self, i):
+        i = self._check_index(i)
+        return (self._path_bytes(i).decode('utf-8', 'surrogateescape'),
+                self.string(self._commands[i]), self.string(self._errors[i]),
+                self.string(self._tags[i]))
+
+    def iter_paths(self):
+        """All testcase paths in order, decoding each from the previous one"""
+        offsets, shared, suffixes = self._suffix_offsets, self._shared, self._suffixes
+        path = b''
+        for i in range(self.count):
+            path = path[:shared[i]] + bytes(suffixes[offsets[i]:offsets[i + 1]])
+            yield path.decode('utf-8', 'surrogateescape')
+
+    def iter_rows(self):
+        """All rows in order"""
+        string = self.string
+        for i, path in enumerate(self.iter_paths()):
+            yield (path, string(self._commands[i]), string(self._errors[i]), string(self._tags[i]))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [row_as_dict(self.row(j)) for j in range(*i.indices(self.count))]
+        return row_as_dict(self.row(i))
+
+    def __iter__(self):
+        return (row_as_dict(row) for row in self.iter_rows())
+
+def file_identity(st):
+    """(inode, size, mtime) of an os.stat() result; changes when a file is replaced"""
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+def write_compact_results(rows, path):
+    writer = CompactResultsWriter(path)
+    for row in rows:
+        writer.write_row(row)
+    writer.commit()
+
+def export_json(rows, path):
+    """Write rows (e.g. CompactResults.iter_rows()) as analyzed_testcases.json"""
+    writer = JSONResultsWriter(path)
+    try:
+        for row in rows:
+            writer.write_row(row)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.commit()
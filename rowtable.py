@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+from array import array
+
+from results_io import row_as_dict
+
+class RowTable:
+    """Column store for report rows.
+
+    Commands, error messages and tags are interned once in `strings` and
+    referenced by integer id; testcase paths are kept in a plain list.
+    A row id is the row's position in scan order. Indexing or iterating
+    the table gives (testcase_path, failing_command, error_message, tag)
+    tuples built on the fly."""
+
+    __slots__ = ('paths', 'strings', 'command_ids', 'error_ids', 'tag_ids',
+                 '_string_ids', '_path_order')
+
+    def __init__(self, rows=()):
+        self.paths = []
+        self.strings = []
+        self.command_ids = array('I')
+        self.error_ids = array('I')
+        self.tag_ids = array('I')
+        self._string_ids = {}
+        self._path_order = None
+        for row in rows:
+            self.append(row)
+
+    def intern(self, text):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def string_id(self, text):
+        """Id of an interned string, or None when no row uses it"""
+        return self._string_ids.get(text)
+
+    def append(self, row):
+        tc_path, cmd, err, tag = row
+        self.paths.append(tc_path)
+        self.command_ids.append(self.intern(cmd))
+        self.error_ids.append(self.intern(err))
+        self.tag_ids.append(self.intern(tag))
+        self._path_order = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self.paths)))]
+        strings = self.strings
+        return (self.paths[i], strings[self.command_ids[i]],
+                strings[self.error_ids[i]], strings[self.tag_ids[i]])
+
+    def __iter__(self):
+        strings = self.strings
+        for tc_path, cmd, err, tag in zip(self.paths, self.command_ids, self.error_ids, self.tag_ids):
+            yield tc_path, strings[cmd], strings[err], strings[tag]
+
+    def command(self, i):
+        return self.strings[self.command_ids[i]]
+
+    def tag(self, i):
+        return self.strings[self.tag_ids[i]]
+
+    def paths_for(self, ids):
+        paths = self.paths
+        return [paths[i] for i in ids]
+
+    def dicts(self, ids=None):
+        """Rows as JSON-ready dicts, for all rows or the given ids"""
+        if ids is None:
+            return [row_as_dict(row) for row in self]
+        return [row_as_dict(self[i]) for i in ids]
+
+    def path_order(self):
+        """Row ids sorted by testcase path, computed once per table"""
+        order = self._path_order
+        if order is None:
+            paths = self.paths
+            order = self._path_order = array('I', sorted(range(len(paths)), key=paths.__getitem__))
+        return order
+
+class MappedPaths:
+    """Testcase paths of a CompactResults file as a read-only sequence"""
+
+    __slots__ = ('results',)
+
+    def __init__(self, results):
+        self.results = results
+
+    def __len__(self):
+        return len(self.results)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.results.path(j) for j in range(*i.indices(len(self.results)))]
+        return self.results.path(i)
+
+    def __iter__(self):
+        return self.results.iter_paths()
+
+class MappedRowTable(RowTable):
+    """Read-only RowTable over a memory-mapped compact results file.
+
+    The id columns are used in place and paths are decoded on access, so
+    processes that open the same file share one copy of the rows through
+    the page cache. Only the interned strings are held per process."""
+
+    __slots__ = ('results',)
+
+    def __init__(self, results):
+        self.results = results
+        self.paths = MappedPaths(results)
+        self.strings = [results.string(i) for i in range(results.string_count)]
+        self.command_ids, self.error_ids, self.tag_ids = results.id_columns()
+        self._string_ids = {text: i for i, text in enumerate(self.strings)}
+        self._path_order = None
+
+    def append(self, row):
+        raise TypeError('MappedRowTable is read-only')
+
+    def path_order(self):
+        order = self._path_order
+        if order is None:
+            # Decode every path once instead of once per comparison
+            paths = list(self.paths)
+            order = self._path_order = array('I', sorted(range(len(paths)), key=paths.__getitem__))
+        return order
+
+class RowDicts:
+    """Read-only sequence of a RowTable's rows as dicts, built on access.
+
+    Lets consumers that expect analyzed_testcases.json-style data (such as
+    the chatbot) read a snapshot without a second copy of every row."""
+
+    __slots__ = ('table',)
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [row_as_dict(row) for row in self.table[i]]
+        return row_as_dict(self.table[i])
+
+    def __iter__(self):
+        return (row_as_dict(row) for row in self.table)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+import os
+import operator
+import queue
+import threading
+import time
+from collections import deque
+
+# Seconds one testcase may take before the watchdog gives up on it (0 = no limit)
+SCAN_TESTCASE_TIMEOUT = float(os.environ.get('SCAN_TESTCASE_TIMEOUT', '300'))
+# Seconds a whole scan may take; testcases not done by then are reported as
+# timed out and the scan returns what it has (0 = no limit)
+SCAN_TIMEOUT = float(os.environ.get('SCAN_TIMEOUT', '0'))
+# How often the watchdog looks at testcases that have not started yet
+WATCH_INTERVAL = 0.5
+
+class TimedOut:
+    """Scan result of a testcase the watchdog gave up on.
+
+    Falsy like the result of a testcase without an issue, so consumers that
+    only keep rows skip it. `reason` is 'testcase_timeout' (it ran longer than
+    its budget), 'scan_timeout' (still running when the scan ran out of time)
+    or 'not_started' (never started before the scan ran out of time).
+
+    The testcases not even read from the input when the scan ran out of time
+    are summed up by one last result with reason 'remaining', no testcase
+    and their `count` (None when the input cannot tell)."""
+
+    __slots__ = ('testcase', 'reason', 'seconds', 'count')
+
+    def __init__(self, testcase, reason, seconds=0.0, count=1):
+        self.testcase = testcase
+        self.reason = reason
+        self.seconds = seconds
+        self.count = count
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"TimedOut({self.testcase!r}, {self.reason!r}, {self.seconds:.1f})"
+
+    @property
+    def remaining(self):
+        return self.reason == 'remaining'
+
+    def as_dict(self):
+        entry = {'testcase': self.testcase, 'reason': self.reason, 'seconds': round(self.seconds, 3)}
+        if self.remaining:
+            entry['count'] = self.count
+        return entry
+
+class ScanBudget:
+    """Per-testcase and whole-scan time limits of one scan"""
+
+    def __init__(self, testcase_timeout=SCAN_TESTCASE_TIMEOUT, scan_timeout=SCAN_TIMEOUT):
+        self.testcase_timeout = testcase_timeout or None
+        self.scan_timeout = scan_timeout or None
+
+    @property
+    def enabled(self):
+        return bool(self.testcase_timeout or self.scan_timeout)
+
+class _Slot:
+    __slots__ = ('item', 'started', 'result', 'error', 'done', 'abandoned')
+
+    def __init__(self, item):
+        self.item = item
+        self.started = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.abandoned = False
+
+def _worker(tasks, func, stop, lock):
+    while True:
+        slot = tasks.get()
+        if slot is None or stop.is_set():
+            return
+        slot.started = time.monotonic()
+        try:
+            slot.result = func(slot.item)
+        except BaseException as e:
+            slot.error = e
+        # Finishing and being given up on exclude each other (see run_watched)
+        with lock:
+            slot.done.set()
+            abandoned = slot.abandoned
+        # A worker that was given up on was replaced; it retires when it returns
+        if abandoned:
+            return
+
+def run_watched(func, items, workers, budget, testcase_of=lambda item: item):
+    """Yield func(item) for every item, in input order, giving up on items
+    that exceed the budget.
+
+    Items run in daemon worker threads, so a call blocked on a hung NFS read
+    or subprocess can be abandoned: its result becomes a TimedOut and a new
+    worker takes its place. Once the whole-scan budget is spent, the items
+    still running or not started yet are reported as TimedOut as well; the
+    rest of the input is not read any more (it is closed if it can be) and
+    reported as one 'remaining' TimedOut."""
+    tasks = queue.Queue()
+    stop = threading.Event()
+    lock = threading.Lock()
+    spawned = []
+
+    def spawn():
+        spawned.append(True)
+        threading.Thread(target=_worker, args=(tasks, func, stop, lock), name='scan-watched',
+                         daemon=True).start()
+
+    for _ in range(workers):
+        spawn()
+    deadline = time.monotonic() + budget.scan_timeout if budget.scan_timeout else None
+    pending = deque()
+    items = iter(items)
+    window = workers * 4
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    slot = _Slot(next(items))
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append(slot)
+                tasks.put(slot)
+            if not pending:
+                return
+            slot = pending[0]
+            now = time.monotonic()
+            limits = [WATCH_INTERVAL]
+            if deadline is not None:
+                limits.append(deadline - now)
+            if budget.testcase_timeout and slot.started is not None:
+                limits.append(slot.started + budget.testcase_timeout - now)
+            if not slot.done.wait(max(0.0, min(limits))):
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    break
+                if not budget.testcase_timeout or slot.started is None \
+                        or now - slot.started < budget.testcase_timeout:
+                    continue
+                # Give up unless the worker finished in the meantime: decided
+                # under the lock, so its result is neither lost nor its
+                # worker left running next to the replacement
+                with lock:
+                    slot.abandoned = not slot.done.is_set()
+                if slot.abandoned:
+                    pending.popleft()
+                    spawn()
+                    yield TimedOut(testcase_of(slot.item), 'testcase_timeout', now - slot.started)
+                    continue
+            pending.popleft()
+            if slot.error is not None:
+                raise slot.error
+            yield slot.result
+        # Out of time: report everything not finished, without scanning it
+        stop.set()
+        now = time.monotonic()
+        for slot in pending:
+            if slot.done.is_set() and slot.error is None:
+                yield slot.result
+            elif slot.started is not None:
+                yield TimedOut(testcase_of(slot.item), 'scan_timeout', now - slot.started)
+            else:
+                yield TimedOut(testcase_of(slot.item), 'not_started')
+        pending.clear()
+        if not exhausted:
+            count = operator.length_hint(items, -1)
+            close = getattr(items, 'close', None)
+            if close is not None:
+                close()
+            if count:
+                yield TimedOut(None, 'remaining', count=None if count < 0 else count)
+    finally:
+        stop.set()
+        for _ in spawned:
+            tasks.put(None)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import os
+import glob
+import json
+import tempfile
+import threading
+
+from make_order import MAKEFILE_NAMES, makefile_includes
+
+CACHE_VERSION = 4
+SIGNATURE_FILES = ('status.log',) + MAKEFILE_NAMES
+# Include lists of Makefiles by (path, size, mtime), so an unchanged
+# Makefile is not read again on every cache check
+MAX_CACHED_INCLUDES = 65536
+_includes = {}
+
+def _stat_entry(path, name):
+    try:
+        st = os.stat(os.path.join(path, name))
+    except OSError:
+        return None
+    return [name, st.st_size, st.st_mtime_ns]
+
+def testcase_signature(tc):
+    """Size/mtime fingerprint of every file the scan result depends on.
+
+    Returns None when the testcase directory does not exist."""
+    try:
+        names = os.listdir(tc)
+    except OSError:
+        return None
+    signature = []
+    makefile = None
+    for name in SIGNATURE_FILES:
+        entry = _stat_entry(tc, name)
+        if entry:
+            signature.append(entry)
+            if makefile is None and name in MAKEFILE_NAMES:
+                makefile = entry  # the one make reads
+    if makefile is not None:
+        for name in _included_files(tc, makefile):
+            signature.append(_stat_entry(tc, name) or [name, None, None])
+    for name in sorted(f for f in names if f.endswith('.diff.bak')):
+        entry = _stat_entry(tc, name)
+        if entry:
+            signature.append(entry)
+    return signature
+
+def _included_files(tc, makefile):
+    """Files included by a testcase's Makefile, relative to the testcase"""
+    key = (tc,) + tuple(makefile)
+    names = _includes.get(key)
+    if names is None:
+        try:
+            with open(os.path.join(tc, makefile[0]), 'rb') as f:
+                text = f.read().decode(errors='replace')
+        except OSError:
+            return []
+        names = []
+        for name in makefile_includes(text):
+            if glob.has_magic(name):
+                names.extend(sorted(os.path.relpath(path, tc) for path in glob.glob(os.path.join(tc, name))))
+            else:
+                names.append(name)
+        if len(_includes) >= MAX_CACHED_INCLUDES:
+            _includes.clear()
+        _includes[key] = names
+    return names
+
+class ScanCache:
+    """On-disk cache of per-testcase scan results, validated by file signatures"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print(f"❌ ERROR: could not read scan cache {self.path}, starting empty.")
+            return
+        if data.get('version') == CACHE_VERSION:
+            self.entries = data.get('entries', {})
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {'version': CACHE_VERSION, 'entries': self.entries}
+            # A temp file of its own, so processes saving the same cache
+            # never write into each other's half-written file
+            fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.", suffix='.tmp',
+                                            dir=os.path.dirname(self.path) or '.')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(payload, f, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            self._dirty = False
+
+    def lookup(self, tc):
+        """Return the cached (signature, row) pair for a testcase, if any"""
+        return self.entries.get(tc)
+
+    def record(self, tc, signature, row, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                return
+            self.misses += 1
+            if tc in self.entries:
+                self.invalidations += 1
+            if signature is None:
+                self.entries.pop(tc, None)
+            else:
+                self.entries[tc] = [signature, row]
+            self._dirty = True
+
+    def invalidate(self, testcases=None):
+        """Drop cached entries (all of them when no testcases are given)"""
+        with self._lock:
+            if testcases is None:
+                count = len(self.entries)
+                self.entries = {}
+            else:
+                count = 0
+                for tc in testcases:
+                    if self.entries.pop(tc, None) is not None:
+                        count += 1
+            self.invalidations += count
+            self._dirty = True
+        self.save()
+        return count
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'path': self.path,
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
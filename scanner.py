@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+import os
+import re
+from collections import deque
+from functools import partial
+
+from metrics import metrics_registry
+from logscan import find_first_error_line, find_status_failing_command
+from make_order import default_resolver
+from scan_cache import testcase_signature
+from error_clustering import CLUSTER_UNTAGGED, drop_untagged, label_untagged
+from scan_budget import ScanBudget, TimedOut, run_watched
+
+# Scan engine settings, overridable from the environment
+DEFAULT_BACKEND = os.environ.get('SCAN_BACKEND', 'thread')
+DEFAULT_WORKERS = int(os.environ.get('SCAN_WORKERS', '0') or 0)
+PROCESS_CHUNKSIZE = 64
+
+def read_testcases(file_path='testcases.txt'):
+    try:
+        with open(file_path) as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        print("❌ ERROR: testcases.txt not found.")
+        return []
+
+def get_status_log_failing_command(tc_path):
+    return find_status_failing_command(os.path.join(tc_path, "status.log"))
+
+def get_make_n_failing_order(tc_path, available_diff_files):
+    with metrics_registry.phase('make_order'):
+        return default_resolver.failing_base(tc_path, available_diff_files)
+
+def extract_first_error_line(diff_file_path):
+    return find_first_error_line(diff_file_path)
+
+def extract_error_tag(error_line):
+    if not error_line:
+        return None
+    m = re.search(r'\(([A-Z]{3,4}-\d+)\)', error_line)
+    return m.group(1) if m else None
+
+def scan_testcase(tc):
+    """Scan a single testcase directory and return its report row, or None"""
+    with metrics_registry.phase('scan_testcase'):
+        return _scan_testcase(tc)
+
+def _scan_testcase(tc):
+    with metrics_registry.phase('listdir'):
+        if not os.path.isdir(tc):
+            return None
+        diff_files = [f for f in os.listdir(tc) if f.endswith(".diff.bak")]
+
+    status_cmd = get_status_log_failing_command(tc)
+    make_cmd = get_make_n_failing_order(tc, diff_files)
+    final_cmd = status_cmd or make_cmd
+
+    if final_cmd:
+        diff_file_path = os.path.join(tc, f"{final_cmd}.diff.bak")
+        error_line = extract_first_error_line(diff_file_path)
+
+        if error_line:
+            tag = extract_error_tag(error_line)
+
+            short_error = (
+                error_line if len(error_line) <= 45 else error_line[:42] + "..."
+            )
+            if not tag:
+                # Untagged rows get an empty tag and keep the whole error line,
+                # which iter_scan clusters on (or drops the row)
+                return [tc, final_cmd, short_error, '', error_line]
+            return [tc, final_cmd, short_error, tag]
+    return None
+
+def scan_testcase_cached(tc, cached=None):
+    """Scan a testcase unless its cached result is still valid.
+
+    Returns (row, signature, hit)."""
+    with metrics_registry.phase('signature'):
+        signature = testcase_signature(tc)
+    if cached is not None and signature is not None and cached[0] == signature:
+        return cached[1], signature, True
+    return scan_testcase(tc), signature, False
+
+def _scan_cached_item(item):
+    return scan_testcase_cached(*item)
+
+def _run_chunk(func, chunk):
+    """Process-pool entry point: run a batch of tasks in one round trip.
+
+    Returns the results and the phase metrics recorded for them."""
+    metrics_registry.reset()
+    return [func(item) for item in chunk], metrics_registry.export()
+
+def _chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _ordered_map(executor, fn, items, window):
+    """Like executor.map, but keeps at most `window` tasks in flight so that
+    inputs can be consumed lazily while results still come back in input order"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def _scan_serial(func, items, workers):
+    for item in items:
+        yield func(item)
+
+def _scan_threads(func, items, workers):
+    # Executors are imported on first use to keep startup fast for the CLI
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from _ordered_map(executor, func, items, workers * 4)
+
+def _scan_watched(func, items, workers, budget):
+    return run_watched(func, items, workers, budget, _item_testcase)
+
+def _scan_processes(func, items, workers):
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = _chunked(items, PROCESS_CHUNKSIZE)
+        task = partial(_run_chunk, func)
+        for results, phases in _ordered_map(executor, task, chunks, workers * 2):
+            metrics_registry.merge(phases)
+            yield from results
+
+# Registered scan backends: name -> callable(func, items, workers) yielding
+# func(item) for every item, in input order. Under the process backend `func`
+# must be a picklable module-level function.
+SCAN_BACKENDS = {
+    'serial': _scan_serial,
+    'thread': _scan_threads,
+    'process': _scan_processes,
+}
+
+def register_scan_backend(name, func):
+    """Register an additional scan backend under `name`"""
+    SCAN_BACKENDS[name] = func
+
+def default_workers(backend):
+    if DEFAULT_WORKERS > 0:
+        return DEFAULT_WORKERS
+    cpus = os.cpu_count() or 1
+    if backend == 'process':
+        return cpus
+    # Scanning is dominated by filesystem latency and make subprocesses,
+    # so threads can oversubscribe the CPUs
+    return min(32, cpus + 4)
+
+def _resolve_backend(backend, workers):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in SCAN_BACKENDS:
+        raise ValueError(f"Unknown scan backend: {backend}")
+    workers = workers or default_workers(backend)
+    if workers <= 1 and backend != 'serial':
+        backend = 'serial'
+    return SCAN_BACKENDS[backend], workers
+
+def _iter_scan_cached(run, testcases, workers, cache):
+    pending = deque()
+
+    def items():
+        for tc in testcases:
+            pending.append(tc)
+            yield tc, cache.lookup(tc)
+
+    try:
+        for result in run(_scan_cached_item, items(), workers):
+            if isinstance(result, TimedOut):
+                if not result.remaining:
+                    pending.popleft()
+                yield result
+                continue
+            tc = pending.popleft()
+            row, signature, hit = result
+            cache.record(tc, signature, row, hit)
+            yield row
+    finally:
+        cache.save()
+
+def _item_testcase(item):
+    return item[0] if isinstance(item, tuple) else item
+
+def iter_raw_scan(testcases, backend=None, workers=None, cache=None, budget=None):
+    """Like iter_scan, but rows without an issue tag keep an empty tag and
+    their full error line as fifth element"""
+    run, workers = _resolve_backend(backend, workers)
+    budget = budget or ScanBudget()
+    # A hung call can only be abandoned in a thread, so budgeted serial and
+    # thread scans run under the watchdog; process scans are not budgeted
+    if budget.enabled and run in (_scan_serial, _scan_threads):
+        if run is _scan_serial:
+            # One watched worker, replaced only when it is given up on
+            workers = 1
+        run = partial(_scan_watched, budget=budget)
+    if cache is None:
+        return run(scan_testcase, testcases, workers)
+    return _iter_scan_cached(run, testcases, workers, cache)
+
+def iter_scan(testcases, backend=None, workers=None, cache=None, cluster_untagged=None, budget=None):
+    """Yield one scan result per testcase, in the order the testcases are given.
+
+    When a ScanCache is passed, testcases whose files are unchanged since the
+    last scan are served from it instead of being rescanned. Error lines
+    without an issue tag are grouped by similarity into CLUSTER-<hex> tags,
+    or yielded as None with cluster_untagged=False (default CLUSTER_UNTAGGED).
+    Testcases that exceed the ScanBudget (default from SCAN_TESTCASE_TIMEOUT /
+    SCAN_TIMEOUT) are yielded as falsy TimedOut results."""
+    results = iter_raw_scan(testcases, backend, workers, cache, budget)
+    if cluster_untagged is None:
+        cluster_untagged = CLUSTER_UNTAGGED
+    return label_untagged(results) if cluster_untagged else drop_untagged(results)
+
+def analyze_testcases(testcases, backend=None, workers=None, cache=None, cluster_untagged=None, shard=None):
+    """Rows of the testcases with an issue; with a ShardSpec (see shards.py)
+    only the testcases of that shard are scanned"""
+    if shard is not None:
+        testcases = shard.select(testcases)
+    return [row for row in iter_scan(testcases, backend, workers, cache, cluster_untagged) if row]
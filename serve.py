@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Serve the dashboard with several worker processes.
+
+All workers serve one shared analysis (SHARED_SNAPSHOT=1): the worker that
+scans writes analyzed_testcases.cwr and every worker memory-maps that file
+read-only, so the rows are neither held nor recomputed per worker.
+
+gunicorn is used when it is installed; otherwise the workers are forked
+Werkzeug servers accepting on one shared listening socket, restarted if
+they exit.
+
+Usage: python serve.py [--workers N] [--host HOST] [--port PORT]
+"""
+
+import argparse
+import importlib.util
+import os
+import signal
+import socket
+import sys
+
+DEFAULT_WORKERS = int(os.environ.get('WEB_WORKERS', str(min(os.cpu_count() or 1, 8))))
+LISTEN_BACKLOG = 256
+
+def run_worker(sock, host, port):
+    """Serve requests from the shared socket until terminated"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    from werkzeug.serving import make_server
+    import app
+    server = make_server(host, port, app.app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+def serve_prefork(host, port, workers):
+    sock = socket.create_server((host, port), backlog=LISTEN_BACKLOG)
+    sock.set_inheritable(True)
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(sock, host, port)
+            except BaseException as e:
+                print(f"❌ ERROR: worker {os.getpid()} failed: {e}", file=sys.stderr)
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = True
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    print(f"Serving on http://{host}:{port} with {workers} workers (pid {os.getpid()})", flush=True)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if children.pop(pid, None) and not stopping:
+            print(f"❌ ERROR: worker {pid} exited with status {status}; restarting", file=sys.stderr)
+            spawn()
+    sock.close()
+
+def serve_gunicorn(host, port, workers):
+    os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+                               '--threads', '4', '--bind', f'{host}:{port}', 'app:app'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the dashboard with several worker processes')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--no-gunicorn', action='store_true',
+                        help='use the built-in pre-forking server even if gunicorn is installed')
+    args = parser.parse_args(argv)
+    os.environ['SHARED_SNAPSHOT'] = '1'
+    if not args.no_gunicorn and importlib.util.find_spec('gunicorn') is not None:
+        serve_gunicorn(args.host, args.port, args.workers)
+    else:
+        serve_prefork(args.host, args.port, args.workers)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import deque
+
+from categories import CategoryIndex, build_category_tables
+from discovery import DiscoveryWalk, discovery_source
+from error_clustering import CLUSTER_UNTAGGED, drop_untagged, label_untagged
+from scan_budget import TimedOut
+from scanner import iter_raw_scan, read_testcases
+from snapshot import make_snapshot
+
+PARTIAL_FORMAT = 'cwf-partial'
+PARTIAL_VERSION = 2
+SHARD_MODES = ('hash', 'path', 'root')
+
+class ShardSpec:
+    """Shard `index` (0-based) of `count`.
+
+    By 'hash' (or 'path') a testcase belongs to the shard its path hashes to;
+    by 'root' every testcase of a directory goes to the same shard: its
+    parent directory is hashed, and discovery roots are dealt out round-robin
+    so each shard only walks its own roots."""
+
+    def __init__(self, index, count, by='hash'):
+        if by not in SHARD_MODES:
+            raise ValueError(f"Shard mode must be one of {', '.join(SHARD_MODES)}")
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index + 1} of {count}")
+        self.index = index
+        self.count = count
+        self.by = 'hash' if by == 'path' else by
+
+    def __repr__(self):
+        return f"ShardSpec({self.index + 1}/{self.count}:{self.by})"
+
+    def as_dict(self):
+        return {'index': self.index, 'count': self.count, 'by': self.by}
+
+    def key(self, tc):
+        path = os.path.normpath(tc)
+        return os.path.dirname(path) if self.by == 'root' else path
+
+    def owns(self, tc):
+        digest = hashlib.blake2b(self.key(tc).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % self.count == self.index
+
+    def select(self, testcases):
+        return (tc for tc in testcases if self.owns(tc))
+
+    def roots(self, roots):
+        """Discovery roots this shard walks; all of them unless sharding by root"""
+        if self.by != 'root':
+            return list(roots)
+        return [root for i, root in enumerate(sorted(roots)) if i % self.count == self.index]
+
+def parse_shard(text):
+    """ShardSpec from 'N/M' or 'N/M:MODE', with N counted from 1"""
+    spec, _, by = text.partition(':')
+    try:
+        number, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like N/M or N/M:{'|'.join(SHARD_MODES)}, got {text!r}")
+    return ShardSpec(number - 1, count, by or 'hash')
+
+def build_partial(shard, testcase_file=None, lists_dir=None, backend=None, workers=None,
+                  cache=None, discover_roots=None, budget=None):
+    """Scan one shard and return its mergeable partial result.
+
+    Rows keep the position of their testcase in the testcases file so the
+    merge can restore the order of a full scan, and untagged rows keep an
+    empty tag and their full error line: they are clustered over all shards
+    at merge time. The
+    category memberships of the shard's testcases travel along, so the
+    merge does not need the list files."""
+    positions = deque()
+    owns = shard.owns
+    if discover_roots:
+        source = discovery_source(discover_roots)
+        # Discovered testcases have no file order; the merge sorts them by path
+        numbered = ((None, tc) for tc in DiscoveryWalk(shard.roots(discover_roots)))
+        if shard.by == 'root':
+            # The roots were already split between the shards
+            owns = lambda tc: True
+    else:
+        source = testcase_file
+        numbered = enumerate(read_testcases(testcase_file))
+
+    def selected():
+        for position, tc in numbered:
+            if owns(tc):
+                positions.append(position)
+                yield tc
+
+    scanned = 0
+    rows = []
+    counts = {}
+    timed_out = []
+    for row in iter_raw_scan(selected(), backend, workers, cache, budget):
+        if isinstance(row, TimedOut):
+            timed_out.append(row.as_dict())
+            if row.remaining:
+                continue
+        position = positions.popleft()
+        scanned += 1
+        if not row:
+            continue
+        rows.append([position] + list(row))
+        per_cmd = counts.setdefault(row[1], {})
+        per_cmd[row[3]] = per_cmd.get(row[3], 0) + 1
+    masks = {}
+    if lists_dir:
+        index = CategoryIndex(lists_dir)
+        index.refresh()
+        for row in rows:
+            mask = index.mask(row[1])
+            if mask:
+                masks[row[1]] = mask
+    return {
+        'format': PARTIAL_FORMAT,
+        'version': PARTIAL_VERSION,
+        'shard': shard.as_dict(),
+        'source': source,
+        'scanned': scanned,
+        'rows': rows,
+        'cluster_counts': counts,
+        'categories': masks,
+        'timed_out': timed_out
+    }
+
+def write_partial(partial, path):
+    fd, tmp = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix='.tmp',
+                               dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(partial, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def shard_cache_path(path, shard):
+    """Scan cache file of one shard: shards given the same --cache keep
+    separate files, so no shard's save drops the entries of another"""
+    return f"{path}.{shard.index + 1}of{shard.count}"
+
+
+def load_partial(path):
+    with open(path) as f:
+        partial = json.load(f)
+    if partial.get('format') != PARTIAL_FORMAT or partial.get('version') != PARTIAL_VERSION:
+        raise ValueError(f"{path} is not a version {PARTIAL_VERSION} partial result")
+    return partial
+
+def _check_counts(partial):
+    counts = {}
+    for row in partial['rows']:
+        per_cmd = counts.setdefault(row[2], {})
+        per_cmd[row[4]] = per_cmd.get(row[4], 0) + 1
+    if counts != partial['cluster_counts']:
+        shard = partial['shard']
+        raise ValueError(f"Partial of shard {shard['index'] + 1}/{shard['count']} has cluster counts "
+                         "that do not match its rows")
+
+def merge_partials(partials, cluster_untagged=None):
+    """Combine the partials of every shard into (snapshot, CategoryTables),
+    the same clustered summary, error table and combined table as a full scan.
+
+    Raises ValueError unless the partials are exactly the shards 1..M of one
+    shard layout and source."""
+    if not partials:
+        raise ValueError("No partial results to merge")
+    first = partials[0]
+    count, by, source = first['shard']['count'], first['shard']['by'], first['source']
+    seen = set()
+    for partial in partials:
+        shard = partial['shard']
+        if (shard['count'], shard['by'], partial['source']) != (count, by, source):
+            raise ValueError("Partials come from different shard layouts or sources")
+        if shard['index'] in seen:
+            raise ValueError(f"Shard {shard['index'] + 1}/{count} was given twice")
+        seen.add(shard['index'])
+        _check_counts(partial)
+    missing = sorted(set(range(count)) - seen)
+    if missing:
+        raise ValueError(f"Missing shards: {', '.join(f'{i + 1}/{count}' for i in missing)}")
+
+    rows = [row for partial in partials for row in partial['rows']]
+    rows.sort(key=lambda row: (row[0] is None, row[0] or 0, row[1]))
+    rows = [row[1:] for row in rows]
+    if cluster_untagged is None:
+        cluster_untagged = CLUSTER_UNTAGGED
+    rows = [row for row in (label_untagged(rows) if cluster_untagged else drop_untagged(rows)) if row]
+    masks = {}
+    for partial in partials:
+        masks.update(partial['categories'])
+    timed_out = [entry for partial in partials for entry in partial.get('timed_out', ())]
+    snapshot = make_snapshot(rows, 1, source, sum(partial['scanned'] for partial in partials), timed_out)
+    return snapshot, build_category_tables(snapshot, masks)
+
+def run_local_shards(source, count, by='hash', workdir='.', extra_args=()):
+    """Scan `source` (a testcases file or result directory) as `count` shards
+    in parallel local cli.py processes and return the partial file paths"""
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli.py')
+    paths = [os.path.join(workdir, f"shard_{i + 1}_of_{count}.json") for i in range(count)]
+    procs = [subprocess.Popen([sys.executable, cli, source, '--shard', f"{i + 1}/{count}:{by}",
+                               '--format', 'partial', '-o', path] + list(extra_args))
+             for i, path in enumerate(paths)]
+    failed = [i + 1 for i, proc in enumerate(procs) if proc.wait() != 0]
+    if failed:
+        raise RuntimeError(f"Shards {failed} of {count} failed")
+    return paths
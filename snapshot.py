@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+
+import fcntl
+import json
+import os
+import threading
+import time
+from array import array
+from collections import namedtuple
+from datetime import datetime
+
+from discovery import DiscoveryWalk
+from error_clustering import CLUSTER_UNTAGGED, ErrorClusterer, drop_untagged, is_cluster_tag, label_untagged
+from results_io import CompactResults, CompactResultsWriter, file_identity
+from rowtable import MappedRowTable, RowTable
+from scan_budget import TimedOut
+from scanner import iter_raw_scan, read_testcases
+
+DEFAULT_TESTCASE_FILE = os.path.join('scripts', 'result_reg', 'testcases.txt')
+# Seconds between progress events of a streaming refresh
+PROGRESS_INTERVAL = 0.5
+# Testcases the scan watchdog gave up on are rescanned this many seconds
+# after the snapshot was published (0 = never), at most SCAN_RETRIES times
+SCAN_RETRY_DELAY = float(os.environ.get('SCAN_RETRY_DELAY', '60'))
+SCAN_RETRIES = int(os.environ.get('SCAN_RETRIES', '3'))
+
+# One immutable analysis result. Every dashboard endpoint reads from the
+# snapshot that is current when the request starts.
+AnalysisSnapshot = namedtuple('AnalysisSnapshot', [
+    'version',       # increasing integer id
+    'built_at',      # "%Y-%m-%d %H:%M:%S" build timestamp
+    'source',        # testcases file the snapshot was built from
+    'total_cases',   # number of testcases listed in the source
+    'rows',          # RowTable of (testcase_path, failing_command, error_message, tag)
+    'summary',       # tuple of per-command summary dicts, sorted for the frontend
+    'clusters',      # {command: {tag: {'error_message', 'testcases': row id array}}}
+    'timed_out',     # tuple of {'testcase', 'reason', 'seconds', 'attempts', 'row_index'}
+                     # the watchdog gave up on; row_index is where its row would go
+    'retry_of',      # version of the snapshot whose timed-out testcases were rescanned
+], defaults=((), None))
+
+def cluster_rows(rows):
+    """Group report rows by failing command and tag.
+
+    Returns (summary, clusters) as served by /api/clustered. `rows` is a
+    RowTable (other row sequences are converted); cluster testcases are
+    arrays of its row ids."""
+    if not isinstance(rows, RowTable):
+        rows = RowTable(rows)
+    by_ids = {}
+    for i, (cmd_id, tag_id) in enumerate(zip(rows.command_ids, rows.tag_ids)):
+        per_cmd = by_ids.get(cmd_id)
+        if per_cmd is None:
+            per_cmd = by_ids[cmd_id] = {}
+        ids = per_cmd.get(tag_id)
+        if ids is None:
+            ids = per_cmd[tag_id] = array('I')
+        ids.append(i)
+    strings = rows.strings
+    clusters = {}
+    for cmd_id, per_cmd in by_ids.items():
+        clusters[strings[cmd_id]] = {
+            strings[tag_id]: {'error_message': strings[rows.error_ids[ids[0]]], 'testcases': ids}
+            for tag_id, ids in per_cmd.items()
+        }
+    # Prepare summary for frontend
+    summary = []
+    for cmd, tag_dict in clusters.items():
+        unique = len(tag_dict)
+        total = sum(len(v['testcases']) for v in tag_dict.values())
+        summary.append({
+            'failing_command': cmd,
+            'unique_failures': unique,
+            'total_failures': total,
+            'tags': [
+                {
+                    'tag': tag,
+                    'error_message': tag_dict[tag]['error_message'],
+                    'count': len(tag_dict[tag]['testcases']),
+                    # Group of similar untagged error lines rather than an issue tag
+                    'auto_cluster': is_cluster_tag(tag)
+                } for tag in tag_dict
+            ]
+        })
+    # Sort by total_failures in descending order
+    summary.sort(key=lambda x: x['total_failures'], reverse=True)
+    # Add S.No after sorting
+    for i, item in enumerate(summary, 1):
+        item['sno'] = i
+    return summary, clusters
+
+def make_snapshot(rows, version, source=None, total_cases=None, timed_out=(), retry_of=None):
+    if not isinstance(rows, RowTable):
+        rows = RowTable(rows)
+    summary, clusters = cluster_rows(rows)
+    return AnalysisSnapshot(
+        version=version,
+        built_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        source=source,
+        total_cases=len(rows) if total_cases is None else total_cases,
+        rows=rows,
+        summary=tuple(summary),
+        clusters=clusters,
+        timed_out=tuple(timed_out),
+        retry_of=retry_of
+    )
+
+class SnapshotStore:
+    """Holds the current AnalysisSnapshot and rebuilds it on demand.
+
+    Readers never trigger a scan once a snapshot exists; new snapshots are
+    only built by refresh(), either explicitly or from the background
+    refresher thread, and replace the current one atomically."""
+
+    def __init__(self, testcase_file=DEFAULT_TESTCASE_FILE, scan=iter_raw_scan, discovery_roots=(),
+                 discover_always=False, retry_delay=SCAN_RETRY_DELAY, max_retries=SCAN_RETRIES,
+                 cluster_untagged=None):
+        self.testcase_file = testcase_file
+        # scan(testcases) yields raw rows (see iter_raw_scan): the store
+        # clusters the untagged ones (or drops them with cluster_untagged=False)
+        self.scan = scan
+        self.cluster_untagged = CLUSTER_UNTAGGED if cluster_untagged is None else cluster_untagged
+        # (label, normalized first line) of the clusters in the current
+        # snapshot: the next scan or retry starts from them, so a cluster
+        # keeps its label whatever order its lines are scanned in
+        self._known_clusters = []
+        # Background rescans of timed-out testcases
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self._retry_timer = None
+        # Testcases are discovered under these roots when the testcases file
+        # is missing, or always with discover_always
+        self.discovery_roots = list(discovery_roots)
+        self.discover_always = discover_always
+        self._snapshot = None
+        self._version = 0
+        self._refresh_lock = threading.Lock()
+        self._listeners = []
+        self._scan_listeners = []
+        self._sink_factories = []
+        self._refresher = None
+
+    def add_listener(self, func):
+        """Call func(snapshot) whenever a new snapshot is published"""
+        self._listeners.append(func)
+
+    def add_scan_listener(self, func):
+        """Call func(snapshot) for every snapshot this process scanned"""
+        self._scan_listeners.append(func)
+
+    def add_row_sink(self, factory):
+        """Feed every refresh's rows, as they are scanned, to a sink from factory().
+
+        Sinks implement write_row(row), commit() once the scan completed and
+        abort() when it failed or was abandoned."""
+        self._sink_factories.append(factory)
+
+    def current(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._refresh_lock:
+                snapshot = self._snapshot
+                if snapshot is None:
+                    snapshot = _last_snapshot(self._iter_build(self.testcase_file))
+        return snapshot
+
+    def refresh(self, testcase_file=None):
+        return _last_snapshot(self.iter_refresh(testcase_file))
+
+    def iter_refresh(self, testcase_file=None, progress_interval=PROGRESS_INTERVAL):
+        """Rebuild the snapshot, yielding ('progress', (scanned, total)) and
+        ('row', row) events while scanning and ('done', snapshot) at the end"""
+        with self._refresh_lock:
+            yield from self._iter_build(testcase_file or self.testcase_file, progress_interval)
+
+    def retry_timed_out(self):
+        """Rescan only the testcases of the current snapshot that timed out
+        and publish it with the rows recovered; returns the new snapshot, or
+        None when there was nothing to retry"""
+        with self._refresh_lock:
+            return self._retry()
+
+    def _retry(self):
+        base = self._snapshot
+        if base is None or not _retryable(base, self.max_retries):
+            return None
+        return _last_snapshot(self._iter_retry(base, PROGRESS_INTERVAL))
+
+    def _schedule_retry(self, snapshot):
+        if self.retry_delay <= 0 or not _retryable(snapshot, self.max_retries):
+            return
+        if self._retry_timer is not None:
+            self._retry_timer.cancel()
+
+        def retry():
+            # Skip when a newer scan replaced the snapshot in the meantime
+            if self._snapshot is not None and self._snapshot.version == snapshot.version:
+                try:
+                    self.retry_timed_out()
+                except Exception as e:
+                    print(f"❌ ERROR: retrying timed-out testcases failed: {e}")
+
+        self._retry_timer = threading.Timer(self.retry_delay, retry)
+        self._retry_timer.daemon = True
+        self._retry_timer.start()
+
+    def uses_discovery(self, testcase_file):
+        return bool(self.discovery_roots) and (self.discover_always or not os.path.exists(testcase_file))
+
+    def source_for(self, testcase_file):
+        """Source recorded in snapshots built for testcase_file"""
+        if self.uses_discovery(testcase_file):
+            return DiscoveryWalk(self.discovery_roots).source
+        return testcase_file
+
+    def _iter_build(self, testcase_file, progress_interval=PROGRESS_INTERVAL):
+        if self.uses_discovery(testcase_file):
+            # Scanning starts with the first discovered testcase; the total
+            # is unknown (None) until the walk has finished
+            testcases = DiscoveryWalk(self.discovery_roots)
+            source = testcases.source
+        else:
+            testcases = read_testcases(testcase_file)
+            source = testcase_file
+        total = _known_total(testcases)
+        yield 'progress', (0, total)
+        clusterer = ErrorClusterer(known=self._known_clusters)
+        sinks = [factory() for factory in self._sink_factories]
+        rows = RowTable()
+        timed_out = []
+        scanned = 0
+        last_progress = time.monotonic()
+        try:
+            for result in self._scan(testcases, clusterer):
+                if isinstance(result, TimedOut):
+                    entry = _timed_out_entry(result, 1, len(rows))
+                    timed_out.append(entry)
+                    if result.remaining:
+                        total = _known_total(testcases)
+                        if entry['count'] is None and total is not None:
+                            entry['count'] = total - scanned
+                        continue
+                elif result:
+                    row = tuple(result)
+                    rows.append(row)
+                    for sink in sinks:
+                        sink.write_row(row)
+                    yield 'row', row
+                scanned += 1
+                now = time.monotonic()
+                if now - last_progress >= progress_interval:
+                    last_progress = now
+                    total = _known_total(testcases)
+                    yield 'progress', (scanned, total)
+        except BaseException:
+            for sink in sinks:
+                sink.abort()
+            raise
+        for sink in sinks:
+            sink.commit()
+        snapshot = make_snapshot(rows, self._version + 1, source, scanned, timed_out)
+        self._finish_build(snapshot, clusterer)
+        yield 'progress', (scanned, scanned)
+        yield 'done', snapshot
+
+    def _iter_retry(self, base, progress_interval):
+        """Rescan the timed-out testcases of `base` and rebuild it with the
+        recovered rows where a full scan would have put them. Untagged rows
+        keep the labels of the clusters of `base` they join."""
+        entries = sorted(base.timed_out, key=lambda entry: entry.get('row_index', len(base.rows)))
+        retried = [entry for entry in entries if _retry_candidate(entry, self.max_retries)]
+        clusterer = ErrorClusterer(known=self._known_clusters)
+        yield 'progress', (0, len(retried))
+        sinks = [factory() for factory in self._sink_factories]
+        rows = RowTable()
+        timed_out = []
+        scanned = 0
+        last_progress = time.monotonic()
+        base_rows = iter(base.rows)
+
+        def add_row(row):
+            rows.append(row)
+            for sink in sinks:
+                sink.write_row(row)
+
+        def add_base_rows(row_index):
+            # The rows of base before row_index, less those already added
+            for _ in range(row_index - (len(rows) - recovered)):
+                add_row(next(base_rows))
+
+        recovered = 0
+        try:
+            results = self._scan([entry['testcase'] for entry in retried], clusterer)
+            unread = False
+            for entry in entries:
+                add_base_rows(entry.get('row_index', len(base.rows)))
+                if not _retry_candidate(entry, self.max_retries):
+                    # The testcases a scan never read are left to the next full scan
+                    timed_out.append(dict(entry, row_index=len(rows)))
+                    continue
+                result = None if unread else next(results, None)
+                if isinstance(result, TimedOut) and result.remaining:
+                    unread = True
+                if unread:
+                    result = TimedOut(entry['testcase'], 'not_started')
+                if isinstance(result, TimedOut):
+                    timed_out.append(_timed_out_entry(result, entry['attempts'] + 1, len(rows)))
+                elif result:
+                    row = tuple(result)
+                    add_row(row)
+                    recovered += 1
+                    yield 'row', row
+                scanned += 1
+                now = time.monotonic()
+                if now - last_progress >= progress_interval:
+                    last_progress = now
+                    yield 'progress', (scanned, len(retried))
+            for row in base_rows:
+                add_row(row)
+        except BaseException:
+            for sink in sinks:
+                sink.abort()
+            raise
+        for sink in sinks:
+            sink.commit()
+        snapshot = make_snapshot(rows, self._version + 1, base.source, base.total_cases, timed_out,
+                                 retry_of=base.version)
+        self._finish_build(snapshot, clusterer)
+        yield 'progress', (scanned, scanned)
+        yield 'done', snapshot
+
+    def _scan(self, testcases, clusterer):
+        results = self.scan(testcases)
+        return label_untagged(results, clusterer) if self.cluster_untagged else drop_untagged(results)
+
+    def _finish_build(self, snapshot, clusterer):
+        # Clusters without a row any more are dropped; lines like theirs
+        # start a new cluster
+        labels = {tag for per_cmd in snapshot.clusters.values() for tag in per_cmd if is_cluster_tag(tag)}
+        self._known_clusters = clusterer.clusters(labels)
+        self.publish(snapshot)
+        self._schedule_retry(snapshot)
+
+    def publish(self, snapshot):
+        self._set_current(snapshot)
+        _notify(self._scan_listeners, snapshot)
+
+    def _set_current(self, snapshot):
+        self._version = max(self._version, snapshot.version)
+        self._snapshot = snapshot
+        _notify(self._listeners, snapshot)
+
+    def _should_refresh(self):
+        return True
+
+    def start_background_refresh(self, interval):
+        """Rebuild the snapshot every `interval` seconds in a daemon thread"""
+        if self._refresher is not None or interval <= 0:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self._should_refresh():
+                        self.refresh()
+                except Exception as e:
+                    print(f"❌ ERROR: background refresh failed: {e}")
+
+        self._refresher = threading.Thread(target=loop, name='snapshot-refresher', daemon=True)
+        self._refresher.start()
+
+class SharedSnapshotStore(SnapshotStore):
+    """SnapshotStore shared by several server processes through one
+    compact results file.
+
+    The process that scans writes `results_file`, then a manifest with the
+    snapshot's version, source and the identity of that file. Every process
+    serves a MappedRowTable over the newest file, so the rows are held once
+    in the page cache and no process rescans what another one published.
+    Scans are serialized across processes by a lock file, and a refresh that
+    waited for another process's scan of the same source adopts its result."""
+
+    def __init__(self, results_file, testcase_file=DEFAULT_TESTCASE_FILE, scan=iter_raw_scan, **kwargs):
+        super().__init__(testcase_file, scan, **kwargs)
+        self.results_file = results_file
+        self.manifest_file = f"{results_file}.manifest.json"
+        self.lock_file = f"{results_file}.lock"
+        self._manifest_key = None
+        self._sync_lock = threading.Lock()
+        self._leader_fd = None
+        self.add_row_sink(lambda: CompactResultsWriter(results_file))
+
+    def _manifest_stamp(self):
+        try:
+            return file_identity(os.stat(self.manifest_file))
+        except FileNotFoundError:
+            return None
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_file) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _adopt(self, manifest):
+        """Serve the results file a manifest describes; None if it was
+        already replaced by a newer one"""
+        try:
+            results = CompactResults(self.results_file)
+        except (OSError, ValueError):
+            return None
+        if results.identity != manifest['results']:
+            return None
+        snapshot = make_snapshot(MappedRowTable(results), manifest['version'],
+                                 manifest['source'], manifest['total_cases'], manifest.get('timed_out', ()))
+        snapshot = snapshot._replace(built_at=manifest['built_at'])
+        # Scans and retries in this process continue the publisher's clusters
+        self._known_clusters = [tuple(cluster) for cluster in manifest.get('clusters', ())]
+        self._set_current(snapshot)
+        return snapshot
+
+    def sync(self):
+        """Switch to the snapshot another process published, if any; this
+        is one stat() of the manifest when nothing changed"""
+        stamp = self._manifest_stamp()
+        if stamp is None or stamp == self._manifest_key:
+            return
+        with self._sync_lock:
+            if stamp == self._manifest_key:
+                return
+            manifest = self._read_manifest()
+            if manifest is None:
+                return
+            current = self._snapshot
+            if current is None or manifest['version'] > current.version:
+                if self._adopt(manifest) is None:
+                    return  # results file mid-replacement; retry on the next call
+            self._manifest_key = stamp
+
+    def current(self):
+        self.sync()
+        if self._snapshot is None:
+            self.refresh()
+        return self._snapshot
+
+    def iter_refresh(self, testcase_file=None, progress_interval=PROGRESS_INTERVAL):
+        testcase_file = testcase_file or self.testcase_file
+        seen = self._manifest_stamp()
+        with self._refresh_lock, open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                manifest = self._read_manifest()
+                if manifest is not None:
+                    self._version = max(self._version, manifest['version'])
+                    # Another process scanned this source while we waited
+                    if self._manifest_stamp() != seen and manifest['source'] == self.source_for(testcase_file):
+                        self.sync()
+                        snapshot = self._snapshot
+                        if snapshot is not None and snapshot.version == manifest['version']:
+                            yield 'progress', (snapshot.total_cases, snapshot.total_cases)
+                            yield 'done', snapshot
+                            return
+                    # Continue from the clusters of the last published snapshot
+                    self.sync()
+                yield from self._iter_build(testcase_file, progress_interval)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def retry_timed_out(self):
+        with self._refresh_lock, open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Retry on top of whatever another process published last
+                self.sync()
+                return self._retry()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def publish(self, snapshot):
+        """Announce a snapshot this process scanned and serve it from the file"""
+        manifest = {
+            'version': snapshot.version,
+            'built_at': snapshot.built_at,
+            'source': snapshot.source,
+            'total_cases': snapshot.total_cases,
+            'timed_out': list(snapshot.timed_out),
+            'clusters': self._known_clusters,
+            'results': file_identity(os.stat(self.results_file))
+        }
+        tmp_path = f"{self.manifest_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_file)
+        with self._sync_lock:
+            if self._adopt(manifest) is None:
+                self._set_current(snapshot)
+            self._manifest_key = self._manifest_stamp()
+        _notify(self._scan_listeners, snapshot)
+
+    def _should_refresh(self):
+        """Only one process runs the periodic refresh: whichever holds the
+        refresher lock, which is released when that process exits"""
+        if self._leader_fd is None:
+            fd = os.open(f"{self.results_file}.refresher.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            self._leader_fd = fd
+        return True
+
+def _timed_out_entry(result, attempts, row_index):
+    entry = result.as_dict()
+    entry['attempts'] = attempts
+    entry['row_index'] = row_index
+    return entry
+
+def _retry_candidate(entry, max_retries):
+    return entry['reason'] != 'remaining' and entry['attempts'] <= max_retries
+
+def _retryable(snapshot, max_retries):
+    return any(_retry_candidate(entry, max_retries) for entry in snapshot.timed_out)
+
+def _known_total(testcases):
+    if isinstance(testcases, DiscoveryWalk):
+        return testcases.found if testcases.done else None
+    return len(testcases)
+
+def _notify(listeners, snapshot):
+    for listener in listeners:
+        try:
+            listener(snapshot)
+        except Exception as e:
+            print(f"❌ ERROR: snapshot listener failed: {e}")
+
+def _last_snapshot(events):
+    snapshot = None
+    for kind, payload in events:
+        if kind == 'done':
+            snapshot = payload
+    return snapshot
@@ -1,5 +1,15 @@
 // Global variables
 let allTestcases = [];
+let summaryData = [];
+let summaryTable = null;
+let tagTable = null;
+let expandedIdx = -1;
+let detailsRequest = 0;
+
+// Rows rendered above and below the visible part of a virtual table
+const OVERSCAN = 10;
+// Testcase paths fetched per request in the details view
+const DETAILS_PAGE_SIZE = 200;
 
 // DOM elements
 const clusteredTableContainer = document.getElementById('clusteredTableContainer');
@@ -10,8 +20,203 @@ const noDataMessage = document.getElementById('noDataMessage');
 // Initialize the application
 document.addEventListener('DOMContentLoaded', function() {
     loadClustered();
+    document.getElementById('liveScanBtn').addEventListener('click', streamTestcases);
+    // One delegated listener per container instead of one per row
+    clusteredTableContainer.addEventListener('click', onSummaryClick);
+    detailsView.addEventListener('click', e => {
+        if (e.target.closest('.close-details')) hideDetailsView();
+    });
 });
 
+// Escape text before inserting it into HTML
+function escapeHtml(text) {
+    return String(text).replace(/[&<>"']/g, c => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    })[c]);
+}
+
+// Renders only the rows of a long table that are scrolled into view, with
+// spacer rows standing in for the rest. renderRow(i) returns the HTML of
+// row i as one or more <tr data-vi="i"> elements; rows taller than the
+// others (an expanded summary row) are measured and accounted for.
+// `scroller` is the scrolling element, or window when the page scrolls.
+class VirtualTable {
+    constructor(tbody, columns, renderRow, scroller = window, afterRender = null) {
+        this.tbody = tbody;
+        this.columns = columns;
+        this.renderRow = renderRow;
+        this.scroller = scroller;
+        this.afterRender = afterRender;
+        this.count = 0;
+        this.rowHeight = 0;
+        this.extra = new Map();   // row index -> height beyond rowHeight
+        this.first = -1;
+        this.last = -1;
+        this.pending = false;
+        this.onScroll = () => this.schedule();
+        scroller.addEventListener('scroll', this.onScroll, { passive: true });
+        window.addEventListener('resize', this.onScroll);
+    }
+
+    destroy() {
+        this.scroller.removeEventListener('scroll', this.onScroll);
+        window.removeEventListener('resize', this.onScroll);
+    }
+
+    setCount(count) {
+        this.count = count;
+        this.refresh();
+    }
+
+    // Re-render the visible rows even if the window did not move
+    refresh() {
+        this.first = -1;
+        this.schedule();
+    }
+
+    schedule() {
+        if (this.pending) return;
+        this.pending = true;
+        requestAnimationFrame(() => {
+            this.pending = false;
+            this.render();
+        });
+    }
+
+    offset(i) {
+        let top = i * (this.rowHeight || 36);
+        this.extra.forEach((height, j) => { if (j < i) top += height; });
+        return top;
+    }
+
+    // Last row starting at or above y
+    indexAt(y) {
+        let lo = 0, hi = this.count;
+        while (hi - lo > 1) {
+            const mid = (lo + hi) >> 1;
+            if (this.offset(mid) <= y) lo = mid; else hi = mid;
+        }
+        return lo;
+    }
+
+    spacer(height) {
+        return `<tr class="vt-spacer" style="height:${height}px"><td colspan="${this.columns}"></td></tr>`;
+    }
+
+    render() {
+        if (!this.tbody.isConnected) {
+            this.destroy();
+            return;
+        }
+        const view = this.scroller === window
+            ? { top: 0, bottom: window.innerHeight }
+            : this.scroller.getBoundingClientRect();
+        const top = this.tbody.getBoundingClientRect().top;
+        // Start on an even row so zebra striping does not flicker while scrolling
+        const first = Math.max(0, this.indexAt(view.top - top) - OVERSCAN) & ~1;
+        const last = Math.min(this.count, this.indexAt(view.bottom - top) + 1 + OVERSCAN);
+        if (first === this.first && last === this.last) return;
+        this.first = first;
+        this.last = last;
+        const rows = [];
+        for (let i = first; i < last; i++) rows.push(this.renderRow(i));
+        this.tbody.innerHTML = this.spacer(this.offset(first)) + rows.join('') +
+            this.spacer(this.offset(this.count) - this.offset(last));
+        this.measure();
+        if (this.afterRender) this.afterRender(first, last);
+    }
+
+    measure() {
+        const heights = new Map();
+        this.tbody.querySelectorAll('tr[data-vi]').forEach(tr => {
+            const i = Number(tr.dataset.vi);
+            heights.set(i, (heights.get(i) || 0) + tr.offsetHeight);
+        });
+        if (!heights.size) return;
+        if (!this.rowHeight) {
+            // First render used an estimate; render again with the real height
+            this.rowHeight = Math.min(...heights.values());
+            this.refresh();
+            return;
+        }
+        let changed = false;
+        heights.forEach((height, i) => {
+            const extra = height - this.rowHeight;
+            if (extra > 1 && this.extra.get(i) !== extra) {
+                this.extra.set(i, extra);
+                changed = true;
+            } else if (extra <= 1 && this.extra.has(i)) {
+                this.extra.delete(i);
+                changed = true;
+            }
+        });
+        if (changed) {
+            const spacers = this.tbody.querySelectorAll('tr.vt-spacer');
+            spacers[0].style.height = `${this.offset(this.first)}px`;
+            spacers[1].style.height = `${this.offset(this.count) - this.offset(this.last)}px`;
+        }
+    }
+}
+
+// Run a fresh scan and render each row as soon as the server streams it
+async function streamTestcases() {
+    const btn = document.getElementById('liveScanBtn');
+    const section = document.getElementById('liveScanSection');
+    const progress = document.getElementById('liveScanProgress');
+    const container = document.getElementById('liveScanContainer');
+    btn.disabled = true;
+    section.style.display = 'block';
+    progress.textContent = 'Starting scan...';
+    container.innerHTML = `<table class="summary-table virtual-table">
+        <thead><tr><th>S.No</th><th>Testcase Path</th><th>Failing Command</th><th>Error Message</th><th>Tag</th></tr></thead>
+        <tbody></tbody></table>`;
+    // Rows are kept as data; only the ones scrolled into view are in the DOM
+    const rows = [];
+    const table = new VirtualTable(container.querySelector('tbody'), 5, i => {
+        const r = rows[i];
+        return `<tr data-vi="${i}"><td>${i + 1}</td><td title="${escapeHtml(r.testcase_path)}">${escapeHtml(r.testcase_path)}</td>` +
+            `<td>${escapeHtml(r.failing_command)}</td><td>${escapeHtml(r.error_message)}</td><td>${escapeHtml(r.tag)}</td></tr>`;
+    }, container);
+
+    function handleRecord(record) {
+        if (record.type === 'row') {
+            rows.push(record.row);
+        } else if (record.type === 'progress') {
+            progress.textContent = `Scanned ${record.scanned} / ${record.total} testcases, ${rows.length} with issue`;
+        } else if (record.type === 'done') {
+            progress.textContent = `Scan complete: ${record.filtered_cases} of ${record.total_cases} testcases with issue (snapshot ${record.version})`;
+            document.getElementById('generatedOn').textContent = record.generated_on;
+        } else if (record.type === 'error') {
+            progress.textContent = `Live scan ${record.state}: ${record.error}`;
+        }
+    }
+
+    try {
+        const res = await fetch('/api/testcases?stream=ndjson');
+        if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => handleRecord(JSON.parse(line)));
+            // At most one re-render per animation frame, however many chunks arrive
+            if (rows.length !== table.count) table.setCount(rows.length);
+        }
+        loadClustered();
+        if (typeof loadErrorTable === 'function') loadErrorTable();
+        if (typeof loadCombinedTable === 'function') loadCombinedTable();
+    } catch (e) {
+        progress.textContent = `Live scan failed: ${e.message}`;
+    } finally {
+        btn.disabled = false;
+    }
+}
+
 // Load data from API
 async function loadClustered() {
     showLoading(true);
@@ -39,9 +244,14 @@ function updateStatsFromSummary(summary) {
     document.getElementById('generatedOn').textContent = new Date().toLocaleString();
 }
 
-// Render the main summary table
+// Render the main summary table; only the rows in view are in the DOM
 function renderSummaryTable(summary) {
-    let html = `<table class="summary-table">
+    if (summaryTable) summaryTable.destroy();
+    if (tagTable) tagTable.destroy();
+    summaryData = summary;
+    expandedIdx = -1;
+    tagTable = null;
+    clusteredTableContainer.innerHTML = `<table class="summary-table virtual-table">
         <thead>
             <tr>
                 <th>S.No</th>
@@ -49,91 +259,154 @@ function renderSummaryTable(summary) {
                 <th>Unique Failures</th>
             </tr>
         </thead>
-        <tbody>`;
-    summary.forEach((row, idx) => {
-        html += `<tr data-cmd="${encodeURIComponent(row.failing_command)}" class="summary-row">
-            <td>${row.sno}</td>
-            <td>
-                <button class="expand-btn" aria-label="Expand" data-idx="${idx}">+</button>
-                <span>${row.failing_command}</span>
-            </td>
-            <td>${row.unique_failures} (${row.total_failures})</td>
-        </tr>
-        <tr class="expand-row" style="display:none;"><td colspan="3"><div class="expand-content"></div></td></tr>`;
-    });
-    html += `</tbody></table>`;
-    clusteredTableContainer.innerHTML = html;
-
-    // Add expand/collapse listeners
-    document.querySelectorAll('.expand-btn').forEach(btn => {
-        btn.addEventListener('click', function(e) {
-            const idx = parseInt(this.getAttribute('data-idx'));
-            toggleExpand(idx, summary[idx]);
-        });
-    });
+        <tbody></tbody></table>`;
+    summaryTable = new VirtualTable(clusteredTableContainer.querySelector('tbody'), 3,
+                                    renderSummaryRow, window, mountTagTable);
+    summaryTable.setCount(summary.length);
 }
 
-// Toggle expand/collapse for a summary row
-function toggleExpand(idx, row) {
-    const allExpandRows = document.querySelectorAll('.expand-row');
-    const expandRow = allExpandRows[idx];
-    const expandContent = expandRow.querySelector('.expand-content');
-    if (expandRow.style.display === 'none') {
-        // Collapse all others
-        allExpandRows.forEach(r => r.style.display = 'none');
-        document.querySelectorAll('.expand-btn').forEach(b => b.textContent = '+');
-        // Expand this
-        expandRow.style.display = '';
-        document.querySelectorAll('.expand-btn')[idx].textContent = '-';
-        renderTagTable(expandContent, row);
-    } else {
-        expandRow.style.display = 'none';
-        document.querySelectorAll('.expand-btn')[idx].textContent = '+';
+function renderSummaryRow(idx) {
+    const row = summaryData[idx];
+    const expanded = idx === expandedIdx;
+    let html = `<tr data-vi="${idx}" class="summary-row">
+        <td>${row.sno}</td>
+        <td>
+            <button class="expand-btn" aria-label="${expanded ? 'Collapse' : 'Expand'}" data-idx="${idx}">${expanded ? '-' : '+'}</button>
+            <span>${escapeHtml(row.failing_command)}</span>
+        </td>
+        <td>${row.unique_failures} (${row.total_failures})</td>
+    </tr>`;
+    if (expanded) {
+        html += `<tr data-vi="${idx}" class="expand-row"><td colspan="3"><div class="expand-content">
+            <table class="tag-table virtual-table">
+                <thead><tr><th>Tag</th><th>Error Message</th><th>Count</th></tr></thead>
+                <tbody></tbody>
+            </table></div></td></tr>`;
     }
+    return html;
 }
 
-// Render the tag sub-table for a command
-function renderTagTable(container, row) {
-    let html = `<table class="tag-table">
-        <thead><tr><th>Tag</th><th>Error Message</th><th>Count</th></tr></thead><tbody>`;
-    row.tags.forEach(tagRow => {
-        html += `<tr>
-            <td>${tagRow.tag}</td>
-            <td>${tagRow.error_message}</td>
-            <td><a class="count-link" href="/testcases?command=${encodeURIComponent(row.failing_command)}&tag=${encodeURIComponent(tagRow.tag)}" target="_blank">${tagRow.count}</a></td>
-        </tr>`;
-    });
-    html += `</tbody></table>`;
-    container.innerHTML = html;
+// Clicks on expand buttons and tag links of the summary table
+function onSummaryClick(e) {
+    const expandBtn = e.target.closest('.expand-btn');
+    if (expandBtn) {
+        toggleExpand(Number(expandBtn.dataset.idx));
+        return;
+    }
+    const tagLink = e.target.closest('.tag-link');
+    if (tagLink && expandedIdx >= 0) {
+        const row = summaryData[expandedIdx];
+        showDetailsView(row.failing_command, row.tags[Number(tagLink.dataset.tag)].tag);
+    }
+}
+
+// Toggle expand/collapse for a summary row; one row is expanded at a time
+function toggleExpand(idx) {
+    if (tagTable) {
+        tagTable.destroy();
+        tagTable = null;
+    }
+    summaryTable.extra.clear();
+    expandedIdx = expandedIdx === idx ? -1 : idx;
+    summaryTable.refresh();
+}
+
+// The summary window re-renders the expanded row whenever it moves, so its
+// tag table is mounted again after each render that includes it
+function mountTagTable(first, last) {
+    if (tagTable) {
+        tagTable.destroy();
+        tagTable = null;
+    }
+    if (expandedIdx < first || expandedIdx >= last) return;
+    const content = clusteredTableContainer.querySelector('.expand-content');
+    const row = summaryData[expandedIdx];
+    tagTable = new VirtualTable(content.querySelector('tbody'), 3, i => renderTagRow(row, i), content);
+    tagTable.setCount(row.tags.length);
+}
+
+// One row of the tag sub-table for a command
+function renderTagRow(row, i) {
+    const tagRow = row.tags[i];
+    const auto = tagRow.auto_cluster ? ' title="Similar error lines without an issue tag"' : '';
+    return `<tr data-vi="${i}">
+        <td><button class="tag-link" data-tag="${i}"${auto}>${escapeHtml(tagRow.tag)}</button></td>
+        <td title="${escapeHtml(tagRow.error_message)}">${escapeHtml(tagRow.error_message)}</td>
+        <td><a class="count-link" href="/testcases?command=${encodeURIComponent(row.failing_command)}&tag=${encodeURIComponent(tagRow.tag)}" target="_blank">${tagRow.count}</a></td>
+    </tr>`;
 }
 
-// Show the details view for a command+tag
+// Show the testcases of a command+tag, fetched a page at a time as the
+// list is scrolled
 async function showDetailsView(command, tag) {
+    const request = ++detailsRequest;
+    const paths = [];
+    let cursor = null;
+    let total = 0;
+    let loading = false;
     detailsView.style.display = 'block';
-    detailsView.innerHTML = '<div>Loading...</div>';
-    try {
-        const res = await fetch(`/api/clustered/details?command=${command}&tag=${tag}`);
-        const data = await res.json();
-        if (res.ok) {
-            let html = `<button class="close-details" onclick="hideDetailsView()">&times;</button>`;
-            html += `<h2>${data.command} / ${data.tag}</h2>`;
-            html += `<div style="margin-bottom:10px;color:#888;">${data.error_message}</div>`;
-            html += `<ul>`;
-            data.testcases.forEach(tc => {
-                html += `<li>${tc}</li>`;
-            });
-            html += `</ul>`;
-            detailsView.innerHTML = html;
-            window.scrollTo({top: detailsView.offsetTop - 30, behavior: 'smooth'});
-        } else {
-            detailsView.innerHTML = '<div style="color:red;">Not found</div>';
+    detailsView.innerHTML = `<button class="close-details">&times;</button>
+        <h2>${escapeHtml(command)} / ${escapeHtml(tag)}</h2>
+        <div class="details-message"></div>
+        <div class="details-count">Loading...</div>
+        <div class="details-scroller"><table class="testcase-table virtual-table">
+            <thead><tr><th>S.No</th><th>Testcase Path</th></tr></thead><tbody></tbody></table></div>`;
+    const countLabel = detailsView.querySelector('.details-count');
+    const scroller = detailsView.querySelector('.details-scroller');
+    const table = new VirtualTable(scroller.querySelector('tbody'), 2, i =>
+        `<tr data-vi="${i}"><td>${i + 1}</td><td title="${escapeHtml(paths[i])}">${escapeHtml(paths[i])}</td></tr>`,
+        scroller, (first, last) => {
+            // Fetch the next page before the user reaches the end of the loaded rows
+            if (cursor && last + DETAILS_PAGE_SIZE / 2 >= paths.length) loadPage();
+        });
+
+    async function loadPage() {
+        if (loading) return;
+        loading = true;
+        let restart = false;
+        const params = new URLSearchParams({ command, tag, limit: DETAILS_PAGE_SIZE });
+        if (cursor) params.set('cursor', cursor);
+        try {
+            const res = await fetch(`/api/clustered/details?${params}`);
+            const data = await res.json();
+            if (request !== detailsRequest) return;
+            if (res.status === 409) {
+                // The analysis was refreshed: start over on the new snapshot
+                // (after the finally below, so the restart is not skipped)
+                paths.length = 0;
+                cursor = null;
+                table.setCount(0);
+                scroller.scrollTop = 0;
+                restart = true;
+            } else if (!res.ok) {
+                countLabel.innerHTML = '<span style="color:red;">Not found</span>';
+            } else {
+                if (!cursor) {
+                    detailsView.querySelector('.details-message').textContent = data.error_message;
+                    window.scrollTo({ top: detailsView.offsetTop - 30, behavior: 'smooth' });
+                }
+                paths.push(...data.testcases);
+                cursor = data.next_cursor;
+                total = data.total_matches;
+                countLabel.textContent = `${paths.length} of ${total} testcases loaded`;
+                table.setCount(paths.length);
+            }
+        } catch (e) {
+            if (request === detailsRequest) {
+                countLabel.innerHTML = '<span style="color:red;">Error loading details</span>';
+            }
+        } finally {
+            loading = false;
         }
-    } catch (e) {
-        detailsView.innerHTML = '<div style="color:red;">Error loading details</div>';
+        if (restart) await loadPage();
     }
+
+    await loadPage();
 }
 window.hideDetailsView = function() {
+    detailsRequest++;
     detailsView.style.display = 'none';
+    detailsView.innerHTML = '';
 }
 
 // Show loading spinner
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+from categories import CategoryIndex, CORE, NC_DIFF
+from snapshot import make_snapshot
+
+def test_category_tables(tmp_path):
+    (tmp_path / 'list_core').write_text('/r/tc1\n/r/tc4\n')
+    (tmp_path / 'list_nc_diff').write_text('/r/tc1\n\n/r/tc2\n')
+    rows = [
+        ('/r/tc1', 'compile', 'err a', 'TTM-001'),
+        ('/r/tc2', 'compile', 'err a', 'TTM-001'),
+        ('/r/tc3', 'compile', 'err b', 'TTM-002'),
+        ('/r/tc4', 'simulate', 'err c', 'SIM-001'),
+    ]
+    index = CategoryIndex(str(tmp_path))
+    snapshot = make_snapshot(rows, 1)
+    tables = index.tables(snapshot)
+    assert index.mask('/r/tc1') == CORE | NC_DIFF
+    assert snapshot.rows.paths_for(tables.by_command['compile']['nc_diff']) == ['/r/tc1', '/r/tc2']
+    assert snapshot.rows.paths_for(tables.by_command['compile']['others']) == ['/r/tc3']
+    compile_row = tables.error_table[0]
+    assert compile_row['core_error'] == 1
+    assert compile_row['nc_diff_error_testcases'] == ['/r/tc1', '/r/tc2']
+    assert compile_row['simulate_diff_error'] == 0
+    combined = tables.combined_table[0]
+    assert combined['total_failures'] == 3
+    assert combined['top_tags'] == [{'tag': 'TTM-001', 'count': 2}, {'tag': 'TTM-002', 'count': 1}]
+
+    # Unchanged files and snapshot: the same tables object is served
+    assert index.tables(make_snapshot(rows, 1)) is tables
+    assert not index.refresh()
+
+    (tmp_path / 'list_simulate_diff').write_text('/r/tc3\n')
+    tables = index.tables(make_snapshot(rows, 1))
+    assert list(tables.by_command['compile']['simulate_diff']) == [2]
+    assert len(tables.by_command['compile']['others']) == 0
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import json
+
+import chatbot_logic
+from results_io import write_compact_results
+from chatbot_logic import analyze_data_for_chatbot, process_chatbot_query, set_analyzed_data
+
+DATA = [
+    {'testcase_path': '/reg/customer/flow/tc1', 'failing_command': 'compile',
+     'error_message': '> ERROR: License checkout failed (LIC-001)', 'tag': 'LIC-001'},
+    {'testcase_path': '/reg/sanity/tc2', 'failing_command': 'compile',
+     'error_message': '> ERROR: file x.v cannot open (FIL-002)', 'tag': 'FIL-002'},
+    {'testcase_path': '/reg/misc/tc3', 'failing_command': 'simulate',
+     'error_message': '> ERROR: bad parameter in test (PAR-003)', 'tag': 'PAR-003'},
+]
+
+def test_analysis_is_memoized_per_version():
+    set_analyzed_data(DATA, version=101)
+    analysis = analyze_data_for_chatbot()
+    assert analysis['total_failures'] == 3
+    assert analysis['most_common_command'] == ('compile', 2)
+    assert analysis['error_patterns'] == {
+        'license_issues': 1, 'file_not_found': 1, 'parameter_issues': 1, 'test_issues': 1}
+    assert analysis['path_analysis'] == {
+        'customer_tests': 1, 'flow_tests': 1, 'sanity_tests': 1, 'misc_tests': 1}
+    assert analysis['command_tag_correlation']['compile'] == {'LIC-001': 1, 'FIL-002': 1}
+    assert analysis['failure_distribution']['commands_with_single_failure'] == 1
+    assert analyze_data_for_chatbot() is analysis
+
+    set_analyzed_data(DATA[:1], version=102)
+    assert analyze_data_for_chatbot()['total_failures'] == 1
+    assert process_chatbot_query('How many testcase failures are there?') == \
+        "📊 Total testcase failures: 1"
+
+def test_results_file_is_followed_until_data_is_published(tmp_path, monkeypatch):
+    results = tmp_path / 'analyzed.json'
+    results.write_text('[]')
+    compact = tmp_path / 'analyzed.cwr'
+    monkeypatch.setattr(chatbot_logic, 'ANALYZED_RESULTS_FILE', str(results))
+    monkeypatch.setattr(chatbot_logic, 'COMPACT_RESULTS_FILE', str(compact))
+    monkeypatch.setattr(chatbot_logic, '_data_version', None)
+    assert analyze_data_for_chatbot() == {}
+    results.write_text(json.dumps(DATA))
+    assert analyze_data_for_chatbot()['unique_tags'] == 3
+    # The compact file wins once it is the newest one
+    write_compact_results([tuple(item.values()) for item in DATA[:2]], str(compact))
+    assert analyze_data_for_chatbot()['total_failures'] == 2
+
+def test_find_query_reports_every_match():
+    set_analyzed_data(DATA, version=103)
+    reply = process_chatbot_query('Find failures for compile and LIC-001 or par-003')
+    assert reply.startswith('🔍 Found 3 matching commands/tags:')
+    assert "• Command 'compile': 2 failures" in reply
+    assert "• Tag 'LIC-001': 1 occurrences\n  - /reg/customer/flow/tc1" in reply
+    assert "• Tag 'PAR-003'" in reply
+    assert process_chatbot_query('find simulate').startswith("🔍 Command 'simulate' has 1 failures")
+    assert 'No failing command' in process_chatbot_query('find nothing here')
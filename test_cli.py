@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import subprocess
+import sys
+
+import cli
+from results_io import CompactResults
+
+def make_result_dir(tmp_path):
+    testcases = []
+    for i, (cmd, tag) in enumerate([('compile', 'TTM-001'), ('compile', 'TTM-001'), ('simulate', 'SIM-002')]):
+        tc = tmp_path / f'tc{i}'
+        tc.mkdir()
+        (tc / 'status.log').write_text(f'EXIT STATUS for {cmd} is 5\n')
+        (tc / f'{cmd}.diff.bak').write_text(f'> ERROR: failed ({tag})\n')
+        testcases.append(str(tc))
+    result_dir = tmp_path / 'result_reg'
+    result_dir.mkdir()
+    (result_dir / 'testcases.txt').write_text('\n'.join(testcases) + '\n')
+    (result_dir / 'list_core').write_text(testcases[0] + '\n')
+    return result_dir
+
+def test_json_csv_and_compact_outputs(tmp_path):
+    result_dir = make_result_dir(tmp_path)
+    out = tmp_path / 'report.json'
+    profile = tmp_path / 'profile.json'
+    assert cli.main([str(result_dir), '--backend', 'serial', '-o', str(out), '--profile', str(profile)]) == 0
+    report = json.loads(out.read_text())
+    assert report['filtered_cases'] == 3
+    assert report['summary'][0]['failing_command'] == 'compile'
+    assert report['error_table'][0]['core_error'] == 1
+    assert report['combined_table'][1]['top_tags'] == [{'tag': 'SIM-002', 'count': 1}]
+    assert json.loads(profile.read_text())['phases']['scan_testcase']['calls'] == 3
+
+    out = tmp_path / 'summary.csv'
+    assert cli.main([str(result_dir / 'testcases.txt'), '--format', 'csv', '-o', str(out)]) == 0
+    records = list(csv.DictReader(out.open()))
+    assert [(r['failing_command'], r['tag'], r['count']) for r in records] == \
+        [('compile', 'TTM-001', '2'), ('simulate', 'SIM-002', '1')]
+
+    out = tmp_path / 'rows.cwr'
+    assert cli.main([str(result_dir), '--format', 'compact', '-o', str(out)]) == 0
+    assert len(CompactResults(str(out))) == 3
+
+    assert cli.main([str(tmp_path / 'missing')]) == 1
+
+    out = tmp_path / 'discovered.json'
+    assert cli.main([str(result_dir), '--discover', str(tmp_path), '-o', str(out)]) == 0
+    report = json.loads(out.read_text())
+    assert (report['total_cases'], report['filtered_cases']) == (3, 3)
+    assert report['source'].startswith('discover:')
+
+def test_no_web_imports():
+    code = "import sys, cli; print(sorted(m for m in sys.modules if m.split('.')[0] in ('flask', 'chatbot_logic')))"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=cli.__file__.rsplit('/', 1)[0])
+    assert result.stdout.strip() == '[]'
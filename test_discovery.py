@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import os
+
+from discovery import DiscoveryWalk, discover_testcases
+from snapshot import SnapshotStore
+
+def make_tree(root):
+    """Testcases at different depths, marked by each kind of marker file"""
+    layout = {
+        'suite_a/tc1': 'status.log',
+        'suite_a/tc2': 'compile.diff.bak',
+        'suite_b/block/tc3': 'Makefile',
+        'suite_b/block/tc3/testresults/nested': 'status.log',   # inside a testcase: not listed
+        'suite_b/empty': None,
+    }
+    for rel, marker in layout.items():
+        path = root / rel
+        path.mkdir(parents=True, exist_ok=True)
+        if marker:
+            (path / marker).write_text('EXIT STATUS for compile is 5\n')
+    os.symlink(root / 'suite_a', root / 'suite_b' / 'link')   # symlinks are not followed
+    return [str(root / rel) for rel in ('suite_a/tc1', 'suite_a/tc2', 'suite_b/block/tc3')]
+
+def test_discovers_testcases_by_marker(tmp_path):
+    expected = make_tree(tmp_path)
+    assert discover_testcases([str(tmp_path)], workers=3) == expected
+    assert discover_testcases([str(tmp_path)], max_depth=2) == expected[:2]
+    assert discover_testcases([str(tmp_path / 'missing')]) == []
+
+def test_stream_counts_and_can_be_abandoned(tmp_path):
+    make_tree(tmp_path)
+    stream = DiscoveryWalk([str(tmp_path)], workers=2)
+    walk = iter(stream)
+    next(walk)
+    assert stream.found == 1 and not stream.done
+    walk.close()
+    stream = DiscoveryWalk([str(tmp_path)])
+    assert len(list(stream)) == 3
+    assert stream.done and stream.found == 3
+
+def test_store_falls_back_to_discovery(tmp_path):
+    expected = make_tree(tmp_path)
+    scanned = []
+
+    def scan(testcases):
+        for tc in testcases:
+            scanned.append(tc)
+            yield (tc, 'compile', 'err', 'TTM-001')
+
+    store = SnapshotStore(str(tmp_path / 'missing.txt'), scan=scan, discovery_roots=[str(tmp_path)])
+    events = list(store.iter_refresh(progress_interval=0))
+    assert events[0] == ('progress', (0, None))
+    snapshot = events[-1][1]
+    assert sorted(scanned) == expected
+    assert snapshot.total_cases == 3
+    assert snapshot.source == store.source_for(str(tmp_path / 'missing.txt'))
+    assert snapshot.source.startswith('discover:')
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import random
+
+from error_clustering import ErrorClusterer, is_cluster_tag, jaccard, normalize_error, shingles
+
+def test_normalize_masks_variable_parts():
+    assert normalize_error('> ERROR: timeout after 120.5s in /work/run_3/top.v at 0xdeadbeef') == \
+        'timeout after <num>s in <path> at <hex>'
+    assert normalize_error('  > Fatal:  id 3fa9c2e1b0 seen') == 'id <hex> seen'
+    assert normalize_error('> ERROR: no tag on line 7') == normalize_error('> ERROR: no tag on line 93')
+
+def test_similar_lines_share_a_cluster():
+    clusterer = ErrorClusterer()
+    first = clusterer.assign('> ERROR: port width mismatch on bus data_in of module alu (expected 32, got 16)')
+    assert is_cluster_tag(first)
+    assert clusterer.assign('> ERROR: port width mismatch on bus addr of module alu (expected 8, got 4)') == first
+    other = clusterer.assign('> ERROR: license checkout failed for feature VCSCompiler_Net')
+    assert other != first
+    assert len(clusterer) == 2
+    # Same input, same labels
+    again = ErrorClusterer()
+    assert again.assign('> ERROR: port width mismatch on bus data_in of module alu (expected 32, got 16)') == first
+
+def test_lsh_matches_exact_clustering():
+    rng = random.Random(3)
+    vocab = [''.join(rng.choice('abcdefghijklmnop') for _ in range(6)) for _ in range(400)]
+    templates = [[rng.choice(vocab) for _ in range(6)] for _ in range(40)]
+    lines = []
+    for _ in range(2000):
+        words = list(rng.choice(templates))
+        words[rng.randrange(len(words))] = rng.choice(vocab)
+        lines.append(f"> ERROR: {' '.join(words)} {rng.randint(0, 999)}")
+    clusterer = ErrorClusterer()
+    representatives = []
+    for line in lines:
+        before = len(clusterer)
+        clusterer.assign(line)
+        if len(clusterer) > before:
+            grams = shingles(normalize_error(line))
+            # A new cluster is only created when no earlier cluster was similar enough
+            assert all(jaccard(grams, rep) < clusterer.threshold for rep in representatives)
+            representatives.append(grams)
+    assert 40 <= len(clusterer) < len(lines) // 5
+
+def test_known_clusters_keep_their_labels():
+    lines = ['> ERROR: port width mismatch on bus data_in of module alu (expected 32, got 16)',
+             '> ERROR: port width mismatch on bus addr of module alu (expected 8, got 4)',
+             '> ERROR: port width mismatch on bus wr_en of module alu (expected 1, got 2)']
+    first = ErrorClusterer()
+    label = first.assign(lines[0])
+    assert {first.assign(line) for line in lines} == {label}
+    # A fresh clusterer names the cluster after whichever line comes first
+    assert ErrorClusterer().assign(lines[2]) != label
+    for order in (lines[::-1], lines[1:], lines[2:]):
+        again = ErrorClusterer(known=first.clusters())
+        assert {again.assign(line) for line in order} == {label}
+    assert first.clusters({'CLUSTER-none'}) == []
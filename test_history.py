@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import sqlite3
+
+from history import RunHistory
+from snapshot import make_snapshot
+
+YESTERDAY = [
+    ('/r/tc1', 'compile', 'err a', 'TTM-001'),
+    ('/r/tc2', 'simulate', 'err b', 'SIM-002'),
+    ('/r/tc3', 'compile', 'err a', 'TTM-001'),
+]
+TODAY = [
+    ('/r/tc1', 'compile', 'err a', 'TTM-001'),
+    ('/r/tc3', 'compile', 'err c', 'TTM-003'),
+    ('/r/tc4', 'compile', 'err a', 'TTM-001'),
+]
+
+def test_diff_and_trend(tmp_path):
+    history = RunHistory(str(tmp_path / 'history.db'))
+    first = history.record_snapshot(make_snapshot(YESTERDAY, 1))
+    second = history.record_snapshot(make_snapshot(TODAY, 2))
+    assert [run['run_id'] for run in history.runs()] == [second, first]
+
+    diff = history.diff(first, second)
+    assert diff['new']['testcases'] == [TODAY[1], TODAY[2]]
+    assert diff['fixed']['testcases'] == [YESTERDAY[1], YESTERDAY[2]]
+    assert diff['persisting']['testcases'] == [TODAY[0]]
+    assert history.diff(first, second, ['new'], tag='TTM-001')['new']['count'] == 1
+    assert history.diff(first, second, ['new'], limit=1)['new'] == {'count': 2, 'testcases': [TODAY[1]]}
+    assert history.diff(first, second, ['fixed'], command='missing')['fixed']['count'] == 0
+
+    run_ids, trend = history.tag_trend(runs=5)
+    assert run_ids == [first, second]
+    assert trend == {'TTM-001': [2, 2], 'SIM-002': [1, 0], 'TTM-003': [0, 1]}
+    assert history.tag_trend(runs=1, command='simulate') == ([second], {})
+    history.close()
+
+    # Runs survive reopening the database
+    assert len(RunHistory(str(tmp_path / 'history.db')).runs()) == 2
+
+def test_timed_out_testcases_are_neither_new_nor_fixed(tmp_path):
+    history = RunHistory(str(tmp_path / 'history.db'))
+    first = history.record_snapshot(make_snapshot(YESTERDAY, 1))
+    slow = {'testcase': '/r/tc2', 'reason': 'testcase_timeout', 'seconds': 5.0, 'attempts': 1}
+    today = make_snapshot(TODAY, 2, timed_out=[slow])
+    second = history.record_snapshot(today)
+    assert history.runs()[0]['timed_out'] == 1
+    assert history.diff(first, second)['fixed']['testcases'] == [YESTERDAY[2]]
+
+    # The retry that recovers it completes the same run
+    retried = make_snapshot(TODAY + [YESTERDAY[1]], 3, retry_of=today.version)
+    assert history.record_snapshot(retried) == second
+    assert [(run['run_id'], run['failures'], run['timed_out']) for run in history.runs()] == \
+        [(second, 4, 0), (first, 3, 0)]
+    assert history.diff(first, second)['fixed']['testcases'] == [YESTERDAY[2]]
+    assert history.diff(first, second)['persisting']['count'] == 2
+
+    # A run that did not read all its testcases can tell nothing fixed or new
+    unread = {'testcase': None, 'reason': 'remaining', 'seconds': 0.0, 'count': 3, 'attempts': 1}
+    third = history.record_snapshot(make_snapshot(TODAY[:1], 4, timed_out=[unread]))
+    diff = history.diff(second, third)
+    assert (diff['fixed']['count'], diff['persisting']['count']) == (0, 1)
+    assert history.diff(third, second, ['new'])['new']['count'] == 0
+
+def test_default_runs_share_a_source(tmp_path):
+    history = RunHistory(str(tmp_path / 'history.db'))
+    first = history.record_snapshot(make_snapshot(YESTERDAY, 1, source='scripts/testcases.txt'))
+    other = history.record_snapshot(make_snapshot(TODAY[:1], 2, source='testcases.txt'))
+    second = history.record_snapshot(make_snapshot(TODAY, 3, source='scripts/testcases.txt'))
+    assert history.latest_run_ids(2) == [second, first]
+    assert history.latest_run_ids(2, 'testcases.txt') == [other]
+    assert history.previous_run_id(second) == first
+    assert history.previous_run_id(other) is None
+    assert history.tag_trend(runs=5)[0] == [first, second]
+    assert history.tag_trend(runs=5, source='testcases.txt') == ([other], {'TTM-001': [1]})
+
+def test_retries_complete_runs_of_other_processes(tmp_path):
+    # Two connections to one database stand in for two server workers
+    a = RunHistory(str(tmp_path / 'history.db'))
+    b = RunHistory(str(tmp_path / 'history.db'))
+    slow = {'testcase': '/r/tc2', 'reason': 'testcase_timeout', 'seconds': 5.0, 'attempts': 1}
+    today = make_snapshot(TODAY, 1, timed_out=[slow])
+    run_id = a.record_snapshot(today)
+    retried = make_snapshot(TODAY + [YESTERDAY[1]], 2, timed_out=[dict(slow, attempts=2)], retry_of=1)
+    assert b.record_snapshot(retried) == run_id
+    # Recording the same retry again leaves one row per testcase
+    assert a.record_snapshot(retried) == run_id
+    assert [(run['run_id'], run['failures'], run['timed_out']) for run in a.runs()] == [(run_id, 4, 1)]
+    conn = sqlite3.connect(str(tmp_path / 'history.db'))
+    assert conn.execute('SELECT COUNT(*) FROM failures').fetchone()[0] == 4
+
+def test_old_databases_are_migrated(tmp_path):
+    path = str(tmp_path / 'history.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE runs (id INTEGER PRIMARY KEY, built_at TEXT NOT NULL, source TEXT,
+                           total_cases INTEGER NOT NULL, failures INTEGER NOT NULL);
+        CREATE TABLE timed_out (run_id INTEGER NOT NULL, testcase_id INTEGER, reason TEXT NOT NULL);
+        CREATE INDEX timed_out_by_run ON timed_out (run_id, testcase_id);
+        INSERT INTO runs VALUES (1, 'then', NULL, 3, 0);
+        INSERT INTO timed_out VALUES (1, 7, 'testcase_timeout'), (1, 7, 'testcase_timeout');
+    """)
+    conn.close()
+    history = RunHistory(path)
+    assert [(run['run_id'], run['timed_out']) for run in history.runs()] == [(1, 1)]
+    assert history.record_snapshot(make_snapshot(TODAY, 1)) == 2
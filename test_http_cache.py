@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import gzip
+import json
+
+from flask import Flask
+
+from http_cache import ResponseCache
+
+PAYLOAD = {'table': [{'failing_command': f'cmd{i}', 'count': i} for i in range(200)]}
+
+def make_app(cache, state):
+    app = Flask(__name__)
+
+    @app.route('/table')
+    def table():
+        def build():
+            state['builds'] += 1
+            return PAYLOAD
+        return cache.json_response('table', state['version'], 1_700_000_000, build)
+
+    return app.test_client()
+
+def test_conditional_requests_and_caching():
+    cache = ResponseCache(min_size=1024)
+    state = {'version': 1, 'builds': 0}
+    client = make_app(cache, state)
+
+    first = client.get('/table')
+    assert first.status_code == 200
+    assert first.json == PAYLOAD
+    etag = first.headers['ETag']
+    assert etag.startswith('W/"')
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert 'Accept-Encoding' in first.headers['Vary']
+
+    assert client.get('/table', headers={'If-None-Match': etag}).status_code == 304
+    # A publish in the same second carries the same date, so only a later
+    # If-Modified-Since is answered without the body
+    since = client.get('/table', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert since.status_code == 200
+    later = client.get('/table', headers={'If-Modified-Since': 'Tue, 14 Nov 2023 22:13:21 GMT'})
+    assert later.status_code == 304
+    assert client.get('/table').data == first.data
+    assert state['builds'] == 1
+
+    # A new version invalidates the ETag and rebuilds once
+    state['version'] = 2
+    changed = client.get('/table', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    client.get('/table')
+    assert state['builds'] == 2
+    assert cache.stats()['not_modified'] == 2
+
+def test_gzip_is_encoded_once():
+    cache = ResponseCache(min_size=1024)
+    state = {'version': 1, 'builds': 0}
+    client = make_app(cache, state)
+    for _ in range(2):
+        response = client.get('/table', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.data)) == PAYLOAD
+    assert len(cache._entries['table'].bodies) == 2
+
+    small = ResponseCache(min_size=1 << 20)
+    response = make_app(small, state).get('/table', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
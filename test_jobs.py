@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import threading
+
+from jobs import AnalysisJob, JobManager, SharedJobManager
+from results_io import JSONResultsWriter
+from snapshot import SharedSnapshotStore, SnapshotStore
+
+ROWS = [
+    ('/r/tc1', 'compile', 'err a', 'TTM-001'),
+    ('/r/tc2', 'simulate', 'err b', 'SIM-002'),
+    ('/r/tc3', 'compile', 'err a', 'TTM-001'),
+]
+
+def gated_scan(gate, scans):
+    """Scan that yields the first row, then waits for `gate`"""
+    def scan(testcases):
+        scans.append(testcases)
+        for i, _ in enumerate(testcases):
+            if i == 1:
+                gate.wait(5)
+            yield ROWS[i]
+    return scan
+
+def make_store(tmp_path, scan):
+    testcase_file = tmp_path / 'testcases.txt'
+    testcase_file.write_text('/r/tc1\n/r/tc2\n/r/tc3\n')
+    return SnapshotStore(str(testcase_file), scan=scan), str(testcase_file)
+
+def test_concurrent_submits_share_one_job(tmp_path):
+    gate = threading.Event()
+    scans = []
+    store, testcase_file = make_store(tmp_path, gated_scan(gate, scans))
+    manager = JobManager(store)
+    job, started = manager.submit(testcase_file)
+    again, started_again = manager.submit(testcase_file)
+    assert started and not started_again
+    assert again is job and job.attached == 1
+    gate.set()
+    assert job.wait(5)
+    assert job.state == 'done'
+    assert len(scans) == 1
+    assert job.result['version'] == store.current().version == 1
+    assert job.as_dict()['filtered_cases'] == 3
+    assert manager.jobs() == [job]
+
+    # Once finished, the next submit starts a new job
+    other, started = manager.submit(testcase_file)
+    assert started and other is not job
+    assert other.wait(5) and other.result['version'] == 2
+
+def test_cancel_publishes_nothing(tmp_path):
+    gate = threading.Event()
+    store, testcase_file = make_store(tmp_path, gated_scan(gate, []))
+    results_file = tmp_path / 'analyzed.json'
+    results_file.write_text('[]')
+    store.add_row_sink(lambda: JSONResultsWriter(str(results_file)))
+    manager = JobManager(store)
+    job, _ = manager.submit(testcase_file)
+    assert manager.cancel(job.id) is job
+    gate.set()
+    assert job.wait(5)
+    assert job.state == 'cancelled'
+    assert job.result is None
+    assert store._snapshot is None
+    assert results_file.read_text() == '[]'
+    assert manager.cancel('missing') is None
+
+def test_progress_and_eta():
+    now = [100.0]
+    job = AnalysisJob('testcases.txt', clock=lambda: now[0])
+    assert job.as_dict()['eta_seconds'] is None
+    job.state = 'running'
+    job.started = 100.0
+    job.scanned, job.total = 25, 100
+    now[0] = 110.0
+    status = job.as_dict()
+    assert status['progress'] == 0.25
+    assert status['eta_seconds'] == 30.0
+    assert status['elapsed_seconds'] == 10.0
+
+def test_failed_scan(tmp_path):
+    def scan(testcases):
+        raise OSError('disk gone')
+        yield
+
+    store, testcase_file = make_store(tmp_path, scan)
+    manager = JobManager(store)
+    job, _ = manager.submit(testcase_file)
+    assert job.wait(5)
+    assert job.state == 'failed'
+    assert job.error == 'disk gone'
+    assert store._snapshot is None
+
+def test_finished_jobs_are_pruned(tmp_path):
+    store, testcase_file = make_store(tmp_path, lambda testcases: ROWS)
+    manager = JobManager(store, max_finished=2)
+    for _ in range(4):
+        job, _ = manager.submit(testcase_file)
+        job.wait(5)
+    assert len(manager.jobs()) == 2
+    assert manager.jobs()[0] is job
+
+def test_event_readers_do_not_hold_up_the_scan(tmp_path):
+    gate = threading.Event()
+    store, testcase_file = make_store(tmp_path, gated_scan(gate, []))
+    manager = JobManager(store)
+    job, _ = manager.submit(testcase_file)
+    events = job.events(progress_interval=0.01)
+    assert next(events) == ('row', ROWS[0])
+    # The reader stalls; the scan still finishes and releases the refresh lock
+    gate.set()
+    assert job.wait(5) and job.state == 'done'
+    assert store._refresh_lock.acquire(timeout=1)
+    store._refresh_lock.release()
+    rest = list(events)
+    assert [payload for kind, payload in rest if kind == 'row'] == ROWS[1:]
+    assert ('progress', (3, 3)) in rest and rest[-1] == ('done', store.current())
+    # A reader arriving after the job finished only gets the outcome
+    assert list(job.events()) == [('progress', (3, 3)), ('done', store.current())]
+
+def test_late_reader_attaches_and_gets_every_row(tmp_path):
+    gate = threading.Event()
+    scans = []
+    store, testcase_file = make_store(tmp_path, gated_scan(gate, scans))
+    manager = JobManager(store)
+    job, _ = manager.submit(testcase_file)
+    first = job.events()
+    assert next(first) == ('row', ROWS[0])
+    again, started = manager.submit(testcase_file)
+    assert again is job and not started
+    second = again.events()
+    gate.set()
+    assert [payload for kind, payload in first if kind == 'row'] == ROWS[1:]
+    assert [payload for kind, payload in second if kind == 'row'] == ROWS
+    assert len(scans) == 1
+
+def test_jobs_are_shared_between_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr('jobs.JOB_SYNC_INTERVAL', 0.01)
+    testcase_file = tmp_path / 'testcases.txt'
+    testcase_file.write_text('/r/tc1\n/r/tc2\n/r/tc3\n')
+    results_file = str(tmp_path / 'analyzed.cwr')
+    gate = threading.Event()
+    scans = []
+
+    def workers(scan):
+        store = SharedSnapshotStore(results_file, str(testcase_file), scan=scan)
+        return store, SharedJobManager(store, results_file + '.jobs')
+
+    # Two store/manager pairs on one results file stand in for two server processes
+    store_a, a = workers(gated_scan(gate, scans))
+    store_b, b = workers(gated_scan(gate, scans))
+    job, started = a.submit(str(testcase_file))
+    assert started
+
+    # Worker b sees the job, attaches to it instead of scanning again
+    seen = b.get(job.id)
+    assert seen is not None and seen.state in ('queued', 'running')
+    attached, started = b.submit(str(testcase_file))
+    assert not started and attached.id == job.id
+    assert [other.id for other in b.jobs()] == [job.id]
+    gate.set()
+    assert attached.wait(5)
+    assert attached.state == 'done' and attached.as_dict()['version'] == 1
+    events = list(attached.events())
+    assert [kind for kind, _ in events if kind == 'row'] == ['row'] * 3
+    assert events[-1][0] == 'done' and events[-1][1].version == 1
+    assert len(scans) == 1
+
+    # ... and cancels a job worker a is running
+    gate.clear()
+    job, _ = a.submit(str(testcase_file))
+    assert b.cancel(job.id).as_dict()['cancel_requested']
+    gate.set()
+    assert job.wait(5) and job.state == 'cancelled'
+    assert b.get(job.id).wait(5) and b.get(job.id).state == 'cancelled'
+    assert store_b.current().version == 1
+    assert b.get('0123456789ab') is None and b.get('../secrets') is None
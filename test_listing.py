@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from categories import CategoryIndex
+from listing import SnapshotIndex, StaleCursor, page, parse_listing_args
+from snapshot import make_snapshot
+
+ROWS = [
+    ('/r/b/tc1', 'compile', 'err a', 'TTM-001'),
+    ('/r/a/tc2', 'simulate', 'err b', 'SIM-002'),
+    ('/r/b/tc3', 'compile', 'err a', 'TTM-001'),
+    ('/r/a/tc4', 'compile', 'err c', 'TTM-003'),
+    ('/r/c/tc5', 'simulate', 'err b', 'SIM-002'),
+]
+
+def paths(index, ids):
+    return [index.rows[i][0] for i in ids]
+
+def test_filters_and_sorting(tmp_path):
+    (tmp_path / 'list_core').write_text('/r/b/tc3\n/r/c/tc5\n')
+    categories = CategoryIndex(str(tmp_path))
+    index = SnapshotIndex(make_snapshot(ROWS, 1))
+    assert paths(index, index.query(command='compile')) == ['/r/b/tc1', '/r/b/tc3', '/r/a/tc4']
+    assert paths(index, index.query(command='compile', sort='path')) == ['/r/a/tc4', '/r/b/tc1', '/r/b/tc3']
+    assert paths(index, index.query(tag='SIM-002', sort='-path')) == ['/r/c/tc5', '/r/a/tc2']
+    assert paths(index, index.query(prefix='/r/b/')) == ['/r/b/tc1', '/r/b/tc3']
+    assert paths(index, index.query(prefix='/r/a', command='compile')) == ['/r/a/tc4']
+    assert paths(index, index.query(category='core', category_index=categories)) == ['/r/b/tc3', '/r/c/tc5']
+    assert paths(index, index.query(category='others', command='compile', category_index=categories)) == \
+        ['/r/b/tc1', '/r/a/tc4']
+    assert [index.rows[i][3] for i in index.query(sort='tag')] == \
+        ['SIM-002', 'SIM-002', 'TTM-001', 'TTM-001', 'TTM-003']
+    assert index.query(command='missing') == []
+
+def test_paging_with_cursor():
+    ids = list(range(7))
+    first, meta = page(ids, 3, limit=3)
+    assert first == [0, 1, 2]
+    assert meta['total_matches'] == 7
+    second, meta = page(ids, 3, limit=3, cursor=meta['next_cursor'])
+    assert second == [3, 4, 5]
+    last, meta = page(ids, 3, limit=3, cursor=meta['next_cursor'])
+    assert last == [6] and meta['next_cursor'] is None
+    with pytest.raises(StaleCursor):
+        page(ids, 4, limit=3, cursor='3:3')
+
+def test_parse_listing_args():
+    params = parse_listing_args({'limit': '20', 'sort': '-command', 'category': 'nc_diff'})
+    assert params['limit'] == 20 and params['sort'] == '-command' and params['offset'] == 0
+    for bad in ({'limit': 'x'}, {'limit': '0'}, {'sort': 'size'}, {'category': 'make'}):
+        with pytest.raises(ValueError):
+            parse_listing_args(bad)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import re
+
+import pytest
+
+import logscan
+from logscan import find_first_error_line, find_status_failing_command
+
+def legacy_first_error_line(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip().startswith('>') and "ERROR" in line:
+                return line.strip()
+    return None
+
+def legacy_status_command(path):
+    with open(path) as f:
+        for line in f:
+            m = re.match(r".*EXIT STATUS for (\w+) is 5", line)
+            if m:
+                return m.group(1)
+    return None
+
+DIFFS = [
+    "",
+    "no errors here\n> fine\n",
+    "< ERROR in golden\n> ok\n   >  ERROR: late (TTM-001)  \n> ERROR second\n",
+    "line\r\n< ERROR old\r\n> ERROR crlf (SIM-002)\r\n",
+    "line\r< ERROR old\r> ERROR cr only\rtail",
+    "x ERROR > not first\n\t> ERROR tabbed\n",
+    " > ERROR nbsp stripped (ABC-12)\n",
+    "> ERROR no newline at eof",
+    "> ERRO\nR\n> ERROR\n",
+]
+
+STATUS_LOGS = [
+    "",
+    "EXIT STATUS for compile is 0\n",
+    "EXIT STATUS for compile is 0\nfoo EXIT STATUS for simulate is 5\nEXIT STATUS for nc is 5\n",
+    "EXIT STATUS for compile is 55\r\n",
+    "EXIT STATUS for a is 0 EXIT STATUS for b is 5\r",
+    "EXIT STATUS for  x is 5\nEXIT STATUS for y-z is 5\n",
+    "EXIT STATUS for caf\u00e9 is 5\n",
+]
+
+@pytest.mark.parametrize('text', DIFFS)
+def test_first_error_line_matches_legacy(tmp_path, text):
+    path = tmp_path / 'compile.diff.bak'
+    path.write_bytes(text.encode('utf-8'))
+    assert find_first_error_line(str(path)) == legacy_first_error_line(str(path))
+
+@pytest.mark.parametrize('text', STATUS_LOGS)
+def test_status_command_matches_legacy(tmp_path, text):
+    path = tmp_path / 'status.log'
+    path.write_bytes(text.encode('utf-8'))
+    assert find_status_failing_command(str(path)) == legacy_status_command(str(path))
+
+def test_large_files_are_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(logscan, 'MMAP_THRESHOLD', 1024)
+    path = tmp_path / 'simulate.diff.bak'
+    path.write_text("< ERROR golden\n" * 500 + "> ERROR deep (SIM-042)\n")
+    assert find_first_error_line(str(path)) == "> ERROR deep (SIM-042)"
+    status = tmp_path / 'status.log'
+    status.write_text("EXIT STATUS for compile is 0\n" * 100 + "EXIT STATUS for simulate is 5\n")
+    assert find_status_failing_command(str(status)) == 'simulate'
+
+def test_byte_cap_and_missing_files(tmp_path):
+    path = tmp_path / 'compile.diff.bak'
+    path.write_text("> ok\n" * 10 + "> ERROR after cap\n")
+    assert find_first_error_line(str(path), max_bytes=20) is None
+    assert find_first_error_line(str(path), max_bytes=0) == "> ERROR after cap"
+    assert find_first_error_line(str(tmp_path / 'missing')) is None
+    assert find_status_failing_command(str(tmp_path / 'missing')) is None
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import os
+import stat
+
+import pytest
+
+from make_order import MakefileOrderResolver, parse_makefile
+
+DIFFS = ['setup.diff.bak', 'compile.diff.bak', 'simulate.diff.bak', 'report.diff.bak']
+
+MAKEFILES = {
+    'flat': """all:
+\t@echo start
+\trun_setup > testresults/logs/log_setup.log
+\t-run_compile > testresults/logs/LOG_compile.LOG
+""",
+    'prereq_order': """# generated from template
+.PHONY: all simulate compile
+all: simulate report
+simulate: compile
+\trun_sim > testresults/logs/log_simulate.log 2>&1
+compile:
+\trun_compile > testresults/logs/log_compile.log
+report: simulate
+\tsummarize > testresults/logs/log_report.log
+""",
+    'variables': """LOG = testresults/logs
+all:
+\trun_compile > $(LOG)/log_compile.log
+\trun_setup > $(LOG)/log_setup.log
+""",
+    'missing_source': """all: compile
+compile: netlist.v
+\trun_compile > testresults/logs/log_compile.log
+""",
+}
+
+def write_testcase(root, makefile, diffs, extra_files=()):
+    tc = str(root)
+    with open(os.path.join(tc, 'Makefile'), 'w') as f:
+        f.write(makefile)
+    for name in list(diffs) + list(extra_files):
+        open(os.path.join(tc, name), 'w').close()
+    return tc
+
+@pytest.mark.parametrize('name', sorted(MAKEFILES))
+@pytest.mark.parametrize('diffs', [DIFFS, DIFFS[1:], DIFFS[2:], []])
+@pytest.mark.parametrize('extra_files', [(), ('compile',), ('netlist.v',)])
+def test_resolver_matches_make_n(tmp_path, name, diffs, extra_files):
+    tc = write_testcase(tmp_path, MAKEFILES[name], diffs, extra_files)
+    resolver = MakefileOrderResolver()
+    expected = resolver.run_make_n(tc, diffs)
+    assert resolver.failing_base(tc, diffs) == expected
+
+def test_plans_are_shared_by_content(tmp_path):
+    resolver = MakefileOrderResolver()
+    for i in range(5):
+        tc = tmp_path / f'tc{i}'
+        tc.mkdir()
+        write_testcase(tc, MAKEFILES['prereq_order'], DIFFS[1:])
+        assert resolver.failing_base(str(tc), DIFFS[1:]) == 'compile'
+    stats = resolver.stats()
+    assert stats['cached_plans'] == 1
+    assert stats['static_resolutions'] == 5
+    assert stats['make_runs'] == 0
+
+def test_non_static_makefiles():
+    assert parse_makefile(MAKEFILES['variables']) is None
+    assert parse_makefile("include common.mk\n") is None
+    assert parse_makefile("%.log: %.in\n\tcp $< $@\n") is None
+    assert parse_makefile("all:\n\t+make -C sub > testresults/logs/log_sub.log\n") is None
+
+def test_make_n_timeout(tmp_path, monkeypatch):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    stub = bin_dir / 'make'
+    stub.write_text("#!/bin/sh\nsleep 5\n")
+    stub.chmod(stub.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    tc = tmp_path / 'tc'
+    tc.mkdir()
+    write_testcase(tc, MAKEFILES['variables'], DIFFS)
+    resolver = MakefileOrderResolver(timeout=0.2)
+    assert resolver.failing_base(str(tc), DIFFS) is None
+    assert resolver.stats()['make_timeouts'] == 1
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import os
+
+from metrics import Metrics, metrics_registry
+from scanner import iter_scan
+
+def test_phase_counters_and_prometheus_text():
+    metrics = Metrics()
+    for ms in range(1, 21):
+        metrics.observe('status_log', ms / 1000, nbytes=100)
+    metrics.add('make_n', subprocesses=2)
+    metrics.observe_request('/api/clustered', 'GET', 200, 0.004)
+    stats = metrics.as_dict()['phases']
+    assert stats['status_log']['calls'] == 20
+    assert stats['status_log']['p95_seconds'] == 0.019
+    assert stats['status_log']['bytes_read'] == 2000
+    assert stats['make_n'] == {'calls': 0, 'total_seconds': 0.0, 'p95_seconds': 0.0,
+                               'bytes_read': 0, 'subprocesses': 2}
+    text = metrics.prometheus()
+    assert 'scan_phase_seconds{phase="status_log",quantile="0.95"} 0.019000' in text
+    assert 'scan_phase_seconds_count{phase="status_log"} 20' in text
+    assert 'scan_phase_subprocesses_total{phase="make_n"} 2' in text
+    assert 'http_requests_total{endpoint="/api/clustered",method="GET",status="200"} 1' in text
+
+    other = Metrics()
+    other.merge(metrics.export())
+    assert other.as_dict()['phases']['status_log']['bytes_read'] == 2000
+
+def test_scan_profile(tmp_path):
+    tc = tmp_path / 'tc'
+    tc.mkdir()
+    (tc / 'status.log').write_text('EXIT STATUS for compile is 5\n')
+    (tc / 'compile.diff.bak').write_text('> ERROR: bad (TTM-001)\n')
+    rows = list(metrics_registry.profiled(iter_scan([str(tc)], backend='serial')))
+    assert rows[0][3] == 'TTM-001'
+    phases = metrics_registry.last_profile['phases']
+    assert phases['scan_testcase']['calls'] == 1
+    assert phases['status_log']['bytes_read'] == os.path.getsize(tc / 'status.log')
+    assert phases['diff_read']['calls'] == 1
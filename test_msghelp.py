@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import os
+import stat
+import threading
+
+import pytest
+
+from msghelp import MsgHelpCache
+
+STUB = """#!/bin/sh
+echo "$1" >> "{calls}"
+sleep {delay}
+if [ "$1" = "BAD-1" ]; then echo "unknown id $1" >&2; exit 1; fi
+echo "Help for $1"
+"""
+
+@pytest.fixture
+def stub_msghelp(tmp_path, monkeypatch):
+    """Put a fake msgHelp on PATH; returns a function reading the IDs it was run with"""
+    calls = tmp_path / 'calls.log'
+    calls.write_text('')
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    stub = bin_dir / 'msgHelp'
+    stub.write_text(STUB.format(calls=calls, delay=0.3))
+    stub.chmod(stub.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return lambda: calls.read_text().split()
+
+def test_cache_hits_and_ttl(stub_msghelp):
+    now = [0.0]
+    cache = MsgHelpCache(ttl=60, clock=lambda: now[0])
+    assert cache.get('TTM-004') == 'Help for TTM-004'
+    assert cache.get('TTM-004') == 'Help for TTM-004'
+    assert cache.get('BAD-1') == 'unknown id BAD-1'
+    assert stub_msghelp() == ['TTM-004', 'BAD-1']
+    now[0] = 61
+    cache.get('TTM-004')
+    assert stub_msghelp() == ['TTM-004', 'BAD-1', 'TTM-004']
+    assert cache.stats()['hits'] == 1
+
+def test_lru_eviction(stub_msghelp):
+    cache = MsgHelpCache(maxsize=2)
+    for error_id in ('A-1', 'B-2', 'A-1', 'C-3', 'A-1', 'B-2'):
+        cache.get(error_id)
+    assert stub_msghelp() == ['A-1', 'B-2', 'C-3', 'B-2']
+
+def test_concurrent_lookups_share_one_process(stub_msghelp):
+    cache = MsgHelpCache(max_concurrency=2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('TTM-004')))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ['Help for TTM-004'] * 8
+    assert stub_msghelp() == ['TTM-004']
+    assert cache.stats()['coalesced'] + cache.stats()['hits'] == 7
+
+def test_prefetch(stub_msghelp):
+    cache = MsgHelpCache(max_concurrency=2)
+    assert cache.prefetch(['A-1', 'B-2', 'A-1', 'C-3']) == 3
+    cache._prefetcher.shutdown(wait=True)
+    assert sorted(stub_msghelp()) == ['A-1', 'B-2', 'C-3']
+    assert cache.prefetch(['A-1']) == 0
+
+def test_missing_command_is_not_cached(tmp_path):
+    cache = MsgHelpCache(command=str(tmp_path / 'no-such-msgHelp'))
+    for _ in range(2):
+        with pytest.raises(OSError):
+            cache.get('TTM-004')
+    assert cache.stats()['errors'] == 2
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+import random
+
+from name_matcher import AhoCorasick
+
+def test_matches_brute_force_substring_search():
+    rng = random.Random(7)
+    words = [''.join(rng.choice('abc') for _ in range(rng.randint(1, 5))) for _ in range(40)]
+    matcher = AhoCorasick((w, w) for w in words)
+    for _ in range(200):
+        text = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 30)))
+        assert set(matcher.find_all(text)) == {w for w in words if w in text}
+
+def test_overlapping_patterns_and_shared_keys():
+    matcher = AhoCorasick([('he', 'he'), ('she', 'she'), ('his', 'his'), ('hers', 'hers')])
+    assert matcher.find_all('ushers') == ['she', 'he', 'hers']
+    matcher.add('us', 'us')
+    assert matcher.find_all('ushers') == ['us', 'she', 'he', 'hers']
+    assert matcher.find_all('') == []
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import json
+
+import pytest
+
+from results_io import PATH_RESTART, CompactResults, export_json, row_as_dict, write_compact_results
+
+ROWS = [(f'/reg/suite{i % 3}/group/tc_{i}', ('compile', 'simulate')[i % 2],
+         f'> ERROR: failure {i % 4} (TTM-00{i % 4})', f'TTM-00{i % 4}')
+        for i in range(PATH_RESTART * 2 + 5)]
+ROWS.append(('/reg/café/tc', 'nc', '> ERROR ✓ (NC-1)', 'NC-1'))
+
+def test_compact_round_trip(tmp_path):
+    path = tmp_path / 'results.cwr'
+    write_compact_results(ROWS, str(path))
+    results = CompactResults(str(path))
+    assert len(results) == len(ROWS)
+    assert list(results.iter_rows()) == ROWS
+    assert [results.row(i) for i in reversed(range(len(ROWS)))] == ROWS[::-1]
+    assert results[-1] == row_as_dict(ROWS[-1])
+    assert list(results) == [row_as_dict(row) for row in ROWS]
+
+    export_json(results.iter_rows(), str(tmp_path / 'results.json'))
+    assert json.loads((tmp_path / 'results.json').read_text()) == list(results)
+
+def test_empty_and_invalid_files(tmp_path):
+    path = tmp_path / 'empty.cwr'
+    write_compact_results([], str(path))
+    assert len(CompactResults(str(path))) == 0
+    for content in (b'', b'{"not": "compact"}'):
+        path.write_bytes(content)
+        with pytest.raises(ValueError):
+            CompactResults(str(path))
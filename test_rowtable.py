@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from results_io import CompactResults, row_as_dict, write_compact_results
+from rowtable import MappedRowTable, RowDicts, RowTable
+
+ROWS = [
+    ('/r/b/tc1', 'compile', 'err a', 'TTM-001'),
+    ('/r/a/tc2', 'simulate', 'err b', 'SIM-002'),
+    ('/r/c/tc3', 'compile', 'err a', 'TTM-001'),
+]
+
+def test_row_table_interns_strings():
+    table = RowTable(ROWS)
+    assert len(table) == 3
+    assert list(table) == ROWS
+    assert table[2] == ROWS[2] and table[-1] == ROWS[-1] and table[:2] == ROWS[:2]
+    assert table.strings == ['compile', 'err a', 'TTM-001', 'simulate', 'err b', 'SIM-002']
+    assert list(table.command_ids) == [0, 3, 0]
+    assert table.command(1) == 'simulate' and table.tag(0) == 'TTM-001'
+    assert table.string_id('SIM-002') == 5 and table.string_id('missing') is None
+    assert list(table.path_order()) == [1, 0, 2]
+    assert table.paths_for([2, 0]) == ['/r/c/tc3', '/r/b/tc1']
+    assert table.dicts([1]) == [row_as_dict(ROWS[1])]
+
+def test_row_dicts_view():
+    view = RowDicts(RowTable(ROWS))
+    assert len(view) == 3
+    assert list(view) == [row_as_dict(row) for row in ROWS]
+    assert view[0]['failing_command'] == 'compile'
+
+def test_mapped_row_table(tmp_path):
+    path = str(tmp_path / 'rows.cwr')
+    write_compact_results(ROWS, path)
+    table = MappedRowTable(CompactResults(path))
+    assert isinstance(table, RowTable)
+    assert len(table) == 3
+    assert list(table) == ROWS
+    assert table[1] == ROWS[1] and table[:2] == ROWS[:2]
+    assert list(table.paths) == [row[0] for row in ROWS]
+    assert table.string_id('SIM-002') is not None
+    assert list(table.path_order()) == [1, 0, 2]
+    assert table.paths_for([2, 0]) == ['/r/c/tc3', '/r/b/tc1']
+    assert table.tag(2) == 'TTM-001'
+    with pytest.raises(TypeError):
+        table.append(ROWS[0])
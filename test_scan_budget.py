@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+import time
+
+import scanner
+from scan_budget import ScanBudget, TimedOut, run_watched
+from scanner import analyze_testcases, iter_scan
+from history import RunHistory
+from snapshot import SnapshotStore
+
+def test_hung_item_is_abandoned():
+    release = threading.Event()
+
+    def work(item):
+        if item == 'hung':
+            release.wait()
+        return item.upper()
+
+    start = time.monotonic()
+    results = list(run_watched(work, ['a', 'hung', 'b', 'c'], 2, ScanBudget(testcase_timeout=0.2)))
+    release.set()
+    assert results[0] == 'A' and results[2:] == ['B', 'C']
+    assert isinstance(results[1], TimedOut) and not results[1]
+    assert (results[1].testcase, results[1].reason) == ('hung', 'testcase_timeout')
+    assert time.monotonic() - start < 2
+
+def test_scan_budget_returns_partial_results():
+    release = threading.Event()
+
+    def work(item):
+        if item >= 2:
+            release.wait()
+        return item
+
+    start = time.monotonic()
+    results = list(run_watched(work, range(10), 1, ScanBudget(testcase_timeout=0, scan_timeout=0.3)))
+    release.set()
+    assert time.monotonic() - start < 2
+    assert results[:2] == [0, 1]
+    assert [(r.testcase, r.reason) for r in results[2:4]] == [(2, 'scan_timeout'), (3, 'not_started')]
+    assert all(isinstance(r, TimedOut) for r in results[2:])
+    # Testcases not read yet are summed up in one entry, without reading them
+    summary = results[-1]
+    assert summary.remaining and summary.testcase is None
+    assert len(results) - 1 + summary.count == 10
+
+def test_scan_timeout_closes_the_input():
+    release = threading.Event()
+    pulled = []
+    closed = []
+
+    def source():
+        try:
+            for i in range(1000):
+                pulled.append(i)
+                yield i
+        finally:
+            closed.append(True)
+
+    results = list(run_watched(lambda item: release.wait(), source(), 1, ScanBudget(0, 0.2)))
+    release.set()
+    assert closed and len(pulled) < 10
+    assert results[-1].as_dict() == {'testcase': None, 'reason': 'remaining', 'seconds': 0.0, 'count': None}
+
+def test_blocked_log_read_times_out(tmp_path):
+    ok = tmp_path / 'ok'
+    ok.mkdir()
+    (ok / 'status.log').write_text('EXIT STATUS for compile is 5\n')
+    (ok / 'compile.diff.bak').write_text('> ERROR: bad (TTM-001)\n')
+    # Opening a FIFO without a writer blocks, like a read from a hung NFS server
+    hung = tmp_path / 'hung'
+    hung.mkdir()
+    os.mkfifo(hung / 'status.log')
+    try:
+        results = list(iter_scan([str(hung), str(ok)], backend='serial', budget=ScanBudget(testcase_timeout=0.3)))
+        assert isinstance(results[0], TimedOut) and results[0].testcase == str(hung)
+        assert results[1][3] == 'TTM-001'
+        assert analyze_testcases([str(ok)], backend='thread', workers=2) == [results[1]]
+    finally:
+        # Unblock the abandoned reader
+        os.close(os.open(hung / 'status.log', os.O_WRONLY | os.O_NONBLOCK))
+
+def test_store_records_and_retries_timed_out(tmp_path):
+    testcase_file = tmp_path / 'testcases.txt'
+    testcase_file.write_text('/r/tc1\n/r/slow\n')
+    slow = {'hangs': 2}
+
+    def scan(testcases):
+        for tc in testcases:
+            if tc == '/r/slow' and slow['hangs']:
+                slow['hangs'] -= 1
+                yield TimedOut(tc, 'testcase_timeout', 5.0)
+            else:
+                yield (tc, 'compile', 'err', 'TTM-001')
+
+    store = SnapshotStore(str(testcase_file), scan=scan, retry_delay=0, max_retries=3)
+    first = store.current()
+    assert len(first.rows) == 1 and first.total_cases == 2
+    assert [(e['testcase'], e['attempts']) for e in first.timed_out] == [('/r/slow', 1)]
+
+    second = store.retry_timed_out()
+    assert second.version == first.version + 1 and second.timed_out[0]['attempts'] == 2
+    third = store.retry_timed_out()
+    assert [row[0] for row in third.rows] == ['/r/tc1', '/r/slow']
+    assert third.timed_out == () and third.total_cases == 2
+    assert store.retry_timed_out() is None
+
+def test_budgeted_serial_scan_uses_one_worker(tmp_path, monkeypatch):
+    seen = []
+
+    def run_watched(func, items, workers, budget, testcase_of):
+        seen.append(workers)
+        return []
+
+    monkeypatch.setattr(scanner, 'run_watched', run_watched)
+    list(iter_scan([str(tmp_path)], backend='serial', workers=8, budget=ScanBudget(testcase_timeout=1)))
+    assert seen == [1]
+
+def test_store_counts_testcases_never_read(tmp_path):
+    testcase_file = tmp_path / 'testcases.txt'
+    testcase_file.write_text('/r/tc1\n/r/tc2\n/r/tc3\n')
+
+    def scan(testcases):
+        yield ('/r/tc1', 'compile', 'err', 'TTM-001')
+        yield TimedOut(None, 'remaining', count=None)
+
+    store = SnapshotStore(str(testcase_file), scan=scan, retry_delay=0)
+    snapshot = store.current()
+    assert snapshot.total_cases == 1
+    assert [(e['reason'], e['count']) for e in snapshot.timed_out] == [('remaining', 2)]
+    # Left to the next full scan, not retried one by one
+    assert store.retry_timed_out() is None
+
+def test_retry_keeps_input_order_labels_and_history_run(tmp_path):
+    testcase_file = tmp_path / 'testcases.txt'
+    testcase_file.write_text('/r/tc1\n/r/slow\n/r/tc3\n')
+    slow = {'hangs': 1}
+
+    def scan(testcases):
+        for tc in testcases:
+            if tc == '/r/slow' and slow['hangs']:
+                slow['hangs'] -= 1
+                yield TimedOut(tc, 'testcase_timeout', 5.0)
+            elif tc == '/r/tc3':
+                yield (tc, 'compile', 'err', 'TTM-001')
+            else:
+                # Untagged: the full error line comes last
+                bus = 'data_in' if tc == '/r/tc1' else 'addr'
+                line = f'> ERROR: port width mismatch on bus {bus} of module alu (expected 32, got 16)'
+                yield (tc, 'compile', line[:42] + '...', '', line)
+
+    store = SnapshotStore(str(testcase_file), scan=scan, retry_delay=0)
+    history = RunHistory(':memory:')
+    store.add_scan_listener(history.record_snapshot)
+    first = store.current()
+    retried = store.retry_timed_out()
+    assert retried.retry_of == first.version and retried.timed_out == ()
+    assert [row[0] for row in retried.rows] == ['/r/tc1', '/r/slow', '/r/tc3']
+    # The recovered row joins the cluster of the scan it completes
+    assert retried.rows[1][3] == retried.rows[0][3] == first.rows[0][3]
+    assert [(run['failures'], run['timed_out']) for run in history.runs()] == [(3, 0)]
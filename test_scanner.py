@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import os
+
+import pytest
+
+from scan_cache import ScanCache
+from scan_cache import testcase_signature as signature_of
+from scanner import analyze_testcases, iter_scan
+
+MAKEFILE = """all:
+\trun_a > testresults/logs/log_setup.log
+\trun_b > testresults/logs/log_compile.log
+\trun_c > testresults/logs/log_simulate.log
+"""
+
+def make_testcase(root, name, status=None, diffs=None, makefile=None):
+    tc = os.path.join(str(root), name)
+    os.makedirs(tc)
+    if status is not None:
+        with open(os.path.join(tc, 'status.log'), 'w') as f:
+            f.write(status)
+    for cmd, text in (diffs or {}).items():
+        with open(os.path.join(tc, f'{cmd}.diff.bak'), 'w') as f:
+            f.write(text)
+    if makefile is not None:
+        with open(os.path.join(tc, 'Makefile'), 'w') as f:
+            f.write(makefile)
+    return tc
+
+@pytest.fixture
+def regression_tree(tmp_path):
+    testcases = []
+    for i in range(12):
+        testcases.append(make_testcase(
+            tmp_path, f'status_{i}',
+            status='EXIT STATUS for setup is 0\nEXIT STATUS for compile is 5\n',
+            diffs={'compile': f'< ok\n> ERROR: bad netlist {i} (TTM-00{i % 3})\n'}))
+        # make -n order picks compile before simulate when both diffs exist
+        diffs = {'simulate': '> WARNING only\n  > ERROR: mismatch (SIM-12)\n'}
+        if i % 2:
+            diffs['compile'] = 'no errors here\n'
+        testcases.append(make_testcase(
+            tmp_path, f'make_{i}',
+            diffs=diffs,
+            makefile=MAKEFILE))
+        testcases.append(make_testcase(
+            tmp_path, f'untagged_{i}',
+            status='EXIT STATUS for compile is 5\n',
+            diffs={'compile': f'> ERROR: no tag on line {i * 7} of /work/run_{i}/top.v\n'}))
+    testcases.append(os.path.join(str(tmp_path), 'missing'))
+    return testcases
+
+def test_serial_rows(regression_tree):
+    rows = analyze_testcases(regression_tree, backend='serial')
+    assert len(rows) == 30
+    tc, cmd, err, tag = rows[0]
+    assert tc.endswith('status_0')
+    assert cmd == 'compile'
+    assert err == '> ERROR: bad netlist 0 (TTM-000)'
+    assert tag == 'TTM-000'
+    assert rows[1][0].endswith('make_0')
+    assert rows[1][1:] == ['simulate', '> ERROR: mismatch (SIM-12)', 'SIM-12']
+    assert not any(row[0].endswith('make_1') for row in rows)
+    # Untagged lines differing only in numbers and paths share one cluster
+    untagged = [row for row in rows if row[0].split(os.sep)[-1].startswith('untagged_')]
+    assert len(untagged) == 12
+    assert len({row[3] for row in untagged}) == 1
+    assert untagged[0][3].startswith('CLUSTER-')
+
+def test_untagged_rows_dropped_without_clustering(regression_tree):
+    rows = analyze_testcases(regression_tree, backend='serial', cluster_untagged=False)
+    assert len(rows) == 18
+    assert not any(row[3].startswith('CLUSTER-') for row in rows)
+
+def test_untagged_rows_cluster_on_the_full_error_line(tmp_path):
+    prefix = '> ERROR: simulation aborted in testbench top after '
+    testcases = [make_testcase(tmp_path, f'tc_{i}', status='EXIT STATUS for compile is 5\n',
+                               diffs={'compile': f'{prefix}{text}\n'})
+                 for i, text in enumerate(['license server connection refused by host',
+                                           'assertion in scoreboard compare failed twice'])]
+    rows = analyze_testcases(testcases, backend='serial')
+    # The truncated errors are the same, the clusters are not
+    assert rows[0][2] == rows[1][2] and rows[0][2].endswith('...')
+    assert rows[0][3] != rows[1][3]
+    assert all(len(row) == 4 for row in rows)
+
+@pytest.mark.parametrize('backend', ['thread', 'process'])
+def test_parallel_backends_match_serial(regression_tree, backend):
+    expected = analyze_testcases(regression_tree, backend='serial')
+    assert analyze_testcases(regression_tree, backend=backend, workers=4) == expected
+
+def test_iter_scan_accepts_generators(regression_tree):
+    results = list(iter_scan(iter(regression_tree), backend='thread', workers=3))
+    assert len(results) == len(regression_tree)
+    assert results[-1] is None
+
+def test_unknown_backend(regression_tree):
+    with pytest.raises(ValueError):
+        analyze_testcases(regression_tree, backend='gpu')
+
+def test_scan_cache_reuses_unchanged_testcases(regression_tree, tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    cache = ScanCache(cache_path)
+    expected = analyze_testcases(regression_tree, backend='serial')
+    assert analyze_testcases(regression_tree, cache=cache) == expected
+    assert cache.hits == 0
+
+    # A fresh cache object reads the persisted entries back
+    cache = ScanCache(cache_path)
+    assert analyze_testcases(regression_tree, cache=cache) == expected
+    assert cache.hits == len(regression_tree) - 1
+    assert cache.misses == 1  # the missing directory is never cached
+
+    diff = os.path.join(regression_tree[0], 'compile.diff.bak')
+    with open(diff, 'w') as f:
+        f.write('> ERROR: rewritten (ABC-1)\n')
+    rows = analyze_testcases(regression_tree, backend='process', workers=2, cache=cache)
+    assert rows[0][2:] == ['> ERROR: rewritten (ABC-1)', 'ABC-1']
+    assert cache.invalidations == 1
+
+    assert cache.invalidate([regression_tree[1]]) == 1
+    assert cache.invalidate() == len(regression_tree) - 2
+    assert cache.stats()['entries'] == 0
+
+def test_scan_cache_signature_covers_makefiles_and_includes(tmp_path):
+    tc = make_testcase(tmp_path, 'tc', diffs={'compile': '> ERROR: a (TTM-1)\n'})
+    with open(os.path.join(tc, 'GNUmakefile'), 'w') as f:
+        f.write('include rules.mk\n-include $(EXTRA)\n')
+    with open(os.path.join(tc, 'rules.mk'), 'w') as f:
+        f.write('all:\n\trun > testresults/logs/log_compile.log\n')
+    before = signature_of(tc)
+    assert [entry[0] for entry in before] == ['GNUmakefile', 'rules.mk', 'compile.diff.bak']
+    with open(os.path.join(tc, 'rules.mk'), 'a') as f:
+        f.write('\trun > testresults/logs/log_simulate.log\n')
+    assert signature_of(tc) != before
+    # A Makefile next to the GNUmakefile is not read by make but still counts
+    with open(os.path.join(tc, 'Makefile'), 'w') as f:
+        f.write(MAKEFILE)
+    assert [entry[0] for entry in signature_of(tc)][:3] == ['GNUmakefile', 'Makefile', 'rules.mk']
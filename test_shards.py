@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import json
+
+import pytest
+
+import cli
+from shards import ShardSpec, build_partial, load_partial, merge_partials, parse_shard, run_local_shards
+
+COMMANDS = ('setup', 'compile', 'simulate')
+
+def make_tree(tmp_path):
+    """Testcases in a few regression directories, some with untagged errors"""
+    testcases = []
+    for group in range(4):
+        for i in range(10):
+            tc = tmp_path / f'regress_{group}' / f'tc{i}'
+            tc.mkdir(parents=True)
+            cmd = COMMANDS[(group + i) % 3]
+            (tc / 'status.log').write_text(f'EXIT STATUS for {cmd} is 5\n')
+            if i % 4 == 3:
+                line = f'> ERROR: timeout after {i * 10} cycles in /work/{group}/top.v'
+            else:
+                line = f'> ERROR: failed check {i} (TTM-00{i % 3})'
+            (tc / f'{cmd}.diff.bak').write_text(line + '\n')
+            testcases.append(str(tc))
+    result_dir = tmp_path / 'result_reg'
+    result_dir.mkdir()
+    (result_dir / 'testcases.txt').write_text('\n'.join(testcases) + '\n')
+    (result_dir / 'list_core').write_text('\n'.join(testcases[::3]) + '\n')
+    (result_dir / 'list_nc_diff').write_text('\n'.join(testcases[::5]) + '\n')
+    return result_dir
+
+def tables(snapshot, category_tables):
+    report = cli.report_json(snapshot, category_tables, 'all')
+    del report['generated_on']
+    return report
+
+def test_parse_shard():
+    spec = parse_shard('2/4:root')
+    assert (spec.index, spec.count, spec.by) == (1, 4, 'root')
+    assert parse_shard('1/1').by == 'hash'
+    for bad in ('0/4', '5/4', '1-4', '1/4:size'):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+@pytest.mark.parametrize('by', ['hash', 'root'])
+def test_shards_partition_testcases(tmp_path, by):
+    result_dir = make_tree(tmp_path)
+    testcases = (result_dir / 'testcases.txt').read_text().split()
+    owners = [[i for i in range(3) if ShardSpec(i, 3, by).owns(tc)] for tc in testcases]
+    assert all(len(owner) == 1 for owner in owners)
+    if by == 'root':
+        # A regression directory is never split
+        for group in range(4):
+            assert len({owner[0] for tc, owner in zip(testcases, owners) if f'regress_{group}' in tc}) == 1
+
+def test_merge_matches_full_scan(tmp_path):
+    result_dir = make_tree(tmp_path)
+    testcase_file = str(result_dir / 'testcases.txt')
+    expected = tables(*cli.build_report(testcase_file, str(result_dir), backend='serial'))
+    assert any(tag['tag'].startswith('CLUSTER-') for item in expected['summary'] for tag in item['tags'])
+
+    partials = [build_partial(ShardSpec(i, 3), testcase_file, str(result_dir), backend='serial')
+                for i in range(3)]
+    assert sum(partial['scanned'] for partial in partials) == 40
+    assert tables(*merge_partials(partials[::-1])) == expected
+
+    with pytest.raises(ValueError):
+        merge_partials(partials[:2])
+    with pytest.raises(ValueError):
+        merge_partials(partials + partials[:1])
+
+def test_local_shard_processes(tmp_path):
+    result_dir = make_tree(tmp_path)
+    expected = tables(*cli.build_report(str(result_dir / 'testcases.txt'), str(result_dir), backend='serial'))
+    workdir = tmp_path / 'parts'
+    workdir.mkdir()
+    cache = workdir / 'cache.json'
+    paths = run_local_shards(str(result_dir), 3, 'root', str(workdir), ['--backend', 'serial', '--cache', str(cache)])
+    assert [load_partial(path)['shard']['index'] for path in paths] == [0, 1, 2]
+    # Shards sharing --cache keep a cache file each (none for an empty shard),
+    # so together they hold every testcase, and leave no temp files behind
+    caches = [p for p in workdir.iterdir() if p.name.startswith('cache')]
+    assert {p.name for p in caches} <= {f'cache.json.{i}of3' for i in (1, 2, 3)}
+    assert sum(len(json.loads(p.read_text())['entries']) for p in caches) == \
+        sum(load_partial(path)['scanned'] for path in paths)
+
+    out = tmp_path / 'merged.json'
+    assert cli.main(['--merge'] + paths + ['-o', str(out)]) == 0
+    merged = json.loads(out.read_text())
+    del merged['generated_on']
+    assert merged == expected
+    assert cli.main(['--merge'] + paths[:2] + ['-o', str(out)]) == 1
+    # A merge scans nothing, so it has no profile to write
+    with pytest.raises(SystemExit):
+        cli.main(['--merge'] + paths + ['-o', str(out), '--profile', str(tmp_path / 'profile.json')])
+    assert not (tmp_path / 'profile.json').exists()
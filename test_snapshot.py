@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import json
+
+from results_io import JSONResultsWriter
+from rowtable import MappedRowTable
+from snapshot import SharedSnapshotStore, SnapshotStore, cluster_rows
+
+ROWS = [
+    ('/r/tc1', 'compile', 'err a', 'TTM-001'),
+    ('/r/tc2', 'simulate', 'err b', 'SIM-002'),
+    ('/r/tc3', 'compile', 'err a', 'TTM-001'),
+    ('/r/tc4', 'compile', 'err c', 'TTM-003'),
+]
+
+def test_cluster_rows():
+    summary, clusters = cluster_rows(ROWS)
+    assert [item['failing_command'] for item in summary] == ['compile', 'simulate']
+    assert summary[0]['sno'] == 1
+    assert summary[0]['unique_failures'] == 2
+    assert summary[0]['total_failures'] == 3
+    assert list(clusters['compile']['TTM-001']['testcases']) == [0, 2]
+
+def test_store_builds_once_until_refreshed(tmp_path):
+    testcase_file = tmp_path / 'testcases.txt'
+    testcase_file.write_text('/r/tc1\n/r/tc2\n')
+    scans = []
+
+    def scan(testcases):
+        scans.append(testcases)
+        return ROWS[:len(testcases)]
+
+    store = SnapshotStore(str(testcase_file), scan=scan)
+    published = []
+    store.add_listener(published.append)
+    first = store.current()
+    assert store.current() is first
+    assert len(scans) == 1
+    assert first.version == 1
+    assert first.total_cases == 2
+
+    second = store.refresh()
+    assert second.version == 2
+    assert store.current() is second
+    assert published == [first, second]
+
+def test_iter_refresh_streams_rows_and_sinks(tmp_path):
+    testcase_file = tmp_path / 'testcases.txt'
+    testcase_file.write_text('/r/tc1\n/r/tc2\n/r/none\n')
+    results_file = tmp_path / 'analyzed.json'
+    store = SnapshotStore(str(testcase_file), scan=lambda tcs: ROWS[:2] + [None])
+    store.add_row_sink(lambda: JSONResultsWriter(str(results_file)))
+    events = list(store.iter_refresh(progress_interval=0))
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == 'progress' and kinds[-1] == 'done'
+    assert [payload for kind, payload in events if kind == 'row'] == list(ROWS[:2])
+    assert ('progress', (3, 3)) in events
+    assert json.loads(results_file.read_text())[1]['tag'] == 'SIM-002'
+
+    # An abandoned stream publishes nothing and leaves the old results in place
+    stream = store.iter_refresh()
+    next(stream)
+    next(stream)
+    stream.close()
+    assert store.current().version == 1
+    assert not (tmp_path / 'analyzed.json.tmp').exists()
+
+def test_shared_store_serves_one_scan_to_every_process(tmp_path):
+    testcase_file = tmp_path / 'testcases.txt'
+    testcase_file.write_text('/r/tc1\n/r/tc2\n/r/tc3\n/r/tc4\n')
+    results_file = str(tmp_path / 'analyzed.cwr')
+    scans = {'a': 0, 'b': 0}
+
+    def scanner(name):
+        def scan(testcases):
+            scans[name] += 1
+            return ROWS[:len(testcases)]
+        return scan
+
+    # Two stores on one results file stand in for two server processes
+    a = SharedSnapshotStore(results_file, str(testcase_file), scan=scanner('a'))
+    b = SharedSnapshotStore(results_file, str(testcase_file), scan=scanner('b'))
+    recorded = []
+    a.add_scan_listener(recorded.append)
+    b.add_scan_listener(recorded.append)
+
+    first = a.current()
+    assert isinstance(first.rows, MappedRowTable)
+    seen = b.current()
+    assert scans == {'a': 1, 'b': 0}
+    assert (seen.version, seen.built_at, seen.total_cases) == (1, first.built_at, 4)
+    assert list(seen.rows) == ROWS
+    assert seen.summary == first.summary
+
+    a.refresh()
+    assert b.current().version == 2
+    assert b.refresh().version == 3
+    assert a.current().version == 3
+    assert scans == {'a': 2, 'b': 1}
+    assert [s.version for s in recorded] == [1, 2, 3]
+
+def test_cluster_labels_survive_reordered_rescans(tmp_path):
+    testcase_file = tmp_path / 'testcases.txt'
+    results_file = str(tmp_path / 'analyzed.cwr')
+    buses = {'/r/tc1': 'data_in', '/r/tc2': 'addr', '/r/tc3': 'wr_en'}
+
+    def scan(testcases):
+        for tc in testcases:
+            line = f'> ERROR: port width mismatch on bus {buses[tc]} of module alu (expected 32, got 16)'
+            yield (tc, 'compile', line[:42] + '...', '', line)
+
+    a = SharedSnapshotStore(results_file, str(testcase_file), scan=scan)
+    b = SharedSnapshotStore(results_file, str(testcase_file), scan=scan)
+    testcase_file.write_text('/r/tc1\n/r/tc2\n/r/tc3\n')
+    label = a.current().rows[0][3]
+    # Reversed, then with the line that created the cluster fixed, also
+    # when another process scans
+    for store, order in ((a, '/r/tc3\n/r/tc2\n/r/tc1\n'), (b, '/r/tc2\n/r/tc3\n')):
+        testcase_file.write_text(order)
+        assert {row[3] for row in store.refresh().rows} == {label}